@@ -5,7 +5,7 @@ chat_with_luna.py – Memory-aware CLI for Luna with token cap enforcement
 
 import argparse
 import sys
-from ai_memory.vector_memory import VectorMemory
+from ai_memory import daemon
 from ai_memory.luna_wrapper import wrap_luna_query
 from ai_memory.cli import context  # Direct import to avoid kernel 6.14.0-27 subprocess bug
 
@@ -42,7 +42,7 @@ def _fetch_memory_context(query: str, model: str) -> list[str]:
 
         buf = StringIO()
         with contextlib.redirect_stdout(buf):
-            context.callback(token_limit=None, conv_id=None)
+            context.callback(query=query, model=model, token_limit=None, conv_id=None)
         return buf.getvalue().strip().splitlines()
     except SystemExit as exc:
         raise RuntimeError(f"aimem context failed: exit code {exc.code}") from exc
@@ -50,10 +50,25 @@ def _fetch_memory_context(query: str, model: str) -> list[str]:
         raise RuntimeError(f"aimem context failed: {exc}") from exc
 
 
+def _search_memories(query: str, top_k: int = 10) -> list[str]:
+    """Return memory texts for ``query``, via the resident daemon when running."""
+    hits = daemon.request("search", query=query, top_k=top_k)
+    if hits is not None:
+        return [h["text"] for h in hits]
+    from ai_memory.vector_memory import VectorMemory
+
+    # the same index lookup the daemon request named
+    vm = VectorMemory()
+    vm.load()
+    return [entry.text for entry, _ in vm.search(query, top_k=top_k)]
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("query", help="User prompt to Luna")
-    parser.add_argument("--context-model", default="BAAI/bge-large-en-v1.5")
+    parser.add_argument(
+        "--context-model", default="luna", help="Model whose token budget sizes the memory context"
+    )
     parser.add_argument("--debug", action="store_true")
     ns = parser.parse_args()
 
@@ -64,11 +79,8 @@ def main():
         print(f"[context error] {e}", file=sys.stderr)
         ctx = []
 
-    vm = VectorMemory(index_path=".ai_memory/memory_store.index")
-    memories = vm.search(query, top_k=10)
-
     # Combine all candidate text for token budgeting
-    all_lines = ctx + [f"[MEMORY] {m['text']}" for _, m in memories]
+    all_lines = ctx + [f"[MEMORY] {text}" for text in _search_memories(query)]
     trimmed_lines = trim_to_fit(all_lines, MAX_TOKENS)
 
     if len(trimmed_lines) < len(all_lines):
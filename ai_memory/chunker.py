@@ -0,0 +1,93 @@
+"""
+Token-aware chunking for long documents
+---------------------------------------
+Embedding models truncate their input (512 tokens for bge), so a long log
+embedded as one vector is mostly unsearchable. ``chunk_text`` splits text
+into overlapping windows of at most ``chunk_tokens`` tokens, preferring to
+cut at paragraph breaks, and keeps the character offsets of every chunk so
+neighbours can be stitched back together at retrieval time.
+
+Tokens are approximated with a regex (words and individual punctuation
+marks), which tracks WordPiece counts closely enough to stay under the
+model limit with the default sizes. No third-party dependencies.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence
+
+CHUNK_TOKENS = int(os.getenv("AIMEM_CHUNK_TOKENS", 256))
+CHUNK_OVERLAP = int(os.getenv("AIMEM_CHUNK_OVERLAP", 32))
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_PARAGRAPH = re.compile(r"\n[ \t]*\n\s*")
+
+
+@dataclass
+class Chunk:
+    text: str
+    start: int
+    end: int
+
+
+def _paragraph_starts(text: str, spans: Sequence[tuple[int, int]]) -> List[int]:
+    """Return token indices at which a new paragraph begins."""
+    token_starts = [s for s, _ in spans]
+    starts = []
+    for m in _PARAGRAPH.finditer(text):
+        idx = bisect.bisect_left(token_starts, m.end())
+        if 0 < idx < len(spans):
+            starts.append(idx)
+    return starts
+
+
+def chunk_text(
+    text: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+) -> List[Chunk]:
+    """Split ``text`` into chunks of at most ``chunk_tokens`` tokens.
+
+    Consecutive chunks share ``overlap`` tokens. A chunk ends at the last
+    paragraph break inside its window when that keeps it at least half full.
+    Text that already fits is returned as a single chunk.
+    """
+    spans = [m.span() for m in _TOKEN.finditer(text)]
+    if chunk_tokens <= 0 or len(spans) <= chunk_tokens:
+        return [Chunk(text=text, start=0, end=len(text))]
+    overlap = max(0, min(overlap, chunk_tokens // 2))
+    breaks = _paragraph_starts(text, spans)
+
+    chunks: List[Chunk] = []
+    start = 0
+    while start < len(spans):
+        end = min(start + chunk_tokens, len(spans))
+        if end < len(spans):
+            i = bisect.bisect_right(breaks, end) - 1
+            if i >= 0 and breaks[i] - start >= chunk_tokens // 2:
+                end = breaks[i]
+        c_start, c_end = spans[start][0], spans[end - 1][1]
+        chunks.append(Chunk(text=text[c_start:c_end], start=c_start, end=c_end))
+        if end >= len(spans):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def stitch(chunks: Iterable[Chunk]) -> str:
+    """Join chunks of one source, dropping the text they overlap on."""
+    text = ""
+    last_end = None
+    for chunk in sorted(chunks, key=lambda c: c.start):
+        if last_end is None:
+            text = chunk.text
+        elif chunk.start >= last_end:
+            text += "\n" + chunk.text
+        elif chunk.end > last_end:
+            text += chunk.text[last_end - chunk.start :]
+        last_end = chunk.end if last_end is None else max(last_end, chunk.end)
+    return text
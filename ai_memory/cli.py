@@ -18,9 +18,14 @@ def cli():
 
 
 @cli.command(name="vectorize")
-@click.argument("file", type=click.Path(exists=True))
+@click.argument("paths", nargs=-1, required=True)
 @click.option("--vector-index", required=True, help="Path to FAISS/SQLite index")
-@click.option("--model", default="llama3:70b-instruct-q4_K_M")
+@click.option(
+    "--model",
+    default=None,
+    help="Embedding model: sentence-transformers name or bge-large|bge-base|bge-small "
+    "(default $AIMEM_EMBED_MODEL or bge-large)",
+)
 @click.option("--factory", default="Flat", help="faiss index_factory string")
 @click.option(
     "--json-extract",
@@ -28,26 +33,228 @@ def cli():
     default="auto",
     help="Extraction mode for JSON files (auto|messages|all|none)",
 )
+@click.option("--batch-size", default=32, type=int, help="Texts per embedding batch")
+@click.option(
+    "--embed-cache",
+    default=None,
+    help="SQLite embedding cache path (default: $AIMEM_EMBED_CACHE)",
+)
+@click.option(
+    "--append",
+    is_flag=True,
+    help="Write new vectors to a delta segment instead of rewriting the index",
+)
+@click.option(
+    "--checkpoint-every",
+    default=100,
+    type=int,
+    help="Flush the index after this many files (0 = only at the end)",
+)
+@click.option(
+    "--workers",
+    default=0,
+    type=int,
+    help="Processes parsing files ahead of the encoder (0 = parse inline)",
+)
+@click.option(
+    "--chunk-tokens",
+    default=None,
+    type=int,
+    help="Max tokens per chunk for text files (0 = whole file, default $AIMEM_CHUNK_TOKENS or 256)",
+)
+@click.option(
+    "--chunk-overlap",
+    default=None,
+    type=int,
+    help="Tokens shared by consecutive chunks (default $AIMEM_CHUNK_OVERLAP or 32)",
+)
+@click.option(
+    "--storage",
+    type=click.Choice(["flat", "fp16", "sq8", "ivfpq"]),
+    default=None,
+    help="Compressed storage preset for a new index (overrides --factory)",
+)
+@click.option("--rerank", is_flag=True, help="Re-score compressed candidates exactly (keeps float32 vectors)")
+@click.option(
+    "--dedup/--no-dedup",
+    default=False,
+    help="Skip texts already in the index, exactly or nearly, from any conversation or source",
+)
+@click.option(
+    "--dedup-threshold",
+    default=None,
+    type=float,
+    help="MinHash similarity counted as a near duplicate (default $AIMEM_DEDUP_THRESHOLD or 0.9)",
+)
 @click.option("--no-meta", is_flag=True, help="Do not write metadata side-car")
 @click.option("--verbose", "-v", is_flag=True, help="Verbose output")
-def vectorize(file, vector_index, model, factory, json_extract, no_meta, verbose):
-    """Embed a file into the vector index."""
-    from .vector_embedder import embed_file
-
-    status = embed_file(
-        file,
-        vector_index,
-        model,
-        factory=factory,
-        json_extract=json_extract,
-        no_meta=no_meta,
-        verbose=verbose,
-    )
-    click.echo(f"\u2713 Embedded {file} into {vector_index}")
+def vectorize(
+    paths,
+    vector_index,
+    model,
+    factory,
+    json_extract,
+    batch_size,
+    embed_cache,
+    append,
+    checkpoint_every,
+    workers,
+    chunk_tokens,
+    chunk_overlap,
+    storage,
+    rerank,
+    dedup,
+    dedup_threshold,
+    no_meta,
+    verbose,
+):
+    """Embed files, directories or glob patterns into the vector index."""
+    from .chunker import CHUNK_OVERLAP, CHUNK_TOKENS
+    from .dedup import DEDUP_THRESHOLD
+    from .vector_embedder import IndexSession, expand_paths, set_embed_cache
+
+    try:
+        files = expand_paths(paths)
+    except FileNotFoundError as e:
+        click.echo(f"\u2717 No such file or pattern: {e}", err=True)
+        sys.exit(2)
+    if embed_cache:
+        set_embed_cache(embed_cache)
+
+    try:
+        session = IndexSession(
+            vector_index,
+            factory,
+            model=model,
+            json_extract=json_extract,
+            no_meta=no_meta,
+            batch_size=batch_size,
+            append=append,
+            checkpoint_every=checkpoint_every,
+            chunk_tokens=CHUNK_TOKENS if chunk_tokens is None else chunk_tokens,
+            chunk_overlap=CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap,
+            storage=storage,
+            rerank=rerank,
+            dedup=dedup,
+            dedup_threshold=DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold,
+            verbose=verbose,
+        )
+    except ValueError as e:
+        click.echo(f"\u2717 {e}", err=True)
+        sys.exit(2)
+    session.add_files(files, workers=workers)
+    status = session.close()
+
+    for stats in session.stats:
+        if stats.error:
+            click.echo(f"  \u2717 {stats.path}: {stats.error}", err=True)
+        else:
+            dups = f", {stats.duplicates} duplicates skipped" if stats.duplicates else ""
+            click.echo(f"  {stats.path}: {stats.chunks} chunks{dups} in {stats.seconds:.2f}s")
+    total = sum(s.chunks for s in session.stats)
+    label = files[0] if len(files) == 1 else f"{len(files)} files"
+    click.echo(f"\u2713 Embedded {label} ({total} chunks) into {vector_index}")
+    if session.storage_info:
+        from .index_info import read_info
+        from .index_presets import RECALL_K
+
+        info = read_info(vector_index)
+        click.echo(
+            f"  Storage {info['storage']} ({info['factory']}): "
+            f"recall@{RECALL_K} {info[f'recall_at_{RECALL_K}']:.3f} vs flat "
+            f"on {info['recall_sample']} vectors, "
+            f"{info['bytes_per_vector']} bytes/vector"
+        )
     if status != 0:
-        click.echo("Metadata mismatch", err=True)
+        click.echo("Some files failed to embed", err=True)
         sys.exit(status)
 
+
+@cli.command(name="merge-segments")
+@click.option("--vector-index", required=True, help="Path to FAISS index")
+@click.option("--factory", default=None, help="faiss index_factory string for a new base index")
+@click.option(
+    "--storage",
+    type=click.Choice(["flat", "fp16", "sq8", "ivfpq"]),
+    default=None,
+    help="Compressed storage preset for a new base index",
+)
+@click.option("--rerank", is_flag=True, help="Re-score compressed candidates exactly")
+def merge_segments(vector_index, factory, storage, rerank):
+    """Fold appended delta segments into the base index."""
+    from .vector_embedder import merge_segments as _merge
+
+    merged = _merge(vector_index, factory, storage, rerank)
+    click.echo(f"\u2713 Merged {merged} segments into {vector_index}")
+
+@cli.command(name="promote-index")
+@click.option("--vector-index", required=True, help="Path to FAISS index")
+@click.option(
+    "--layout",
+    type=click.Choice(["ivf", "hnsw"]),
+    default=None,
+    help="Target layout (default $AIMEM_PROMOTE_LAYOUT or ivf)",
+)
+@click.option("--force", is_flag=True, help="Promote below the size threshold or switch layouts")
+def promote_index(vector_index, layout, force):
+    """Rebuild the vector index into an IVF or HNSW layout."""
+    from .vector_embedder import promote_index as _promote
+
+    try:
+        factory = _promote(vector_index, layout, force)
+    except RuntimeError as e:
+        click.echo(f"\u2717 {e}", err=True)
+        sys.exit(1)
+    if factory is None:
+        click.echo(f"Index {vector_index} left as is (below threshold or already promoted)")
+    else:
+        click.echo(f"\u2713 Promoted {vector_index} to {factory}")
+        if factory.startswith("HNSW"):
+            click.echo("  note: HNSW graphs are copied into every process; use ivf to share via mmap")
+
+@cli.command(name="tune-index")
+@click.option("--vector-index", required=True, help="Path to FAISS index")
+@click.option("--target-ms", default=10.0, type=float, help="Target p95 latency per query")
+@click.option("--k", "k", default=10, type=int, help="Results per query to measure recall@k on")
+@click.option("--queries", default=200, type=int, help="Stored memories sampled as queries")
+def tune_index(vector_index, target_ms, k, queries):
+    """Pick nprobe / efSearch for a p95 latency target and save it."""
+    from .index_tuner import tune_index as _tune
+
+    try:
+        tuning = _tune(vector_index, target_ms, k, queries)
+    except ValueError as e:
+        click.echo(f"\u2717 {e}", err=True)
+        sys.exit(1)
+    for point in tuning["sweep"]:
+        mark = "*" if point == tuning["chosen"] else " "
+        click.echo(f"{mark} " + "  ".join(f"{key} {value}" for key, value in point.items()))
+    chosen = tuning["chosen"]
+    knob = "nprobe" if "nprobe" in chosen else "efSearch"
+    recall = chosen[f"recall_at_{tuning['k']}"]
+    click.echo(
+        f"\u2713 Saved {knob}={chosen[knob]} for {vector_index} "
+        f"(recall@{tuning['k']} {recall:.3f}, p95 {chosen['p95_ms']:.2f} ms)"
+    )
+
+@cli.command(name="remove-vectors")
+@click.argument("ids", nargs=-1)
+@click.option("--vector-index", required=True, help="Path to FAISS index")
+@click.option("--source", default=None, help="Remove every chunk embedded from this file")
+def remove_vectors(ids, vector_index, source):
+    """Delete memories from the vector index by id or source file."""
+    from .vector_embedder import remove_vectors as _remove
+
+    if not ids and not source:
+        click.echo("\u2717 Give memory ids or --source", err=True)
+        sys.exit(2)
+    try:
+        removed = _remove(vector_index, ids, source)
+    except (RuntimeError, ValueError) as e:
+        click.echo(f"\u2717 {e}", err=True)
+        sys.exit(1)
+    click.echo(f"\u2713 Removed {removed} vectors from {vector_index}")
+
 @cli.command()
 @click.argument("content")
 @click.option("--importance", "-i", default=1.0, type=float, help="Memory importance weight")
@@ -91,6 +298,14 @@ def list(limit, conv_id, contains, entity):
             conditions.append("mf.conv_id = ?")
             params.append(conv_id)
         if contains:
+            from .memory_db import has_trigram
+
+            if len(contains) >= 3 and has_trigram(store.conn):
+                # trigram lookup finds every candidate, LIKE re-checks them
+                conditions.append(
+                    "mf.rowid IN (SELECT rowid FROM memory_fragments_tri WHERE content LIKE ?)"
+                )
+                params.append(f"%{contains}%")
             conditions.append("mf.content LIKE ?")
             params.append(f"%{contains}%")
         if entity:
@@ -129,9 +344,17 @@ def list(limit, conv_id, contains, entity):
 def context(query, model, token_limit, conv_id):
     """Build and print the optimized context for a given query."""
     try:
+        budget = get_model_budget(model, token_limit)
+        from .daemon import request as daemon_request
+
+        context_str = daemon_request(
+            "context", query=query, model=model, budget=budget, conversation_id=conv_id
+        )
+        if context_str is not None:
+            click.echo(context_str)
+            return
         from .memory_optimizer import MemoryOptimizer
         memopt = MemoryOptimizer()
-        budget = get_model_budget(model, token_limit)
         context_str = memopt.build_optimal_context(
             {"name": model, "max_tokens": budget}, current_task=query, conversation_id=conv_id
         )
@@ -140,6 +363,32 @@ def context(query, model, token_limit, conv_id):
         click.echo(f"✗ Failed to build context: {e}", err=True)
         sys.exit(1)
 
+@cli.command()
+@click.option("--socket", "socket_path", default=None, help="Unix socket path (default $AIMEM_SOCKET)")
+@click.option("--idle-unload", type=float, default=None, help="Seconds idle before the model is unloaded")
+@click.option("--status", is_flag=True, help="Report whether a daemon is running")
+@click.option("--stop", is_flag=True, help="Stop a running daemon")
+def daemon(socket_path, idle_unload, status, stop):
+    """Serve search and context requests from a warm resident process."""
+    from .daemon import MemoryDaemon, request as daemon_request
+
+    if status or stop:
+        try:
+            info = daemon_request("shutdown" if stop else "ping", socket_path)
+        except RuntimeError as e:
+            info = None
+            click.echo(f"✗ Daemon error: {e}", err=True)
+        if info is None:
+            click.echo("Daemon not running")
+            sys.exit(1)
+        click.echo(f"{'Stopped' if stop else 'Running'} daemon (pid {info['pid']})")
+        return
+    try:
+        MemoryDaemon(socket_path, idle_unload).serve_forever()
+    except RuntimeError as e:
+        click.echo(f"✗ {e}", err=True)
+        sys.exit(1)
+
 @cli.command()
 @click.option("--output", "-o", "output_path", required=False, help="Output file path")
 @click.option("--conversation-id", "-c", default=None, help="Optional conversation ID")
@@ -162,7 +411,11 @@ def export(output_path, conversation_id, where_clause, format_):
             query = base_query
         cur.execute(query)
         cols = [desc[0] for desc in cur.description]
-        data = [dict(zip(cols, row)) for row in cur.fetchall()]
+        # embeddings are derived; `aimem embed-fragments` rebuilds them
+        skip = {"embedding", "embed_model"}
+        data = [
+            {c: v for c, v in zip(cols, row) if c not in skip} for row in cur.fetchall()
+        ]
         store.conn.close()
         json_data = json.dumps(data, indent=2)
         if output_path:
@@ -198,9 +451,10 @@ def import_(json_path):
 @click.option("--dest", default="~/chatlogs", help="Extraction destination")
 @click.option("--index", default=None, help="Vector index for aimem_bld")
 @click.option("--model", default=None, help="Embedding model for aimem_bld")
+@click.option("--workers", default=0, type=int, help="Parallel log parsing processes")
 @click.option("--no-meta", is_flag=True, help="Do not write metadata side-car")
 @click.option("--verbose", "-v", is_flag=True, help="Verbose output")
-def ingest_zip(src, dest, index, model, no_meta, verbose):
+def ingest_zip(src, dest, index, model, workers, no_meta, verbose):
     """Scan a directory for chat log ZIPs and import them."""
     try:
         from .ingest import zip_watcher
@@ -209,6 +463,8 @@ def ingest_zip(src, dest, index, model, no_meta, verbose):
             args += ["--index", index]
         if model:
             args += ["--model", model]
+        if workers:
+            args += ["--workers", str(workers)]
         if no_meta:
             args += ["--no-meta"]
         if verbose:
@@ -233,6 +489,42 @@ def convert_metadata(pkl_file, output):
     click.echo(f"✓ Converted {count} entries to {output_path}")
 
 
+@cli.command(name="convert-text-store")
+@click.argument("path", type=click.Path(exists=True))
+def convert_text_store(path):
+    """Build the memory-mapped text store of an index from its pickles."""
+    from .metadata_converter import convert_to_text_store
+
+    try:
+        count, target = convert_to_text_store(Path(path))
+    except FileNotFoundError as e:
+        click.echo(f"\u2717 {e}", err=True)
+        sys.exit(1)
+    click.echo(f"\u2713 Converted {count} entries to {target}")
+
+
+@cli.command(name="embed-fragments")
+@click.option("--model", default=None, help="Embedding model (default: $AIMEM_EMBED_MODEL or bge-large)")
+@click.option("--batch", default=256, show_default=True, type=int, help="Fragments embedded per model call")
+def embed_fragments(model, batch):
+    """Store embeddings for memories that lack one from the model."""
+    from .fragment_vectors import backfill
+
+    try:
+        store = MemoryStore()
+        total = 0
+        while True:
+            done = backfill(store.conn, model, batch)
+            if not done:
+                break
+            total += done
+        store.conn.close()
+    except Exception as e:
+        click.echo(f"✗ Embedding failed: {e}", err=True)
+        sys.exit(1)
+    click.echo(f"✓ Embedded {total} memory fragments")
+
+
 @cli.command()
 def vacuum():
     """Force compaction of the memory store."""
@@ -250,7 +542,6 @@ def vacuum():
 @click.option("--vector-index", help="Path to vector index")
 def debug_index(vector_index):
     """Debug vector index and metadata files."""
-    import faiss
     from pathlib import Path
 
     if vector_index:
@@ -263,8 +554,34 @@ def debug_index(vector_index):
     click.echo(f"Index exists: {index_path.exists()}")
 
     if index_path.exists():
-        index = faiss.read_index(str(index_path))
+        from .index_io import mmap_friendly, read_index
+
+        index = read_index(index_path, mmap=True)
         click.echo(f"Vectors in index: {index.ntotal}")
+        from .vector_ids import is_id_mapped
+
+        click.echo(f"ID-mapped: {'yes' if is_id_mapped(index) else 'no (positional)'}")
+        click.echo(f"mmap: {'shared' if mmap_friendly(index) else 'graph held per process'}")
+
+    from .segments import list_segments
+
+    click.echo(f"Delta segments: {len(list_segments(index_path))}")
+
+    from .index_info import read_info
+
+    for key, value in sorted(read_info(index_path).items()):
+        click.echo(f"  {key}: {value}")
+
+    from .text_store import TextStore, store_path
+
+    if TextStore.exists(index_path):
+        click.echo(f"Text store: {store_path(index_path)} ({len(TextStore(index_path))} entries)")
+
+    from .exact_vectors import read_vectors, vectors_path
+
+    exact = read_vectors(index_path)
+    if exact is not None:
+        click.echo(f"Exact vectors: {vectors_path(index_path)} ({len(exact)} x {exact.dtype})")
 
     for suffix in [".pkl", ".memories.pkl"]:
         meta_path = index_path.with_suffix(suffix)
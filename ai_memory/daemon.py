@@ -0,0 +1,314 @@
+"""
+Resident retrieval daemon
+-------------------------
+Every ``aimem context`` / ``chat-with-luna`` run otherwise pays for importing
+Torch + FAISS, loading the embedding model and reading the index before any
+real work. ``aimem daemon`` keeps all of that warm in one long-lived process
+listening on a Unix socket; the CLI entry points forward to it when it is
+running and fall back to in-process work when it is not.
+
+* Protocol: one JSON object per line, answered by ``{"ok": ..., "result"|"error": ...}``
+* Ops: ``ping``, ``search``, ``search_many``, ``context``, ``shutdown``;
+  the searches take the ``VectorMemory.search`` filters (``conversation``,
+  ``source_type``, ``since``, ``until``)
+* The embedding model is unloaded after ``AIMEM_DAEMON_IDLE`` seconds
+  without requests (default 600) and reloaded on demand
+* The vector index is reloaded when the index file or its segments change
+* After a ``context`` request, memories without a stored embedding are
+  embedded in the background, ``AIMEM_DAEMON_EMBED_BATCH`` (default 32)
+  at a time so queries are never held up for long
+* Requests name the vector index and SQLite database the client would
+  have used itself (see ``store_paths``); the daemon keeps warm objects
+  per index and per database, so forwarded and in-process runs agree
+* Set ``AIMEM_NO_DAEMON=1`` to make clients always work in-process
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_CLIENT_TIMEOUT = float(os.getenv("AIMEM_DAEMON_TIMEOUT", 30))
+_EMBED_BATCH = int(os.getenv("AIMEM_DAEMON_EMBED_BATCH", 32))
+_FILTER_KEYS = ("conversation", "source_type", "since", "until")
+_STORE_OPS = ("search", "search_many", "context")
+
+
+def socket_path() -> Path:
+    """Return the daemon socket path (``AIMEM_SOCKET`` or under ``AI_MEMORY_ROOT``)."""
+    if os.getenv("AIMEM_SOCKET"):
+        return Path(os.environ["AIMEM_SOCKET"]).expanduser()
+    return Path(os.getenv("AI_MEMORY_ROOT", "~/ai_memory")).expanduser() / "aimem.sock"
+
+
+# ---------------------------------------------------------------------
+#  CLIENT
+# ---------------------------------------------------------------------
+
+
+def _store_paths() -> dict:
+    """The index and database an in-process run here would use."""
+    from .store_paths import db_path, default_index_path, find_index
+
+    index = find_index() or default_index_path()
+    return {"index": str(index.resolve()), "db": str(Path(db_path()).resolve())}
+
+
+def request(op: str, path: str | Path | None = None, **params: Any) -> Optional[Any]:
+    """Send ``op`` to a running daemon and return its result.
+
+    Search and context requests carry this process's index and database
+    paths unless ``index`` / ``db`` are given. Returns ``None`` when no
+    daemon is listening (or ``AIMEM_NO_DAEMON`` is set) so callers can fall
+    back to in-process work. Errors reported by the daemon are raised as
+    ``RuntimeError``.
+    """
+    if os.getenv("AIMEM_NO_DAEMON", "").lower() in {"1", "true"}:
+        return None
+    sock_file = Path(path) if path else socket_path()
+    if not sock_file.exists():
+        return None
+    if op in _STORE_OPS:
+        params = {**_store_paths(), **params}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(_CLIENT_TIMEOUT)
+            sock.connect(str(sock_file))
+            sock.sendall((json.dumps({"op": op, **params}) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as f:
+                line = f.readline()
+    except OSError as e:
+        logger.debug("daemon unavailable at %s: %s", sock_file, e)
+        return None
+    if not line:
+        return None
+    resp = json.loads(line)
+    if not resp.get("ok"):
+        raise RuntimeError(resp.get("error", "daemon error"))
+    return resp.get("result")
+
+
+# ---------------------------------------------------------------------
+#  SERVER
+# ---------------------------------------------------------------------
+
+
+def _filters(req: dict) -> dict:
+    """The ``MetaFilter`` fields of a search request (JSON lists as tuples)."""
+    found = {}
+    for key in _FILTER_KEYS:
+        value = req.get(key)
+        if value is not None:
+            found[key] = tuple(value) if isinstance(value, list) else value
+    return found
+
+
+def _hit_dicts(hits) -> list:
+    return [
+        {
+            "id": e.id,
+            "text": e.text,
+            "timestamp": e.timestamp,
+            "source": e.source,
+            "start": e.start,
+            "end": e.end,
+            "score": score,
+        }
+        for e, score in hits
+    ]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                result = self.server.daemon.dispatch(json.loads(line))
+                resp = {"ok": True, "result": result}
+            except Exception as e:
+                logger.warning("daemon request failed: %s", e)
+                resp = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(resp) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MemoryDaemon:
+    """Hold the model, vector index and SQLite connection across requests."""
+
+    def __init__(self, path: str | Path | None = None, idle_unload: float | None = None) -> None:
+        self.path = Path(path) if path else socket_path()
+        self.idle_unload = (
+            float(os.getenv("AIMEM_DAEMON_IDLE", 600)) if idle_unload is None else idle_unload
+        )
+        self._lock = threading.Lock()
+        self._last_used = time.monotonic()
+        # warm objects per database / index path
+        self._optimizers: dict = {}
+        self._vms: dict = {}
+        # optimizers whose database may hold memories without a vector
+        self._to_embed: set = set()
+        self._server: _Server | None = None
+        self._stop = threading.Event()
+        self._embed_wanted = threading.Event()
+
+    # ------------------------------------------------------------------
+    # warm state
+    # ------------------------------------------------------------------
+    def _optimizer_(self, db: str | None = None, index: str | None = None):
+        """Return the MemoryOptimizer of ``db`` searching ``index``."""
+        from .store_paths import db_path
+
+        db = db or db_path()
+        vm = self._vector_memory(index)
+        optimizer = self._optimizers.get(db)
+        if optimizer is None:
+            from .memory_optimizer import MemoryOptimizer
+            from .memory_store import MemoryStore
+
+            optimizer = MemoryOptimizer(MemoryStore(path=db), vm)
+            self._optimizers[db] = optimizer
+        optimizer.relevance_engine.vector_memory = vm
+        return optimizer
+
+    def _vector_memory(self, index: str | None = None):
+        """Return the VectorMemory of ``index``, reloading it if the index changed."""
+        from .store_paths import default_index_path, find_index
+        from .vector_memory import VectorMemory
+
+        index = index or str(find_index() or default_index_path())
+        vm = self._vms.get(index)
+        if vm is None:
+            vm = VectorMemory()
+            vm._set_index_path(Path(index))
+            vm.load()
+            self._vms[index] = vm
+        elif vm.stamp() != vm._stamp:
+            logger.info("index changed on disk, reloading %s", vm.index_path)
+            vm.load()
+        return vm
+
+    def unload_model(self) -> None:
+        from .vector_embedder import unload_model
+
+        if unload_model():
+            logger.info("embedding model unloaded after %.0fs idle", self.idle_unload)
+
+    # ------------------------------------------------------------------
+    # requests
+    # ------------------------------------------------------------------
+    def dispatch(self, req: dict) -> Any:
+        op = req.get("op")
+        with self._lock:
+            self._last_used = time.monotonic()
+            if op == "ping":
+                return {"pid": os.getpid()}
+            if op == "search":
+                vm = self._vector_memory(req.get("index"))
+                hits = vm.search(
+                    req["query"],
+                    top_k=int(req.get("top_k", 5)),
+                    rerank=req.get("rerank"),
+                    **_filters(req),
+                )
+                return _hit_dicts(hits)
+            if op == "search_many":
+                vm = self._vector_memory(req.get("index"))
+                batches = vm.search_many(
+                    req["queries"],
+                    top_k=int(req.get("top_k", 5)),
+                    rerank=req.get("rerank"),
+                    **_filters(req),
+                )
+                return [_hit_dicts(hits) for hits in batches]
+            if op == "context":
+                optimizer = self._optimizer_(req.get("db"), req.get("index"))
+                context = optimizer.build_optimal_context(
+                    {"name": req.get("model"), "max_tokens": int(req["budget"])},
+                    current_task=req.get("query"),
+                    conversation_id=req.get("conversation_id"),
+                )
+                self._to_embed.add(optimizer)
+                self._embed_wanted.set()
+                return context
+            if op == "shutdown":
+                threading.Thread(target=self.shutdown, daemon=True).start()
+                return {"pid": os.getpid()}
+        raise ValueError(f"unknown op {op!r}")
+
+    # ------------------------------------------------------------------
+    # lifecycle
+    # ------------------------------------------------------------------
+    def _idle_watch(self) -> None:
+        while not self._stop.wait(min(self.idle_unload, 30) or 30):
+            if time.monotonic() - self._last_used >= self.idle_unload:
+                with self._lock:
+                    self.unload_model()
+
+    def embed_pending(self) -> int:
+        """Embed one batch of stored memories that lack a vector.
+
+        Covers every database a ``context`` request used since its
+        memories were last all embedded.
+        """
+        done = 0
+        for optimizer in list(self._to_embed):
+            count = optimizer.relevance_engine.embed_pending(_EMBED_BATCH)
+            if not count:
+                self._to_embed.discard(optimizer)
+            done += count
+        return done
+
+    def _embed_watch(self) -> None:
+        while not self._stop.is_set():
+            if not self._embed_wanted.wait(1.0):
+                continue
+            self._embed_wanted.clear()
+            # one batch per lock hold so requests interleave with the work
+            while not self._stop.is_set():
+                try:
+                    with self._lock:
+                        done = self.embed_pending()
+                except Exception as e:
+                    logger.warning("background embedding failed: %s", e)
+                    break
+                if not done:
+                    break
+
+    def serve_forever(self) -> None:
+        if self.path.exists():
+            if request("ping", self.path) is not None:
+                raise RuntimeError(f"daemon already running at {self.path}")
+            self.path.unlink()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = _Server(str(self.path), _Handler)
+        self._server.daemon = self
+        os.chmod(self.path, 0o600)
+        if self.idle_unload > 0:
+            threading.Thread(target=self._idle_watch, name="aimem-idle", daemon=True).start()
+        threading.Thread(target=self._embed_watch, name="aimem-embed", daemon=True).start()
+        logger.info("aimem daemon listening on %s", self.path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stop.set()
+            self._server.server_close()
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
@@ -0,0 +1,234 @@
+"""
+Duplicate filter ahead of the encoder
+-------------------------------------
+Chat exports repeat a lot of text: regenerated answers, pasted code and the
+same conversations re-exported in every ZIP. ``Deduper`` drops a text before
+it is embedded when it is
+
+* an exact duplicate (sha1 of the whitespace/case-normalised text), or
+* a near duplicate: MinHash over word 3-gram shingles, looked up with LSH
+  banding, estimated Jaccard similarity >= ``threshold``.
+
+Hashes and signatures live in a SQLite side-car (``<stem>.dedup.db`` next to
+the index) so re-ingesting an overlapping export skips everything already
+seen. Additions are only committed with ``commit()``, which the index
+session calls after its own files are written, so an interrupted run never
+marks texts as seen that did not make it into the index.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+DEDUP_THRESHOLD = float(os.getenv("AIMEM_DEDUP_THRESHOLD", 0.9))
+
+_NUM_PERM = 64
+_SHINGLE_WORDS = 3
+# prime just above 2**32 for the (a * h + b) mod p permutations
+_PRIME = np.uint64(4294967311)
+_WS = re.compile(r"\s+")
+
+
+def dedup_path(index_path: str | Path) -> Path:
+    index_path = Path(index_path)
+    return index_path.parent / f"{index_path.stem}.dedup.db"
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> int:
+    """Pick the band count whose LSH threshold (1/b)^(1/r) is closest."""
+    best, best_err = 1, float("inf")
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if err < best_err:
+            best, best_err = bands, err
+    return best
+
+
+class Deduper:
+    """Persistent exact + MinHash/LSH near-duplicate filter."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = _NUM_PERM,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = _lsh_bands(threshold, num_perm)
+        self.rows = num_perm // self.bands
+        # fixed seed: signatures must stay comparable across runs
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+        self.exact = 0
+        self.near = 0
+        self.kept = 0
+
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS exact (
+                digest  BLOB PRIMARY KEY
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS signatures (
+                id      INTEGER PRIMARY KEY,
+                sig     BLOB NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS buckets (
+                bucket  INTEGER NOT NULL,
+                sig_id  INTEGER NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_buckets_bucket ON buckets(bucket);
+            CREATE INDEX IF NOT EXISTS idx_buckets_sig_id ON buckets(sig_id);
+
+            CREATE TABLE IF NOT EXISTS settings (
+                key     TEXT PRIMARY KEY,
+                value   TEXT
+            );
+            """
+        )
+        self._check_settings()
+
+    def _check_settings(self) -> None:
+        row = self.conn.execute("SELECT value FROM settings WHERE key='lsh'").fetchone()
+        current = f"{self.num_perm}/{self.bands}"
+        if row and row[0] != current:
+            # threshold changed: re-band the stored signatures
+            self.conn.execute("DELETE FROM buckets")
+            for sig_id, blob in self.conn.execute("SELECT id, sig FROM signatures").fetchall():
+                sig = np.frombuffer(blob, dtype=np.uint64)
+                if len(sig) == self.num_perm:
+                    self._insert_buckets(sig_id, self._band_keys(sig))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES ('lsh', ?)", (current,)
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _normalise(text: str) -> str:
+        return _WS.sub(" ", text).strip().lower()
+
+    def signature(self, text: str) -> np.ndarray:
+        """Return the MinHash signature of ``text``."""
+        words = self._normalise(text).split(" ")
+        if len(words) < _SHINGLE_WORDS:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {
+                " ".join(words[i : i + _SHINGLE_WORDS])
+                for i in range(len(words) - _SHINGLE_WORDS + 1)
+            }
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        perms = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return perms.min(axis=0)
+
+    def _band_keys(self, sig: np.ndarray) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = sig[band * self.rows : (band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def _insert_buckets(self, sig_id: int, keys: Sequence[int]) -> None:
+        self.conn.executemany(
+            "INSERT INTO buckets (bucket, sig_id) VALUES (?, ?)",
+            [(key, sig_id) for key in keys],
+        )
+
+    def _is_near_duplicate(self, sig: np.ndarray, keys: Sequence[int]) -> bool:
+        marks = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"""
+            SELECT DISTINCT s.sig FROM buckets b JOIN signatures s ON s.id = b.sig_id
+            WHERE b.bucket IN ({marks})
+            """,
+            tuple(keys),
+        ).fetchall()
+        for (blob,) in rows:
+            other = np.frombuffer(blob, dtype=np.uint64)
+            if len(other) == len(sig) and float(np.mean(other == sig)) >= self.threshold:
+                return True
+        return False
+
+    def filter(self, texts: Sequence[str]) -> List[int]:
+        """Return the positions in ``texts`` to keep and remember them.
+
+        Duplicates within ``texts`` are caught as well as those of earlier
+        calls and runs.
+        """
+        keep: List[int] = []
+        for i, text in enumerate(texts):
+            norm = self._normalise(text)
+            digest = hashlib.sha1(norm.encode("utf-8", errors="ignore")).digest()
+            cur = self.conn.execute("INSERT OR IGNORE INTO exact (digest) VALUES (?)", (digest,))
+            if cur.rowcount == 0:
+                self.exact += 1
+                continue
+            sig = self.signature(text)
+            keys = self._band_keys(sig)
+            if self._is_near_duplicate(sig, keys):
+                self.near += 1
+                continue
+            sig_id = self.conn.execute(
+                "INSERT INTO signatures (sig) VALUES (?)", (sig.tobytes(),)
+            ).lastrowid
+            self._insert_buckets(sig_id, keys)
+            self.kept += 1
+            keep.append(i)
+        return keep
+
+    def forget(self, texts: Sequence[str]) -> None:
+        """Remove ``texts`` so they are accepted again (after a delete)."""
+        for text in texts:
+            norm = self._normalise(text)
+            digest = hashlib.sha1(norm.encode("utf-8", errors="ignore")).digest()
+            self.conn.execute("DELETE FROM exact WHERE digest=?", (digest,))
+            sig = self.signature(text).tobytes()
+            for (sig_id,) in self.conn.execute(
+                "SELECT id FROM signatures WHERE sig=?", (sig,)
+            ).fetchall():
+                self.conn.execute("DELETE FROM buckets WHERE sig_id=?", (sig_id,))
+                self.conn.execute("DELETE FROM signatures WHERE id=?", (sig_id,))
+
+    def reset(self) -> None:
+        """Forget every text seen so far."""
+        self.conn.executescript(
+            "DELETE FROM exact; DELETE FROM signatures; DELETE FROM buckets;"
+        )
+        self.conn.commit()
+
+    def stats(self) -> dict:
+        return {"exact": self.exact, "near": self.near, "kept": self.kept}
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def close(self) -> None:
+        self.conn.close()
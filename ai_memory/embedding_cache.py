@@ -0,0 +1,123 @@
+"""
+Persistent embedding cache
+--------------------------
+Content-addressed store of text embeddings keyed by ``(model, sha1(text))``
+so re-vectorising an unchanged corpus only pays for the new texts.
+
+* SQLite file, WAL mode, no third-party dependencies beyond NumPy
+* Size bounded: least recently used rows are evicted past ``max_entries``
+* ``hits`` / ``misses`` counters for reporting
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# SQLite limits the number of host parameters per statement
+_MAX_PARAMS = 500
+
+
+class EmbeddingCache:
+    """On-disk LRU cache of float32 embeddings."""
+
+    def __init__(self, path: str | Path, max_entries: int | None = None) -> None:
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries or int(
+            os.getenv("AIMEM_EMBED_CACHE_MAX", 2_000_000)
+        )
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL;")
+        self.conn.execute("PRAGMA synchronous=NORMAL;")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model       TEXT,
+                digest      TEXT,
+                vec         BLOB,
+                last_used   REAL,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID;
+
+            CREATE INDEX IF NOT EXISTS idx_embeddings_last_used
+                ON embeddings(last_used);
+            """
+        )
+        self._count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors for ``texts`` (``None`` where missing)."""
+        digests = [self.digest(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        unique = sorted(set(digests))
+        for i in range(0, len(unique), _MAX_PARAMS):
+            chunk = unique[i : i + _MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT digest, vec FROM embeddings WHERE model=? AND digest IN ({marks})",
+                (model, *chunk),
+            ).fetchall()
+            for digest, blob in rows:
+                found[digest] = np.frombuffer(blob, dtype="float32")
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used=? WHERE model=? AND digest=?",
+                [(now, model, d) for d in found],
+            )
+            self.conn.commit()
+        result = [found.get(d) for d in digests]
+        hit_count = sum(v is not None for v in result)
+        self.hits += hit_count
+        self.misses += len(result) - hit_count
+        return result
+
+    def put_many(self, model: str, texts: Sequence[str], vecs: np.ndarray) -> None:
+        """Store ``vecs`` (one row per text) and evict old rows if needed."""
+        now = time.time()
+        rows = [
+            (model, self.digest(t), np.ascontiguousarray(v, dtype="float32").tobytes(), now)
+            for t, v in zip(texts, vecs)
+        ]
+        cur = self.conn.cursor()
+        before = self.conn.total_changes
+        cur.executemany(
+            "INSERT OR IGNORE INTO embeddings (model, digest, vec, last_used) VALUES (?,?,?,?)",
+            rows,
+        )
+        self._count += self.conn.total_changes - before
+        if self._count > self.max_entries:
+            self._evict(self._count - self.max_entries)
+        self.conn.commit()
+
+    def _evict(self, n: int) -> None:
+        cur = self.conn.cursor()
+        cur.execute(
+            """
+            DELETE FROM embeddings WHERE (model, digest) IN (
+                SELECT model, digest FROM embeddings ORDER BY last_used LIMIT ?
+            )
+            """,
+            (n,),
+        )
+        self._count -= max(cur.rowcount, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._count}
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
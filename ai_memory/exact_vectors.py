@@ -0,0 +1,171 @@
+"""
+Exact re-rank vectors
+---------------------
+IVF, HNSW and the compressed storage presets return approximate scores:
+the candidate list can miss or misorder neighbours, and SQ / PQ codes also
+distort the similarity itself. ``search(..., rerank=m)`` over-fetches
+``top_k * m`` candidates from the approximate index and re-scores them
+against full-precision vectors, so the final order and the reported scores
+are those of a flat index.
+
+The vectors come from ``memory_store.vectors.npy``, written next to every
+non-flat index in metadata (text store) order as ``AIMEM_EXACT_DTYPE``
+(default ``float16``, half the size of a float32 flat index). It is opened
+with ``np.load(mmap_mode="r")``, so a query only reads the rows of its
+candidates. Without the side file the vectors are reconstructed from the
+index, which is exact for ``Flat`` codes (IVF-Flat, HNSW-Flat, ``RFlat``)
+and approximate for SQ / PQ.
+
+``LUNA_VECTOR_RERANK`` sets the default over-fetch factor (``1`` = off).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXACT_DTYPE = np.dtype(os.getenv("AIMEM_EXACT_DTYPE", "float16"))
+RERANK = max(1, int(os.getenv("LUNA_VECTOR_RERANK", 1)))
+
+
+def vectors_path(path: str | Path) -> Path:
+    """Return the exact-vector side file of an index."""
+    path = Path(path)
+    return path.parent / f"{path.stem}.vectors.npy"
+
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    inner = faiss.downcast_index(index)
+    while isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        inner = faiss.downcast_index(inner.index)
+    return inner
+
+
+def is_exact(index: faiss.Index | None) -> bool:
+    """Return True if ``index`` already scores every vector exactly."""
+    return index is None or isinstance(_unwrap(index), faiss.IndexFlat)
+
+
+def lossless(index: faiss.Index) -> bool:
+    """Return True if ``index`` can reconstruct its vectors exactly."""
+    inner = _unwrap(index)
+    if isinstance(inner, faiss.IndexRefine):
+        inner = faiss.downcast_index(inner.refine_index)
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    return isinstance(inner, (faiss.IndexFlat, faiss.IndexIVFFlat))
+
+
+def read_vectors(path: str | Path, rows: int | None = None) -> Optional[np.ndarray]:
+    """Map the side file of ``path``; ``None`` if missing or not ``rows`` long."""
+    target = vectors_path(path)
+    if not target.exists():
+        return None
+    try:
+        vecs = np.load(target, mmap_mode="r")
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to read exact vectors %s: %s", target, e)
+        return None
+    if vecs.ndim != 2 or (rows is not None and len(vecs) != rows):
+        logger.warning("Exact vectors %s do not match the index; ignoring them", target)
+        return None
+    return vecs
+
+
+def write_vectors(path: str | Path, vecs: np.ndarray) -> Path:
+    """Write ``vecs`` (index order) as the side file of ``path``."""
+    target = vectors_path(path)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(vecs, dtype=EXACT_DTYPE))
+    os.replace(tmp, target)
+    return target
+
+
+def discard(path: str | Path) -> None:
+    try:
+        vectors_path(path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def reconstruct(index: faiss.Index, keys: Sequence[int]) -> Optional[np.ndarray]:
+    """Return the stored vectors of ``keys`` (ids, or positions of a positional index).
+
+    ``None`` if the index cannot reconstruct by id.
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    try:
+        if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+        out = np.empty((len(keys), index.d), dtype="float32")
+        for i, key in enumerate(keys):
+            out[i] = index.reconstruct(int(key))
+    except RuntimeError as e:
+        logger.warning("Cannot reconstruct vectors for re-ranking: %s", e)
+        return None
+    return out
+
+
+def index_keys(index: faiss.Index) -> np.ndarray:
+    """Ids of the vectors of ``index`` in insertion (metadata) order."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map)
+    return np.arange(index.ntotal, dtype="int64")
+
+
+def update_vectors(
+    path: str | Path,
+    index: faiss.Index,
+    added: np.ndarray | None = None,
+    keep: np.ndarray | None = None,
+    source: faiss.Index | None = None,
+) -> bool:
+    """Bring the side file of ``path`` in line with ``index``.
+
+    The last ``len(added)`` vectors of ``index`` are ``added``. The rows
+    before them are the current side file (filtered by the boolean ``keep``
+    after deletions) or, if it is missing, reconstructed from ``source``
+    (default ``index``) when its codes are lossless. Flat indexes need no
+    side file. Returns True if the side file is now complete.
+    """
+    if is_exact(index):
+        discard(path)
+        return False
+    added = np.zeros((0, index.d), dtype="float32") if added is None else added
+    before = index.ntotal - len(added)
+    old = read_vectors(path, before if keep is None else len(keep))
+    if old is not None and keep is not None:
+        old = old[keep]
+    if old is None:
+        source = index if source is None else source
+        if before and not lossless(source):
+            logger.warning("No exact vectors for %s; re-ranking uses its own codes", path)
+            discard(path)
+            return False
+        old = reconstruct(source, index_keys(source)[:before]) if before else added[:0]
+        if old is None:
+            discard(path)
+            return False
+    write_vectors(path, np.vstack([np.asarray(old, dtype="float32"), added]))
+    return True
+
+
+def rescore(queries: np.ndarray, candidates: np.ndarray, metric: int) -> np.ndarray:
+    """Return exact scores of ``candidates[q, j]`` for ``queries[q]``."""
+    queries = np.asarray(queries, dtype="float32")
+    if metric == faiss.METRIC_L2:
+        diff = candidates - queries[:, None, :]
+        return np.einsum("qjd,qjd->qj", diff, diff)
+    return np.einsum("qjd,qd->qj", candidates, queries)
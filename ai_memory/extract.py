@@ -0,0 +1,192 @@
+"""
+Text extraction for the vector embedder
+---------------------------------------
+Turns input files into the list of text chunks that get embedded. Kept free
+of Torch / FAISS imports so extraction workers in a process pool start
+quickly and stay small.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+
+from . import json_stream
+from .chunker import CHUNK_OVERLAP, CHUNK_TOKENS, Chunk, chunk_text
+
+logger = logging.getLogger(__name__)
+
+_MAX_MESSAGE_BYTES = 2048
+
+
+def _extract_strings(obj, max_size=2048):
+    strings: list[str] = []
+    if isinstance(obj, dict):
+        for v in obj.values():
+            strings.extend(_extract_strings(v, max_size))
+    elif isinstance(obj, list):
+        for item in obj:
+            strings.extend(_extract_strings(item, max_size))
+    elif isinstance(obj, str):
+        if len(obj.encode("utf-8")) < max_size:
+            strings.append(obj)
+    return strings
+
+
+def _short(text) -> bool:
+    return isinstance(text, str) and len(text.encode("utf-8")) <= _MAX_MESSAGE_BYTES
+
+
+_MESSAGE_KEYS = ("messages", "mapping", "chat_messages")
+
+
+def _iter_conversation_messages(conv):
+    """Yield message texts of one conversation in any supported layout.
+
+    Understands ``messages`` lists (plain or ``content.parts``), ChatGPT
+    ``mapping`` trees and Claude ``chat_messages`` lists.
+    """
+    if not isinstance(conv, dict):
+        return
+    msgs = conv.get("messages")
+    if isinstance(msgs, list):
+        for m in msgs:
+            if isinstance(m, dict):
+                content = m.get("content")
+                if isinstance(content, dict):
+                    parts = content.get("parts")
+                    if isinstance(parts, list):
+                        for p in parts:
+                            if _short(p):
+                                yield p
+                elif _short(content):
+                    yield content
+    mapping = conv.get("mapping")
+    if isinstance(mapping, dict):
+        for node in mapping.values():
+            message = node.get("message") if isinstance(node, dict) else None
+            content = message.get("content") if isinstance(message, dict) else None
+            parts = content.get("parts") if isinstance(content, dict) else None
+            if isinstance(parts, list):
+                for p in parts:
+                    if _short(p) and p.strip():
+                        yield p
+    chat = conv.get("chat_messages")
+    if isinstance(chat, list):
+        for msg in chat:
+            if not isinstance(msg, dict):
+                continue
+            text = msg.get("text") or " ".join(
+                item["text"]
+                for item in msg.get("content") or []
+                if isinstance(item, dict) and isinstance(item.get("text"), str)
+            )
+            if _short(text) and text.strip():
+                yield text
+
+
+def _iter_messages(obj):
+    if not isinstance(obj, dict):
+        return
+    convs = obj.get("conversations")
+    if isinstance(convs, list):
+        for conv in convs:
+            yield from _iter_conversation_messages(conv)
+
+
+def _stream_strings(path: str, mode: str):
+    """Yield texts of ``path`` conversation by conversation.
+
+    In ``messages`` mode a top-level object without a ``conversations``
+    list is read as a single conversation (one exported ChatGPT or Claude
+    chat); only its message keys are kept while the rest streams past.
+    """
+    single: dict = {}
+    nested = False
+    try:
+        for key, value in json_stream.iter_top_level(path):
+            if mode == "messages":
+                if key is None or key == "conversations":
+                    nested = True
+                    yield from _iter_conversation_messages(value)
+                elif key in _MESSAGE_KEYS:
+                    single[key] = value
+            else:
+                yield from _extract_strings(value)
+        if single and not nested:
+            yield from _iter_conversation_messages(single)
+    except Exception as e:
+        logger.warning("JSON parse error for %s: %s", path, e)
+
+
+def _iter_json_strings(path: str, mode: str):
+    """Yield the texts of a JSON file without loading it whole.
+
+    ``auto`` yields messages when the file has any and otherwise falls back
+    to a second pass over every string (``all``).
+    """
+    if mode in ("messages", "auto"):
+        found = False
+        for text in _stream_strings(path, "messages"):
+            found = True
+            yield text
+        if found or mode == "messages":
+            return
+    if mode in ("all", "auto"):
+        yield from _stream_strings(path, "all")
+
+
+def _json_to_text(path: str, mode: str) -> str | None:
+    texts = list(_iter_json_strings(path, mode))
+    if not texts:
+        return None
+    return "\n\n".join(texts)
+
+
+def _iter_file_chunks(
+    file: str,
+    json_extract: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP,
+):
+    """Yield the text chunks to embed for ``file``.
+
+    JSON messages are yielded as strings; plain text (and JSON without any
+    extractable strings) is split by ``chunk_text`` into ``Chunk`` objects
+    that carry their character offsets.
+    """
+    if file.endswith(".json") and json_extract != "none":
+        found = False
+        for chunk in _iter_json_strings(file, json_extract):
+            found = True
+            yield chunk
+        if found:
+            return
+    with open(file, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    yield from chunk_text(text, chunk_tokens, chunk_overlap)
+
+
+def _extract_file(
+    file: str,
+    json_extract: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> list[str | Chunk]:
+    """Return the text chunks to embed for ``file``."""
+    return list(_iter_file_chunks(file, json_extract, chunk_tokens, chunk_overlap))
+
+
+def _extract_file_timed(
+    file: str,
+    json_extract: str,
+    chunk_tokens: int = CHUNK_TOKENS,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> tuple[list[str | Chunk], float, str | None]:
+    """Process-pool entry point: ``(chunks, seconds, error)`` for ``file``."""
+    start = time.time()
+    try:
+        chunks = _extract_file(file, json_extract, chunk_tokens, chunk_overlap)
+        return chunks, time.time() - start, None
+    except Exception as e:
+        return [], time.time() - start, str(e)
@@ -0,0 +1,234 @@
+"""
+Fragment embeddings for semantic scoring
+----------------------------------------
+``RelevanceEngine`` scores every SQL memory against the task. Embedding
+each memory per query would cost one model call per memory, so the
+embedding of every ``memory_fragments`` row is stored with it instead:
+
+  embedding     BLOB   L2-normalised float16 vector (2 bytes / dimension)
+  embed_model   TEXT   model that produced it
+
+``backfill`` embeds rows that have no vector (or one from another model)
+in batches (``AIMEM_FRAGMENT_BACKFILL``, default 256). It never runs on
+the query path: ``aimem embed-fragments`` fills a database, and the
+daemon embeds new rows in the background after serving a context.
+``FragmentMatrix`` stacks the stored vectors into one float32 matrix and
+keeps it current by appending the rows written since its last refresh,
+so scoring the candidate set is a single matrix-vector product.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH = int(os.getenv("AIMEM_FRAGMENT_BACKFILL", 256))
+
+
+def _normalise(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype="float32")
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.where(norms > 0, norms, 1.0)
+
+
+def to_blob(vec: np.ndarray) -> bytes:
+    """Encode one embedding as a normalised float16 blob."""
+    return _normalise(vec).astype("<f2").tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f2").astype("float32")
+
+
+def embed(texts: List[str], model: Optional[str] = None) -> np.ndarray:
+    """Embed ``texts`` with ``model`` (normalised float32 rows)."""
+    # lazy: importing the embedder loads torch
+    from .vector_embedder import _embed_texts, set_model
+
+    set_model(model)
+    return _normalise(_embed_texts(texts))
+
+
+def backfill(
+    conn: sqlite3.Connection, model: Optional[str] = None, limit: int = BACKFILL_BATCH
+) -> int:
+    """Embed up to ``limit`` fragments missing a vector from ``model``.
+
+    Returns the number of rows embedded.
+    """
+    from .model_config import resolve_embed_model
+
+    model = resolve_embed_model(model)
+    if limit <= 0:
+        return 0
+    rows = conn.execute(
+        """
+        SELECT rowid, content FROM memory_fragments
+        WHERE content IS NOT NULL AND content != ''
+          AND (embedding IS NULL OR embed_model IS NOT ?)
+        LIMIT ?
+        """,
+        (model, limit),
+    ).fetchall()
+    if not rows:
+        return 0
+    vecs = embed([content for _, content in rows], model)
+    conn.executemany(
+        "UPDATE memory_fragments SET embedding=?, embed_model=? WHERE rowid=?",
+        [(to_blob(vec), model, rowid) for (rowid, _), vec in zip(rows, vecs)],
+    )
+    conn.commit()
+    logger.info("embedded %d memory fragments with %s", len(rows), model)
+    return len(rows)
+
+
+class FragmentMatrix:
+    """In-memory matrix of the stored fragment embeddings of one model.
+
+    The first ``refresh`` loads every stored vector; later ones only read
+    the rows written since (``embed_seq`` past the loaded version) and
+    append them, growing the buffer geometrically. Only a removed vector
+    (fragment deleted, content changed, re-embedded with another model)
+    forces a full reload.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, model: Optional[str] = None) -> None:
+        from .model_config import resolve_embed_model
+
+        self.conn = conn
+        self.model = resolve_embed_model(model)
+        self.ids: List[str] = []
+        self._buffer = np.zeros((0, 0), dtype="float32")
+        self._rows: Dict[str, int] = {}
+        self._state: Optional[tuple] = None
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._buffer[: len(self.ids)]
+
+    def refresh(self) -> None:
+        """Bring the matrix up to date with the stored embeddings."""
+        state = self.conn.execute("SELECT version, removed FROM fragment_embeddings").fetchone()
+        if state == self._state:
+            return
+        if self._state is None or state[1] != self._state[1] or not self._append(self._state[0]):
+            self._load()
+        # rows written after ``state`` was read are picked up again next time
+        self._state = state
+
+    def _load(self) -> None:
+        rows = self.conn.execute(
+            "SELECT mem_id, embedding FROM memory_fragments WHERE embedding IS NOT NULL AND embed_model = ?",
+            (self.model,),
+        ).fetchall()
+        sizes = {len(blob) for _, blob in rows}
+        if len(sizes) > 1:
+            # should not happen for one model; keep the most common size
+            common = max(sizes, key=lambda size: sum(len(b) == size for _, b in rows))
+            rows = [(mem_id, blob) for mem_id, blob in rows if len(blob) == common]
+        self.ids = [mem_id for mem_id, _ in rows]
+        self._rows = {mem_id: i for i, mem_id in enumerate(self.ids)}
+        if rows:
+            flat = np.frombuffer(b"".join(blob for _, blob in rows), dtype="<f2")
+            self._buffer = flat.astype("float32").reshape(len(rows), -1)
+        else:
+            self._buffer = np.zeros((0, 0), dtype="float32")
+
+    def _append(self, since: int) -> bool:
+        """Add the vectors written after version ``since``; False if a reload is needed."""
+        rows = self.conn.execute(
+            "SELECT mem_id, embedding, embed_model FROM memory_fragments WHERE embed_seq > ?",
+            (since,),
+        ).fetchall()
+        dim = self._buffer.shape[1] if self.ids else None
+        new_ids: List[str] = []
+        new_vecs: List[np.ndarray] = []
+        seen = set()
+        for mem_id, blob, model in rows:
+            row = self._rows.get(mem_id)
+            if blob is None or model != self.model:
+                if row is not None:
+                    return False  # a loaded vector went away
+                continue
+            vec = from_blob(blob)
+            if dim is None:
+                dim = len(vec)
+            elif len(vec) != dim:
+                return False
+            if row is not None:
+                self._buffer[row] = vec
+            elif mem_id not in seen:
+                seen.add(mem_id)
+                new_ids.append(mem_id)
+                new_vecs.append(vec)
+        if not new_ids:
+            return True
+        n = len(self.ids)
+        needed = n + len(new_ids)
+        if needed > len(self._buffer) or self._buffer.shape[1] != dim:
+            grown = np.zeros((max(needed, 2 * len(self._buffer)), dim), dtype="float32")
+            grown[:n] = self._buffer[:n]
+            self._buffer = grown
+        self._buffer[n:needed] = np.vstack(new_vecs)
+        for mem_id in new_ids:
+            self._rows[mem_id] = len(self.ids)
+            self.ids.append(mem_id)
+        return True
+
+    def _scores(self, query: np.ndarray) -> Optional[np.ndarray]:
+        self.refresh()
+        if not self.ids:
+            return None
+        query = _normalise(np.asarray(query).reshape(-1))
+        if query.shape[0] != self.matrix.shape[1]:
+            logger.warning(
+                "query has %d dimensions, stored fragments %d", query.shape[0], self.matrix.shape[1]
+            )
+            return None
+        return self.matrix @ query
+
+    def similarities(
+        self, query: np.ndarray, mem_ids: Iterable[str] | None = None
+    ) -> Dict[str, float]:
+        """Return the cosine similarity of ``query`` to each stored fragment.
+
+        ``mem_ids`` restricts the result to a candidate set; fragments
+        without a stored vector are left out.
+        """
+        sims = self._scores(query)
+        if sims is None:
+            return {}
+        if mem_ids is None:
+            return dict(zip(self.ids, sims.tolist()))
+        ids = [m for m in mem_ids if m in self._rows]
+        rows = np.fromiter((self._rows[m] for m in ids), dtype="int64", count=len(ids))
+        return dict(zip(ids, sims[rows].tolist()))
+
+    def nearest(self, query: np.ndarray, k: int) -> List[str]:
+        """Return the ids of the ``k`` stored fragments closest to ``query``."""
+        sims = self._scores(query)
+        if sims is None or k <= 0:
+            return []
+        if len(sims) > k:
+            rows = np.argpartition(-sims, k - 1)[:k]
+            rows = rows[np.argsort(-sims[rows])]
+        else:
+            rows = np.argsort(-sims)
+        return [self.ids[i] for i in rows.tolist()]
+
+    def similarity_array(self, query: np.ndarray, mem_ids: List[str]) -> np.ndarray:
+        """Like ``similarities`` but aligned with ``mem_ids`` (NaN = no vector)."""
+        out = np.full(len(mem_ids), np.nan, dtype="float32")
+        sims = self._scores(query)
+        if sims is None:
+            return out
+        rows = np.fromiter((self._rows.get(m, -1) for m in mem_ids), dtype="int64", count=len(mem_ids))
+        found = rows >= 0
+        out[found] = sims[rows[found]]
+        return out
@@ -0,0 +1,40 @@
+"""
+Index description side-car
+--------------------------
+``memory_store.info.json`` next to the index records how the index was
+built (storage preset, factory string, measured recall, size per vector)
+so later runs and ``aimem debug-index`` can read it back without guessing.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+
+def info_path(index_path: str | Path) -> Path:
+    index_path = Path(index_path)
+    return index_path.parent / f"{index_path.stem}.info.json"
+
+
+def read_info(index_path: str | Path) -> dict:
+    """Return the side-car contents, or ``{}`` if missing or unreadable."""
+    try:
+        with open(info_path(index_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def update_info(index_path: str | Path, **fields) -> dict:
+    """Merge ``fields`` into the side-car and write it atomically."""
+    path = info_path(index_path)
+    data = read_info(index_path)
+    data.update(fields)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return data
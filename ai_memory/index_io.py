@@ -0,0 +1,65 @@
+"""
+Memory-mapped index loading
+---------------------------
+``faiss.read_index`` copies the whole index into the heap of every process
+that loads it. With ``mmap=True`` (or ``LUNA_VECTOR_MMAP=1``) the index is
+opened read-only with ``IO_FLAG_MMAP_IFC`` instead: flat, scalar-quantised,
+PQ and IVF codes stay in the file mapping, so API workers and chat sessions
+share one copy in the page cache and a cold start only faults in the pages
+that searches touch.
+
+A mapped index must never be modified (FAISS aborts the process when a
+mapped code array is resized); callers keep additions in a separate
+in-memory index. Writers replace the index file atomically, so processes
+that still map the old file keep reading a consistent snapshot until they
+reload.
+
+What stays private per process: the id map of ``IndexIDMap2`` (8 bytes per
+vector plus its reverse hash map) and the neighbour graph of HNSW layouts,
+which is why IVF is the layout to build for shared serving.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+import faiss
+
+logger = logging.getLogger(__name__)
+
+# faiss < 1.10 only maps IVF inverted lists
+_MMAP = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+MMAP_FLAGS = _MMAP | faiss.IO_FLAG_READ_ONLY
+
+
+def mmap_default() -> bool:
+    return os.getenv("LUNA_VECTOR_MMAP", "0").lower() in {"1", "true", "yes"}
+
+
+def read_index(path: str | Path, mmap: bool = False) -> faiss.Index:
+    """Read the index at ``path``, memory-mapped read-only when ``mmap``.
+
+    Falls back to a normal read (with a warning) if the file cannot be
+    mapped.
+    """
+    if mmap:
+        try:
+            return faiss.read_index(str(path), MMAP_FLAGS)
+        except RuntimeError as e:
+            logger.warning("Cannot mmap %s (%s); reading it into memory", path, e)
+    return faiss.read_index(str(path))
+
+
+def mmap_friendly(index: faiss.Index) -> bool:
+    """Return True if the bulk of ``index`` stays shared when mapped."""
+    inner = faiss.downcast_index(index)
+    while True:
+        if isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            inner = faiss.downcast_index(inner.index)
+        elif isinstance(inner, faiss.IndexRefine):
+            inner = faiss.downcast_index(inner.base_index)
+        else:
+            break
+    return not isinstance(inner, faiss.IndexHNSW)
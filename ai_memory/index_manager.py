@@ -0,0 +1,166 @@
+"""
+Automatic index promotion
+-------------------------
+A flat index scans every vector on every query. Once ``ntotal`` crosses
+``AIMEM_PROMOTE_AT`` (default 100 000) the index is rebuilt into a
+sub-linear layout that keeps its vector codec (Flat / SQfp16 / SQ8):
+
+* ``ivf``  (default) ``IVF<nlist>,<codec>`` with nlist ~ 4*sqrt(n), trained
+  on a random sample drawn from the whole corpus. An IVF index is rebuilt
+  again once the ideal nlist has grown ``AIMEM_PROMOTE_GROWTH`` times.
+* ``hnsw`` ``HNSW32,<codec>``; faster queries and more RAM. HNSW cannot
+  delete in place, so ``remove_vectors`` rebuilds the graph without them.
+
+Pick the layout with ``AIMEM_PROMOTE_LAYOUT``; ``AIMEM_AUTO_PROMOTE=0``
+leaves promotion to ``aimem promote-index``. ``plan`` decides, ``promote``
+builds the new index; the caller swaps it in atomically.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import time
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .index_presets import DEFAULT_NPROBE, TRAIN_SIZE
+from .vector_ids import is_id_mapped
+
+logger = logging.getLogger(__name__)
+
+PROMOTE_AT = int(os.getenv("AIMEM_PROMOTE_AT", 100_000))
+PROMOTE_LAYOUT = os.getenv("AIMEM_PROMOTE_LAYOUT", "ivf")
+PROMOTE_GROWTH = int(os.getenv("AIMEM_PROMOTE_GROWTH", 4))
+AUTO_PROMOTE = os.getenv("AIMEM_AUTO_PROMOTE", "1").lower() not in {"0", "false"}
+
+LAYOUTS = ("ivf", "hnsw")
+HNSW_M = 32
+HNSW_EF_SEARCH = 64
+
+# vectors reconstructed per step while copying into the new index
+_BLOCK = 65536
+_MAX_NLIST = 65536
+# k-means wants at least this many training points per list
+_POINTS_PER_LIST = 39
+
+
+def ideal_nlist(n: int) -> int:
+    """Power of two near 4*sqrt(n), with ~39 training points per list."""
+    nlist = 1 << max(0, round(math.log2(max(4 * math.sqrt(n), 1))))
+    return max(1, min(nlist, n // _POINTS_PER_LIST, _MAX_NLIST))
+
+
+def _codec(inner: faiss.Index) -> Optional[str]:
+    """Return the factory codec of ``inner`` (None if not re-encodable)."""
+    if isinstance(inner, faiss.IndexHNSW):
+        inner = faiss.downcast_index(inner.storage)
+    if isinstance(inner, (faiss.IndexFlat, faiss.IndexIVFFlat)):
+        return "Flat"
+    if isinstance(inner, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = inner.sq.qtype
+        if qtype == faiss.ScalarQuantizer.QT_8bit:
+            return "SQ8"
+        if qtype == faiss.ScalarQuantizer.QT_fp16:
+            return "SQfp16"
+    return None
+
+
+def _layout(inner: faiss.Index) -> Optional[str]:
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(inner, (faiss.IndexFlat, faiss.IndexScalarQuantizer)):
+        return "flat"
+    return None
+
+
+def plan(index: faiss.Index, layout: str | None = None, force: bool = False) -> Optional[str]:
+    """Return the factory string to promote ``index`` to, or ``None``.
+
+    Flat indexes are promoted to ``layout`` and IVF indexes re-sized as
+    they grow; an existing layout is only switched with ``force``, which
+    also ignores the size threshold.
+    """
+    layout = layout or PROMOTE_LAYOUT
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown index layout {layout!r}")
+    if not is_id_mapped(index):
+        return None
+    n = index.ntotal
+    if n < PROMOTE_AT and not force:
+        return None
+    inner = faiss.downcast_index(index.index)
+    current, codec = _layout(inner), _codec(inner)
+    if current is None or codec is None:
+        return None
+    nlist = ideal_nlist(n)
+    grown = current == layout == "ivf" and nlist >= PROMOTE_GROWTH * inner.nlist
+    if not (current == "flat" or grown or (force and current != layout)):
+        return None
+    if layout == "hnsw":
+        return f"HNSW{HNSW_M},{codec}"
+    return f"IVF{nlist},{codec}"
+
+
+def promote(
+    index: faiss.Index, factory: str, sample_size: int = TRAIN_SIZE, seed: int = 0
+) -> Tuple[faiss.Index, dict]:
+    """Rebuild the ID-mapped ``index`` as ``factory``.
+
+    The new layout is trained on ``sample_size`` vectors drawn uniformly from
+    the whole index (more when an IVF layout needs them for ~39 points per
+    list), then every vector is copied over under its id. Returns the new
+    index and a description for the info side-car.
+    """
+    started = time.time()
+    inner = faiss.downcast_index(index.index)
+    if isinstance(inner, faiss.IndexIVF):
+        inner.make_direct_map()
+    n, d = inner.ntotal, inner.d
+    ids = faiss.vector_to_array(index.id_map)
+
+    new_inner = faiss.index_factory(d, factory, inner.metric_type)
+    sample = 0
+    if not new_inner.is_trained:
+        if isinstance(new_inner, faiss.IndexIVF):
+            sample_size = max(sample_size, _POINTS_PER_LIST * new_inner.nlist)
+        rng = np.random.default_rng(seed)
+        picks = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+        parts = []
+        for start in range(0, n, _BLOCK):
+            sel = picks[(picks >= start) & (picks < start + _BLOCK)] - start
+            if len(sel):
+                parts.append(inner.reconstruct_n(start, min(_BLOCK, n - start))[sel])
+        train = np.vstack(parts)
+        sample = len(train)
+        new_inner.train(train)
+
+    info = {"layout": "hnsw" if factory.startswith("HNSW") else "ivf", "factory": factory}
+    if isinstance(new_inner, faiss.IndexIVF):
+        new_inner.nprobe = min(new_inner.nlist, DEFAULT_NPROBE)
+        info["nprobe"] = new_inner.nprobe
+    else:
+        new_inner.hnsw.efSearch = HNSW_EF_SEARCH
+        info["ef_search"] = HNSW_EF_SEARCH
+
+    promoted = faiss.IndexIDMap2(new_inner)
+    for start in range(0, n, _BLOCK):
+        count = min(_BLOCK, n - start)
+        promoted.add_with_ids(inner.reconstruct_n(start, count), ids[start : start + count])
+
+    info.update(promoted_at=int(n), trained_on=int(sample))
+    logger.info(
+        "promoted index: %d vectors (threshold %d) -> %s, trained on %d, %s, %.1fs",
+        n,
+        PROMOTE_AT,
+        factory,
+        sample,
+        ", ".join(f"{k}={info[k]}" for k in ("nprobe", "ef_search") if k in info),
+        time.time() - started,
+    )
+    return promoted, info
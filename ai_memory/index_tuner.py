@@ -0,0 +1,241 @@
+"""
+Search-time parameter tuning
+----------------------------
+IVF and HNSW indexes trade recall for speed through one knob each
+(``nprobe`` / ``efSearch``); an index built from a ``--factory`` string
+runs with the FAISS defaults (``nprobe=1``, ``efSearch=16``) unless told
+otherwise. ``aimem tune-index`` picks the knob for a latency budget:
+
+1. sample stored memories and embed their texts as queries
+2. compute the exact top-k of each query over the full-precision vectors
+   (the ``exact_vectors`` side file, or the index's own reconstruction)
+3. sweep the knob upwards, timing one query at a time, and record
+   recall@k and p50 / p95 latency of every setting
+4. keep the setting with the best recall whose p95 meets the target (the
+   fastest one if none does)
+
+The choice is saved as ``search_params`` in the info side-car, and
+``VectorMemory.load`` applies it to the index it opens.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from . import exact_vectors, index_info
+
+logger = logging.getLogger(__name__)
+
+TARGET_P95_MS = 10.0
+TUNE_QUERIES = 200
+TUNE_K = 10
+
+EF_SEARCH_VALUES = (16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512)
+_MAX_NPROBE = 1024
+_BLOCK = 65536
+
+
+def _tunable(index: faiss.Index) -> Tuple[Optional[str], Optional[faiss.Index]]:
+    """Return the search knob of ``index`` and the index that holds it."""
+    inner = faiss.downcast_index(index)
+    while True:
+        if isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            inner = faiss.downcast_index(inner.index)
+        elif isinstance(inner, faiss.IndexRefine):
+            inner = faiss.downcast_index(inner.base_index)
+        else:
+            break
+    if isinstance(inner, faiss.IndexIVF):
+        return "nprobe", inner
+    if isinstance(inner, faiss.IndexHNSW):
+        return "efSearch", inner
+    return None, None
+
+
+def get_params(index: faiss.Index) -> Dict[str, int]:
+    """Return the current search parameters of ``index`` (``{}`` if none)."""
+    knob, holder = _tunable(index)
+    if knob == "nprobe":
+        return {"nprobe": int(holder.nprobe)}
+    if knob == "efSearch":
+        return {"efSearch": int(holder.hnsw.efSearch)}
+    return {}
+
+
+def apply_params(index: faiss.Index, params: Dict[str, int] | None) -> Dict[str, int]:
+    """Set the parameters in ``params`` that apply to ``index``; return them."""
+    knob, holder = _tunable(index)
+    if not params or knob not in params:
+        return {}
+    value = int(params[knob])
+    if knob == "nprobe":
+        holder.nprobe = min(value, holder.nlist)
+    else:
+        holder.hnsw.efSearch = value
+    return get_params(index)
+
+
+def sweep_values(index: faiss.Index, k: int) -> List[int]:
+    """Return the knob settings to try, cheapest first."""
+    knob, holder = _tunable(index)
+    if knob == "nprobe":
+        top = min(holder.nlist, _MAX_NPROBE)
+        values = [1 << i for i in range(top.bit_length()) if 1 << i <= top]
+        return values if values[-1] == top else values + [top]
+    if knob == "efSearch":
+        return sorted({max(k, v) for v in EF_SEARCH_VALUES})
+    return []
+
+
+def exact_neighbours(
+    vectors: np.ndarray, queries: np.ndarray, k: int, metric: int
+) -> np.ndarray:
+    """Return the rows of the exact top ``k`` of every query, best first.
+
+    ``vectors`` may be a memory-mapped array; it is scanned in blocks.
+    """
+    best_d = best_i = None
+    for start in range(0, len(vectors), _BLOCK):
+        block = np.ascontiguousarray(vectors[start : start + _BLOCK], dtype="float32")
+        D, I = faiss.knn(queries, block, min(k, len(block)), metric=metric)
+        I = I + start
+        if best_d is None:
+            best_d, best_i = D, I
+            continue
+        D, I = np.hstack([best_d, D]), np.hstack([best_i, I])
+        order = np.argsort(D if metric == faiss.METRIC_L2 else -D, axis=1, kind="stable")[:, :k]
+        best_d, best_i = np.take_along_axis(D, order, 1), np.take_along_axis(I, order, 1)
+    return best_i
+
+
+def measure(
+    index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int
+) -> Dict[str, float]:
+    """Return recall@k and per-query latency of ``index`` at its current settings."""
+    index.search(queries[:1], k)  # warm up
+    found = np.empty((len(queries), k), dtype="int64")
+    times = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        found[i] = index.search(queries[i : i + 1], k)[1][0]
+        times[i] = time.perf_counter() - start
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    return {
+        f"recall_at_{k}": round(hits / float(truth.size), 4),
+        "p50_ms": round(float(np.percentile(times, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(times, 95)) * 1000, 3),
+    }
+
+
+def tune(
+    index: faiss.Index,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int = TUNE_K,
+    target_p95_ms: float = TARGET_P95_MS,
+) -> Tuple[Dict[str, int], List[dict]]:
+    """Sweep the search knob of ``index`` and pick a setting for the target.
+
+    ``truth`` holds the ids of the exact top ``k`` of every query. Returns
+    the chosen parameters (applied to ``index``) and every measured point.
+    The sweep stops once recall reaches 1.0 or p95 exceeds four times the
+    target.
+    """
+    knob, _ = _tunable(index)
+    if knob is None:
+        raise ValueError("only IVF and HNSW indexes have search parameters to tune")
+    previous = get_params(index)
+    points: List[dict] = []
+    for value in sweep_values(index, k):
+        apply_params(index, {knob: value})
+        point = {knob: value, **measure(index, queries, truth, k)}
+        points.append(point)
+        logger.info("%s=%d: %s", knob, value, point)
+        if point[f"recall_at_{k}"] >= 1.0 or point["p95_ms"] > 4 * target_p95_ms:
+            break
+    within = [p for p in points if p["p95_ms"] <= target_p95_ms]
+    if within:
+        best = max(within, key=lambda p: (p[f"recall_at_{k}"], -p["p95_ms"]))
+    else:
+        logger.warning("no %s meets p95 <= %.1f ms; using the fastest", knob, target_p95_ms)
+        best = min(points, key=lambda p: p["p95_ms"], default=None)
+    if best is None:
+        apply_params(index, previous)
+        return previous, points
+    return apply_params(index, {knob: best[knob]}), points
+
+
+def _sample_texts(index_file: Path, n: int, rng: np.random.Generator) -> List[str]:
+    from .text_store import TextStore
+    from .vector_embedder import _read_meta
+
+    if TextStore.exists(index_file):
+        store = TextStore(index_file)
+        rows = rng.choice(len(store), size=min(n, len(store)), replace=False)
+        texts = [store.text(int(i)) for i in rows]
+    else:
+        meta = _read_meta(index_file.with_suffix(".pkl"))
+        rows = rng.choice(len(meta), size=min(n, len(meta)), replace=False) if meta else []
+        texts = [meta[int(i)].get("text", "") for i in rows]
+    return [t for t in texts if t.strip()]
+
+
+def _full_vectors(index_file: Path, index: faiss.Index) -> np.ndarray:
+    """Full-precision vectors of ``index`` in insertion order."""
+    vecs = exact_vectors.read_vectors(index_file, index.ntotal)
+    if vecs is not None:
+        return vecs
+    if not exact_vectors.lossless(index):
+        logger.warning("No exact vectors for %s; recall is measured against its own codes", index_file)
+    from .vector_ids import _reconstruct_all
+
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        inner = inner.index
+    return _reconstruct_all(inner)
+
+
+def tune_index(
+    index_path: str,
+    target_p95_ms: float = TARGET_P95_MS,
+    k: int = TUNE_K,
+    n_queries: int = TUNE_QUERIES,
+    seed: int = 0,
+) -> dict:
+    """Tune the index at ``index_path`` and save the result in its info side-car.
+
+    Returns the ``tuning`` record written (chosen parameters and the sweep).
+    """
+    from .vector_embedder import _embed_texts, set_model
+
+    index_file = Path(index_path)
+    index = faiss.read_index(str(index_file))
+    if _tunable(index)[0] is None:
+        raise ValueError(f"{index_file} is a flat index; it has no search parameters to tune")
+    info = index_info.read_info(index_file)
+    set_model(info.get("model"))
+    texts = _sample_texts(index_file, n_queries, np.random.default_rng(seed))
+    if not texts:
+        raise ValueError(f"{index_file} has no stored texts to sample queries from")
+    queries = np.ascontiguousarray(_embed_texts(texts), dtype="float32")
+    k = min(k, index.ntotal)
+
+    rows = exact_neighbours(_full_vectors(index_file, index), queries, k, index.metric_type)
+    truth = exact_vectors.index_keys(index)[rows]
+    params, points = tune(index, queries, truth, k, target_p95_ms)
+    chosen = next((p for p in points if all(p.get(key) == v for key, v in params.items())), {})
+    tuning = {
+        "target_p95_ms": target_p95_ms,
+        "k": k,
+        "queries": len(queries),
+        "chosen": chosen,
+        "sweep": points,
+    }
+    index_info.update_info(index_file, search_params=params, tuning=tuning)
+    return tuning
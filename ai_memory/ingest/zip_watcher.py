@@ -16,6 +16,7 @@ def process_zip(
     model: str | None,
     no_meta: bool,
     verbose: bool = False,
+    workers: int = 0,
 ) -> None:
     dest_dir = dest_root / zip_path.stem
     if dest_dir.exists():
@@ -30,7 +31,7 @@ def process_zip(
         if verbose:
             print(f"[+] Importing {mem_file.name}")
         try:
-            cli_import(str(mem_file))
+            cli_import([str(mem_file)])
         except SystemExit as exc:
             if exc.code != 0:
                 raise RuntimeError(f"aimem import failed: exit code {exc.code}") from exc
@@ -38,30 +39,34 @@ def process_zip(
     text_logs = list(dest_dir.rglob("*.md"))
     json_logs = [p for p in dest_dir.rglob("*.json") if not p.name.endswith("memory.json")]
 
-    for log_file in text_logs + json_logs:
-        if verbose:
-            print(f"[+] Vectorizing {log_file}")
-        json_extract = "messages" if log_file.suffix == ".json" else "auto"
-        args = [
-            str(log_file),
-            "--vector-index",
-            index,
-            "--model",
-            model if model is not None else DEFAULT_MODEL,
-            "--factory",
-            "Flat",
-            "--json-extract",
-            json_extract,
-        ]
-        if no_meta:
-            args.append("--no-meta")
-        if verbose:
-            args.append("--verbose")
-        try:
-            cli_vectorize(args)
-        except SystemExit as exc:
-            if exc.code != 0:
-                raise RuntimeError(f"aimem vectorize failed: exit code {exc.code}") from exc
+    log_files = text_logs + json_logs
+    if not log_files:
+        return
+    if verbose:
+        print(f"[+] Vectorizing {len(log_files)} log files")
+    # one session per archive: the index is loaded and written once
+    args = [
+        *(str(p) for p in log_files),
+        "--vector-index",
+        index,
+        "--model",
+        model if model is not None else DEFAULT_MODEL,
+        "--factory",
+        "Flat",
+        "--json-extract",
+        "messages",
+    ]
+    if workers:
+        args += ["--workers", str(workers)]
+    if no_meta:
+        args.append("--no-meta")
+    if verbose:
+        args.append("--verbose")
+    try:
+        cli_vectorize(args)
+    except SystemExit as exc:
+        if exc.code != 0:
+            raise RuntimeError(f"aimem vectorize failed: exit code {exc.code}") from exc
 
 
 def scan(
@@ -71,12 +76,13 @@ def scan(
     model: str | None,
     no_meta: bool,
     verbose: bool = False,
+    workers: int = 0,
 ) -> int:
     processed = 0
     for zip_file in src.glob("*.zip"):
         if not (dest / zip_file.stem).exists():
             processed += 1
-        process_zip(zip_file, dest, index, model, no_meta, verbose)
+        process_zip(zip_file, dest, index, model, no_meta, verbose, workers)
     return processed
 
 
@@ -86,6 +92,7 @@ def main(argv: list[str] | None = None) -> None:
     parser.add_argument("--dest", default="~/chatlogs", help="Destination directory for extracted logs")
     parser.add_argument("--index", default=None, help="Vector index path for vectorize")
     parser.add_argument("--model", default=None, help="Embedding model for vectorize")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel log parsing processes")
     parser.add_argument("--no-meta", action="store_true", help="Skip metadata file")
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
     args = parser.parse_args(argv)
@@ -94,7 +101,9 @@ def main(argv: list[str] | None = None) -> None:
     dest = Path(args.dest).expanduser()
     src.mkdir(parents=True, exist_ok=True)
     dest.mkdir(parents=True, exist_ok=True)
-    processed = scan(src, dest, args.index, args.model, args.no_meta, args.verbose)
+    processed = scan(
+        src, dest, args.index, args.model, args.no_meta, args.verbose, args.workers
+    )
     if processed == 0:
         if args.verbose:
             print("[ℹ] Nothing new to ingest.")
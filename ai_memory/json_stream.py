@@ -0,0 +1,165 @@
+"""
+Incremental JSON reader for large chat exports
+----------------------------------------------
+``json.load`` on a multi-GB ``conversations.json`` materialises the whole
+document as Python objects. The reader here walks only the outer one or two
+container levels itself and hands each element to ``JSONDecoder.raw_decode``
+so at most one conversation is held in memory at a time.
+
+* ``iter_top_level(path)``     -> ``(key, value)`` events for the outer level;
+                                  a ``"conversations"`` array is expanded
+                                  element by element
+* ``iter_conversations(path)`` -> each conversation of a ChatGPT / Claude
+                                  export or of ``{"conversations": [...]}``
+* No third-party dependencies
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+_CHUNK = 1 << 20
+_WS = " \t\n\r"
+# only characters that may still belong to a number up to the buffer end
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+
+class _Reader:
+    """Pull-based tokenizer over a text stream."""
+
+    def __init__(self, fp, chunk_size: int = _CHUNK) -> None:
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int | None = None) -> bool:
+        if self.eof:
+            return False
+        if self.pos >= self.chunk_size:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        data = self.fp.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def _error(self, msg: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(msg, self.buf, self.pos)
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise self._error(f"Expecting {ch!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode one complete JSON value at the current position."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # incomplete value: grow the buffer geometrically and retry
+                if not self._fill(max(self.chunk_size, len(self.buf) - self.pos)):
+                    raise
+                continue
+            if _NUMBER_TAIL.match(self.buf, end) and self._fill():
+                # a number may continue past the buffer end ("1." or "-2.5e"
+                # decode as their integer prefix)
+                continue
+            self.pos = end
+            return obj
+
+    def iter_array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            sep = self.peek()
+            self.pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise self._error("Expecting ',' delimiter")
+
+    def iter_keys(self) -> Iterator[str]:
+        """Yield object keys; the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("Expecting property name")
+            key = self.value()
+            self.expect(":")
+            yield key
+            sep = self.peek()
+            self.pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise self._error("Expecting ',' delimiter")
+
+
+def iter_top_level(
+    path: str | Path, chunk_size: int = _CHUNK
+) -> Iterator[Tuple[Optional[str], Any]]:
+    """Yield ``(key, value)`` for the outer level of the document at ``path``.
+
+    Array elements have key ``None``. A ``"conversations"`` array inside a
+    top-level object is expanded, yielding one event per conversation.
+    Scalar documents yield nothing.
+    """
+    with open(path, "r", encoding="utf-8") as fp:
+        reader = _Reader(fp, chunk_size)
+        first = reader.peek()
+        if first == "[":
+            for item in reader.iter_array():
+                yield None, item
+        elif first == "{":
+            for key in reader.iter_keys():
+                if key == "conversations" and reader.peek() == "[":
+                    for item in reader.iter_array():
+                        yield key, item
+                else:
+                    yield key, reader.value()
+        else:
+            reader.value()
+
+
+def iter_conversations(path: str | Path, chunk_size: int = _CHUNK) -> Iterator[Any]:
+    """Yield the conversations of an export one at a time.
+
+    Handles a top-level list of conversations, ``{"conversations": [...]}``
+    and a single conversation object.
+    """
+    single: dict = {}
+    nested = False
+    for key, value in iter_top_level(path, chunk_size):
+        if key is None or key == "conversations":
+            nested = nested or key == "conversations"
+            yield value
+        else:
+            single[key] = value
+    if single and not nested:
+        yield single
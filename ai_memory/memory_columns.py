@@ -0,0 +1,152 @@
+"""
+Columnar memories for vectorised scoring
+----------------------------------------
+``RelevanceEngine`` scores every candidate memory per query. Doing that
+one ``Memory`` object at a time costs a ``datetime`` subtraction, a few
+``math`` calls and a dict per memory; ``MemoryColumns`` holds the fields
+the score depends on as NumPy columns instead, so the whole set is scored
+with a handful of array operations:
+
+  created       float64  seconds since the epoch (NaN = unknown)
+  access_count  int64
+  importance    float64
+  kind          int16    code into ``kinds`` (the memory ``type``)
+  token_cost    int64    ``rough_token_len`` of the content
+
+``MemoryStore.columns`` fills the columns straight from SQL (timestamps
+are converted by SQLite, not parsed per row, and the token cost is the
+``token_estimate`` stored with each fragment); ``from_memories`` wraps an
+existing ``{id: Memory}`` mapping. ``memory(i)`` builds the ``Memory`` of
+one row, so only the rows that are kept are ever materialised.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .memory import Memory
+from .memory_db import rough_token_len
+
+
+def _encode(values: Iterable[str], codes: Dict[str, int]) -> np.ndarray:
+    return np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype="int16")
+
+
+class MemoryColumns:
+    """Struct-of-arrays view of a set of memories."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        contents: List[str],
+        projects: List[Optional[str]],
+        created: np.ndarray,
+        access_count: np.ndarray,
+        importance: np.ndarray,
+        kind: np.ndarray,
+        kinds: Dict[str, int],
+        token_cost: np.ndarray,
+        memories: Optional[List[Memory]] = None,
+    ) -> None:
+        self.ids = ids
+        self.contents = contents
+        self.projects = projects
+        self.created = created
+        self.access_count = access_count
+        self.importance = importance
+        self.kind = kind
+        self.kinds = kinds
+        self.token_cost = token_cost
+        self._memories = memories
+        self._position: Optional[Dict[str, int]] = None
+        self._kind_names: Optional[Dict[int, str]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def position(self) -> Dict[str, int]:
+        """``mem_id -> row`` (built on first use)."""
+        if self._position is None:
+            self._position = dict(zip(self.ids, range(len(self.ids))))
+        return self._position
+
+    def kind_values(self, table: Dict[str, float], default: float = 0.0) -> np.ndarray:
+        """Map every row's ``kind`` through ``table``."""
+        lookup = np.full(max(len(self.kinds), 1), default, dtype="float64")
+        for name, code in self.kinds.items():
+            lookup[code] = table.get(name, default)
+        return lookup[self.kind]
+
+    def memory(self, row: int) -> Memory:
+        """Return the ``Memory`` of ``row``."""
+        if self._memories is not None:
+            return self._memories[row]
+        created = self.created[row]
+        ts = (
+            datetime.now(tz=timezone.utc)
+            if np.isnan(created)
+            else datetime.fromtimestamp(float(created), tz=timezone.utc)
+        )
+        if self._kind_names is None:
+            self._kind_names = {code: name for name, code in self.kinds.items()}
+        return Memory(
+            memory_id=self.ids[row],
+            content=self.contents[row],
+            timestamp=ts,
+            type=self._kind_names[int(self.kind[row])],
+            project_id=self.projects[row],
+            importance_weight=float(self.importance[row]),
+            entities=set(),
+            access_count=int(self.access_count[row]),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple]) -> "MemoryColumns":
+        """Build from ``(mem_id, conv_id, content, importance, epoch, source_type,
+        access_count, token_estimate)`` rows.
+
+        Rows without a stored estimate are estimated here.
+        """
+        n = len(rows)
+        cols = list(zip(*rows)) if rows else [()] * 8
+        ids, projects, contents, importance, created, types, access, tokens = (list(c) for c in cols)
+        contents = [c or "" for c in contents]
+        kinds: Dict[str, int] = {}
+        return cls(
+            ids=ids,
+            contents=contents,
+            projects=projects,
+            created=np.array([np.nan if t is None else t for t in created], dtype="float64").reshape(n),
+            access_count=np.array([a or 0 for a in access], dtype="int64").reshape(n),
+            importance=np.array([i or 0.0 for i in importance], dtype="float64").reshape(n),
+            kind=_encode(types, kinds),
+            kinds=kinds,
+            token_cost=np.fromiter(
+                (rough_token_len(c) if t is None else t for c, t in zip(contents, tokens)),
+                dtype="int64",
+                count=n,
+            ),
+        )
+
+    @classmethod
+    def from_memories(cls, memories: Dict[str, Memory]) -> "MemoryColumns":
+        """Wrap ``{id: Memory}``; ``memory(i)`` returns the original objects."""
+        items = list(memories.values())
+        n = len(items)
+        kinds: Dict[str, int] = {}
+        return cls(
+            ids=list(memories),
+            contents=[m.content for m in items],
+            projects=[m.project_id for m in items],
+            created=np.fromiter((m.timestamp.timestamp() for m in items), dtype="float64", count=n),
+            access_count=np.fromiter((m.access_count for m in items), dtype="int64", count=n),
+            importance=np.fromiter((m.importance_weight for m in items), dtype="float64", count=n),
+            kind=_encode((m.type for m in items), kinds),
+            kinds=kinds,
+            token_cost=np.fromiter((rough_token_len(m.content) for m in items), dtype="int64", count=n),
+            memories=items,
+        )
@@ -13,6 +13,23 @@ Schema overview
   messages             <- every assistant / user line
   entities             <- canonicalised entities (person, date, url...)
   memory_fragments     <- compressed chunks used by the optimiser
+  memory_fragments_fts <- FTS5 index over memory_fragments.content (BM25)
+  memory_fragments_tri <- FTS5 trigram index over the same content (LIKE)
+
+Fragments also carry their embedding (float16 blob, see fragment_vectors).
+Changing the content clears it. Writing an embedding bumps
+``fragment_embeddings.version`` and stamps the row's ``embed_seq`` with it;
+clearing or deleting one also bumps ``fragment_embeddings.removed``. Readers
+append the rows past the version they loaded and reload only on removals.
+The fragment indexes on created_at, importance, conv_id, msg_id and
+source_type serve the candidate lookups of ``MemoryStore.candidates``.
+
+The FTS5 tables are external-content: they store only the inverted index
+and are kept in sync with ``memory_fragments`` by insert / delete / update
+triggers. The trigram table answers ``LIKE '%text%'`` for text of three or
+more characters without scanning every row. Builds of SQLite without FTS5
+(or without the trigram tokenizer, before 3.34) simply go without them and
+callers fall back to scanning.
 """
 
 from __future__ import annotations
@@ -25,7 +42,7 @@ import uuid
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 # ---------------------------------------------------------------------
 #  CONFIG
@@ -107,7 +124,10 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
             source_type     TEXT,
             token_estimate  INTEGER,
             created_at      TEXT,
-            access_count    INTEGER DEFAULT 0
+            access_count    INTEGER DEFAULT 0,
+            embedding       BLOB,
+            embed_model     TEXT,
+            embed_seq       INTEGER
         );
         """
     )
@@ -124,6 +144,215 @@ def _ensure_schema(conn: sqlite3.Connection) -> None:
         conn.execute(
             "ALTER TABLE memory_fragments ADD COLUMN access_count INTEGER DEFAULT 0"
         )
+    if "embedding" not in cols:
+        conn.execute("ALTER TABLE memory_fragments ADD COLUMN embedding BLOB")
+    if "embed_model" not in cols:
+        conn.execute("ALTER TABLE memory_fragments ADD COLUMN embed_model TEXT")
+    if "embed_seq" not in cols:
+        conn.execute("ALTER TABLE memory_fragments ADD COLUMN embed_seq INTEGER")
+    state = {row[1] for row in conn.execute("PRAGMA table_info(fragment_embeddings)")}
+    if state and "removed" not in state:
+        conn.execute("ALTER TABLE fragment_embeddings ADD COLUMN removed INTEGER NOT NULL DEFAULT 0")
+    conn.executescript(_EMBEDDING_SCHEMA)
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(memory_fragments)")}
+    for name, columns in _FRAGMENT_INDEXES.items():
+        # very old tables may lack a column; they just go without that index
+        if set(columns) <= cols:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON memory_fragments({', '.join(columns)})"
+            )
+    _ensure_fts(conn)
+    _ensure_trigram(conn)
+
+
+_FRAGMENT_INDEXES = {
+    "idx_memory_fragments_created": ("created_at",),
+    "idx_memory_fragments_importance": ("importance",),
+    "idx_memory_fragments_conv": ("conv_id", "created_at"),
+    "idx_memory_fragments_msg": ("msg_id",),
+    "idx_memory_fragments_type": ("source_type",),
+    "idx_memory_fragments_embed_seq": ("embed_seq",),
+}
+
+
+_EMBEDDING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragment_embeddings (
+    id       INTEGER PRIMARY KEY CHECK (id = 0),
+    version  INTEGER NOT NULL,
+    removed  INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO fragment_embeddings (id, version) VALUES (0, 0);
+
+DROP TRIGGER IF EXISTS memory_fragments_embedding_update;
+DROP TRIGGER IF EXISTS memory_fragments_embedding_insert;
+DROP TRIGGER IF EXISTS memory_fragments_embedding_delete;
+
+CREATE TRIGGER IF NOT EXISTS memory_fragments_embedding_stale
+AFTER UPDATE OF content ON memory_fragments
+WHEN new.embedding IS NOT NULL BEGIN
+    UPDATE memory_fragments SET embedding = NULL, embed_model = NULL WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS memory_fragments_embedding_written
+AFTER UPDATE OF embedding ON memory_fragments
+WHEN new.embedding IS NOT NULL BEGIN
+    UPDATE fragment_embeddings SET version = version + 1 WHERE id = 0;
+    UPDATE memory_fragments SET embed_seq = (SELECT version FROM fragment_embeddings WHERE id = 0)
+    WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS memory_fragments_embedding_inserted
+AFTER INSERT ON memory_fragments
+WHEN new.embedding IS NOT NULL BEGIN
+    UPDATE fragment_embeddings SET version = version + 1 WHERE id = 0;
+    UPDATE memory_fragments SET embed_seq = (SELECT version FROM fragment_embeddings WHERE id = 0)
+    WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS memory_fragments_embedding_cleared
+AFTER UPDATE OF embedding ON memory_fragments
+WHEN new.embedding IS NULL AND old.embedding IS NOT NULL BEGIN
+    UPDATE fragment_embeddings SET version = version + 1, removed = removed + 1 WHERE id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS memory_fragments_embedding_deleted
+AFTER DELETE ON memory_fragments
+WHEN old.embedding IS NOT NULL BEGIN
+    UPDATE fragment_embeddings SET version = version + 1, removed = removed + 1 WHERE id = 0;
+END;
+"""
+
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE memory_fragments_fts USING fts5(
+    content,
+    content='memory_fragments',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER memory_fragments_fts_insert AFTER INSERT ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
+
+CREATE TRIGGER memory_fragments_fts_delete AFTER DELETE ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_fts (memory_fragments_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+END;
+
+CREATE TRIGGER memory_fragments_fts_update AFTER UPDATE OF content ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_fts (memory_fragments_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+    INSERT INTO memory_fragments_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
+"""
+
+
+def _ensure_fts(conn: sqlite3.Connection) -> bool:
+    """Create and backfill the FTS5 index; return False if FTS5 is unavailable."""
+    if has_fts(conn):
+        return True
+    try:
+        conn.executescript(_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        return False
+    # index the fragments written before the table existed
+    conn.execute("INSERT INTO memory_fragments_fts (memory_fragments_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='memory_fragments_fts'"
+    ).fetchone()
+    return row is not None
+
+
+_TRIGRAM_SCHEMA = """
+CREATE VIRTUAL TABLE memory_fragments_tri USING fts5(
+    content,
+    content='memory_fragments',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER memory_fragments_tri_insert AFTER INSERT ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_tri (rowid, content) VALUES (new.rowid, new.content);
+END;
+
+CREATE TRIGGER memory_fragments_tri_delete AFTER DELETE ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_tri (memory_fragments_tri, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+END;
+
+CREATE TRIGGER memory_fragments_tri_update AFTER UPDATE OF content ON memory_fragments BEGIN
+    INSERT INTO memory_fragments_tri (memory_fragments_tri, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+    INSERT INTO memory_fragments_tri (rowid, content) VALUES (new.rowid, new.content);
+END;
+"""
+
+
+def _ensure_trigram(conn: sqlite3.Connection) -> bool:
+    """Create and backfill the trigram index; return False if unsupported."""
+    if has_trigram(conn):
+        return True
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.tri_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.tri_probe")
+    except sqlite3.OperationalError:
+        return False
+    conn.executescript(_TRIGRAM_SCHEMA)
+    conn.execute("INSERT INTO memory_fragments_tri (memory_fragments_tri) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def has_trigram(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='memory_fragments_tri'"
+    ).fetchone()
+    return row is not None
+
+
+_FTS_TERMS = 32
+
+
+def fts_query(text: str) -> str:
+    """Return an FTS5 MATCH expression for free ``text`` ("" if it has no words).
+
+    Words are quoted so user text never reaches the FTS5 syntax. Any word
+    may match; BM25 ranks documents with more and rarer words first.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return ""
+    unique = list(dict.fromkeys(words))[:_FTS_TERMS]
+    return " OR ".join(f'"{w}"' for w in unique)
+
+
+def search_fragments(
+    conn: sqlite3.Connection, text: str, limit: int = 50
+) -> List[Tuple[str, float]]:
+    """Return ``(mem_id, bm25)`` of the fragments best matching ``text``.
+
+    Higher scores are better (FTS5 reports BM25 negated). Empty when the
+    database has no FTS5 index or ``text`` has no words.
+    """
+    query = fts_query(text)
+    if not query or not has_fts(conn):
+        return []
+    rows = conn.execute(
+        """
+        SELECT mf.mem_id, -bm25(memory_fragments_fts)
+        FROM memory_fragments_fts
+        JOIN memory_fragments mf ON mf.rowid = memory_fragments_fts.rowid
+        WHERE memory_fragments_fts MATCH ?
+        ORDER BY bm25(memory_fragments_fts)
+        LIMIT ?
+        """,
+        (query, limit),
+    ).fetchall()
+    return [(mem_id, float(score)) for mem_id, score in rows]
 
 
 @contextmanager
@@ -173,12 +402,40 @@ def extract_entities(text: str) -> List[Tuple[str, str]]:
     return found
 
 
+def entity_ids(text: str) -> List[str]:
+    """Return the ``entities.entity_id`` keys of the entities in ``text``."""
+    return sorted({f"{etype}:{_canonical(value)}" for etype, value in extract_entities(text)})
+
+
+def entity_overlap(conn: sqlite3.Connection, ids: Iterable[str]) -> Dict[str, int]:
+    """Return ``mem_id -> number of ids`` mentioned by each fragment's message.
+
+    One grouped query: ``idx_message_entities_entity`` finds the mentions,
+    ``idx_memory_fragments_msg`` the fragments they belong to.
+    """
+    ids = list(ids)
+    if not ids:
+        return {}
+    rows = conn.execute(
+        f"""
+        SELECT mf.mem_id, COUNT(DISTINCT me.entity_id)
+        FROM message_entities me
+        JOIN memory_fragments mf ON mf.msg_id = me.msg_id
+        WHERE me.entity_id IN ({','.join('?' * len(ids))})
+        GROUP BY mf.mem_id
+        """,
+        ids,
+    ).fetchall()
+    return dict(rows)
+
+
 # ---------------------------------------------------------------------
 #  IMPORTER FROM JSON MEMORY FILES
 # ---------------------------------------------------------------------
 
 
 UNWANTED_SEGMENTS = {"venv", "node_modules", "site-packages", "__pycache__"}
+IMPORT_MAX_BYTES = int(os.getenv("AIMEM_IMPORT_MAX_BYTES", 1_000_000))
 
 
 def _load_json_files() -> Iterable[Path]:
@@ -189,7 +446,11 @@ def _load_json_files() -> Iterable[Path]:
             if any(seg in UNWANTED_SEGMENTS for seg in path.parts):
                 continue
             try:
-                if path.stat().st_size > 1_000_000:
+                size = path.stat().st_size
+                if size > IMPORT_MAX_BYTES:
+                    # single-memory files only; chat exports go through
+                    # `aimem vectorize`, which streams them
+                    print(f"[IMPORT] skipping {path}: {size} bytes > {IMPORT_MAX_BYTES}")
                     continue
             except OSError as exc:
                 print(f"[IMPORT] skipping {path}: {exc}")
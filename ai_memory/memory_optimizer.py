@@ -1,15 +1,15 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from .memory_store import MemoryStore
-from .relevance_engine import RelevanceEngine
+from .relevance_engine import SCORED_TOP, RelevanceEngine
 from .token_counter import TokenCounter
 from .context_builder import ContextBuilder
 
 
 class MemoryOptimizer:
-    def __init__(self) -> None:
-        self.memory_store = MemoryStore()
-        self.relevance_engine = RelevanceEngine()
+    def __init__(self, memory_store: Optional[MemoryStore] = None, vector_memory=None) -> None:
+        self.memory_store = memory_store if memory_store is not None else MemoryStore()
+        self.relevance_engine = RelevanceEngine(self.memory_store, vector_memory)
         self.token_counter = TokenCounter()
         self.context_builder = ContextBuilder(self.memory_store)
 
@@ -24,10 +24,11 @@ class MemoryOptimizer:
     ) -> str:
         budget = self._calculate_token_budget(model_spec)
 
-        scored = self.relevance_engine.score_all(
-            memories=self.memory_store.get_all(),
+        scored = self.relevance_engine.score_columns(
+            self.relevance_engine.select_candidates(current_task, conversation_id),
             task=current_task,
             conversation_id=conversation_id,
+            top=SCORED_TOP,
         )
 
         return self.context_builder.build_layers(
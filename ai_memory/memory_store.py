@@ -4,10 +4,11 @@ import os
 import sqlite3
 import uuid
 from datetime import datetime, timezone
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from .memory import Memory
+from .memory_columns import MemoryColumns
+from .store_paths import db_path as _db_path
 
 from .memory_db import (
     _ensure_schema,
@@ -16,19 +17,33 @@ from .memory_db import (
 )
 
 
-def _db_path() -> str:
-    """Return current SQLite DB path, creating directories if needed."""
-    root = Path(os.getenv("AI_MEMORY_ROOT", "~/ai_memory")).expanduser()
-    root.mkdir(parents=True, exist_ok=True)
-    return str(root / "ai_memory.db")
+# per-source caps of the candidate pool (see MemoryStore.candidates)
+CANDIDATE_LIMITS = {
+    "recent": int(os.getenv("AIMEM_CANDIDATES_RECENT", 500)),
+    "important": int(os.getenv("AIMEM_CANDIDATES_IMPORTANT", 200)),
+    "conversation": int(os.getenv("AIMEM_CANDIDATES_CONVERSATION", 300)),
+    "entity": int(os.getenv("AIMEM_CANDIDATES_ENTITY", 300)),
+    "essential": int(os.getenv("AIMEM_CANDIDATES_ESSENTIAL", 100)),
+}
+# memory types ContextBuilder always tries to place first
+ESSENTIAL_TYPES = ("core_identity", "active_project_state")
+
+_COLUMNS_SQL = """
+    SELECT mem_id, conv_id, content, importance,
+           (julianday(created_at) - 2440587.5) * 86400.0, source_type, access_count,
+           token_estimate
+    FROM memory_fragments
+"""
 
 
 class MemoryStore:
     """Thin wrapper around the SQLite backend."""
 
-    def __init__(self, conn: Optional[sqlite3.Connection] = None) -> None:
+    def __init__(
+        self, conn: Optional[sqlite3.Connection] = None, path: Optional[str] = None
+    ) -> None:
         if conn is None:
-            self.conn = sqlite3.connect(_db_path(), check_same_thread=False)
+            self.conn = sqlite3.connect(path or _db_path(), check_same_thread=False)
             _ensure_schema(self.conn)
         else:
             self.conn = conn
@@ -95,6 +110,67 @@ class MemoryStore:
         )
         self.conn.commit()
 
+    def columns(self) -> MemoryColumns:
+        """Return every fragment as ``MemoryColumns`` (no per-row objects)."""
+        cur = self.conn.cursor()
+        cur.execute(_COLUMNS_SQL)
+        return MemoryColumns.from_rows(cur.fetchall())
+
+    def candidates(
+        self,
+        conv_id: Optional[str] = None,
+        entity_ids: Iterable[str] = (),
+        mem_ids: Iterable[str] = (),
+        limits: Optional[Dict[str, int]] = None,
+    ) -> MemoryColumns:
+        """Return a bounded pool of fragments worth scoring for a query.
+
+        The pool is the union of the most recent and most important rows,
+        the latest rows of ``conv_id``, rows of the essential memory types,
+        rows whose message mentions one of ``entity_ids`` and the rows in
+        ``mem_ids`` (retriever hits). Every part is an index lookup capped
+        by ``limits`` (default ``CANDIDATE_LIMITS``), so the cost does not
+        grow with the size of the table.
+        """
+        limits = {**CANDIDATE_LIMITS, **(limits or {})}
+        parts = [
+            "SELECT rowid FROM (SELECT rowid FROM memory_fragments ORDER BY created_at DESC LIMIT ?)",
+            "SELECT rowid FROM (SELECT rowid FROM memory_fragments ORDER BY importance DESC LIMIT ?)",
+        ]
+        params: List[Any] = [limits["recent"], limits["important"]]
+        if conv_id:
+            parts.append(
+                "SELECT rowid FROM (SELECT rowid FROM memory_fragments WHERE conv_id = ? "
+                "ORDER BY created_at DESC LIMIT ?)"
+            )
+            params += [conv_id, limits["conversation"]]
+        parts.append(
+            "SELECT rowid FROM (SELECT rowid FROM memory_fragments WHERE source_type IN "
+            f"({','.join('?' * len(ESSENTIAL_TYPES))}) ORDER BY created_at DESC LIMIT ?)"
+        )
+        params += [*ESSENTIAL_TYPES, limits["essential"]]
+        entity_ids = list(entity_ids)
+        if entity_ids:
+            parts.append(
+                "SELECT rowid FROM (SELECT mf.rowid AS rowid FROM message_entities me "
+                "JOIN memory_fragments mf ON mf.msg_id = me.msg_id "
+                f"WHERE me.entity_id IN ({','.join('?' * len(entity_ids))}) "
+                "ORDER BY mf.created_at DESC LIMIT ?)"
+            )
+            params += [*entity_ids, limits["entity"]]
+        mem_ids = list(dict.fromkeys(mem_ids))
+        if mem_ids:
+            parts.append(
+                f"SELECT rowid FROM memory_fragments WHERE mem_id IN ({','.join('?' * len(mem_ids))})"
+            )
+            params += mem_ids
+        cur = self.conn.cursor()
+        cur.execute(
+            f"{_COLUMNS_SQL} WHERE rowid IN ({' UNION '.join(parts)}) ORDER BY rowid",
+            params,
+        )
+        return MemoryColumns.from_rows(cur.fetchall())
+
     def get_all(self) -> Dict[str, Memory]:
         cur = self.conn.cursor()
         cur.execute(
@@ -0,0 +1,162 @@
+"""
+Metadata column store for filtered vector search
+------------------------------------------------
+Filters on conversation, source type and timestamp are applied inside the
+FAISS search through an id selector, so a filtered query returns the best
+``top_k`` among matching vectors instead of over-fetching and discarding.
+
+``MetaColumns`` keeps one compact NumPy column per filterable field, aligned
+with the FAISS ids of the entries:
+
+  keys          int64    vector id (or list position for positional indexes)
+  timestamp     float64  seconds since the epoch
+  conversation  int32    code into ``conversations`` (-1 = unknown)
+  source_type   int16    code into ``source_types`` (-1 = unknown)
+
+``select`` evaluates a ``MetaFilter`` with vectorised comparisons and
+``search_params`` turns the surviving keys into ``SearchParameters`` for
+the index type at hand (IVF nprobe and HNSW efSearch are preserved).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+
+def source_type(source: Optional[str]) -> Optional[str]:
+    """Return the kind of input a memory came from (file suffix, lower case)."""
+    if not source:
+        return None
+    suffix = PurePath(source).suffix.lower().lstrip(".")
+    return suffix or "text"
+
+
+def _as_set(value: str | Iterable[str] | None) -> Optional[set]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return {value}
+    return set(value)
+
+
+@dataclass(frozen=True)
+class MetaFilter:
+    """Predicates a hit must match; ``None`` fields match everything."""
+
+    conversation: str | Tuple[str, ...] | None = None
+    source_type: str | Tuple[str, ...] | None = None
+    since: Optional[float] = None
+    until: Optional[float] = None
+
+    def __bool__(self) -> bool:
+        return any(
+            v is not None for v in (self.conversation, self.source_type, self.since, self.until)
+        )
+
+
+def _encode(
+    values: Iterable[Optional[str]], codes: Dict[str, int], dtype: str
+) -> np.ndarray:
+    return np.fromiter(
+        (-1 if v is None else codes.setdefault(v, len(codes)) for v in values), dtype=dtype
+    )
+
+
+class MetaColumns:
+    """Columnar copy of the filterable metadata of a vector store."""
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        timestamp: np.ndarray,
+        conversation: np.ndarray,
+        conversations: Dict[str, int],
+        source_type: np.ndarray,
+        source_types: Dict[str, int],
+    ) -> None:
+        self.keys = np.ascontiguousarray(keys, dtype="int64")
+        self.timestamp = np.asarray(timestamp, dtype="float64")
+        self.conversation = np.asarray(conversation, dtype="int32")
+        self.conversations = conversations
+        self.source_type = np.asarray(source_type, dtype="int16")
+        self.source_types = source_types
+
+    @classmethod
+    def from_entries(cls, keys: np.ndarray, entries: Sequence) -> "MetaColumns":
+        cols = cls(np.zeros(0), np.zeros(0), np.zeros(0), {}, np.zeros(0), {})
+        cols.extend(keys, entries)
+        return cols
+
+    def extend(self, keys: np.ndarray, entries: Sequence) -> None:
+        """Append the columns of ``entries`` (with FAISS ids ``keys``)."""
+        self.keys = np.concatenate([self.keys, np.asarray(keys, dtype="int64")])
+        timestamps = np.fromiter((float(e.timestamp or 0.0) for e in entries), "float64")
+        conversations = _encode((e.conversation for e in entries), self.conversations, "int32")
+        types = _encode((source_type(e.source) for e in entries), self.source_types, "int16")
+        self.timestamp = np.concatenate([self.timestamp, timestamps])
+        self.conversation = np.concatenate([self.conversation, conversations])
+        self.source_type = np.concatenate([self.source_type, types])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _codes_mask(self, column: np.ndarray, codes: Dict[str, int], wanted) -> np.ndarray:
+        found = [codes[w] for w in _as_set(wanted) if w in codes]
+        return np.isin(column, np.asarray(found, dtype=column.dtype))
+
+    def mask(self, flt: MetaFilter) -> np.ndarray:
+        """Return a boolean mask of the rows matching ``flt``."""
+        keep = np.ones(len(self.keys), dtype=bool)
+        if flt.conversation is not None:
+            keep &= self._codes_mask(self.conversation, self.conversations, flt.conversation)
+        if flt.source_type is not None:
+            keep &= self._codes_mask(self.source_type, self.source_types, flt.source_type)
+        if flt.since is not None:
+            keep &= self.timestamp >= flt.since
+        if flt.until is not None:
+            keep &= self.timestamp < flt.until
+        return keep
+
+    def select(self, flt: MetaFilter) -> np.ndarray:
+        """Return the keys of the rows matching ``flt``."""
+        return self.keys[self.mask(flt)]
+
+
+def search_params(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+    """Return search parameters restricting ``index`` to ``selector``.
+
+    The parameter type follows the wrapped index: ID maps pass them (with
+    the selector translated to internal ids) to the inner index, refine
+    wrappers to their base, and IVF / HNSW parameters carry the index's
+    current nprobe / efSearch so filtering does not reset them to the
+    FAISS defaults.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        # The ID map only translates a top-level ``sel``; selectors nested in
+        # refine base parameters would be checked against internal ids.
+        # Translating here serves both cases (the map leaves an already
+        # translated selector alone).
+        translated = faiss.IDSelectorTranslated(index.id_map, selector)
+        params = search_params(index.index, translated)
+        params.referenced_objects.append(selector)
+        return params
+    # the C++ structs do not own what they point to
+    refs: list = [selector]
+    if isinstance(index, faiss.IndexRefine):
+        base = search_params(index.base_index, selector)
+        refs.append(base)
+        params = faiss.IndexRefineSearchParameters(k_factor=index.k_factor, base_index_params=base)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    params.referenced_objects = refs
+    return params
@@ -3,7 +3,8 @@ import logging
 from pathlib import Path
 from typing import Dict, List
 
-from .vector_memory import MemoryEntry
+from .text_store import write_store
+from .vector_memory import MemoryEntry, VectorMemory
 
 logger = logging.getLogger(__name__)
 
@@ -27,3 +28,27 @@ def convert_list_to_dict_format(list_path: Path, dict_path: Path) -> int:
 
     logger.info(f"Converted {len(dict_data)} entries")
     return len(dict_data)
+
+
+def convert_to_text_store(path: Path) -> tuple[int, Path]:
+    """Write the text store for an index from its pickle metadata.
+
+    ``path`` is the index or one of its pickles; the list side-car
+    (``<stem>.pkl``) is preferred because it is in index order.
+    """
+    path = Path(path)
+    name = path.name
+    stem = name[: -len(".memories.pkl")] if name.endswith(".memories.pkl") else path.stem
+    candidates = [path.parent / f"{stem}.pkl", path.parent / f"{stem}.memories.pkl"]
+    if path.suffix == ".pkl":
+        candidates.insert(0, path)
+    source = next((c for c in candidates if c.exists()), None)
+    if source is None:
+        raise FileNotFoundError(f"no pickle metadata next to {path}")
+    with open(source, 'rb') as f:
+        entries = VectorMemory._entries_from_meta(pickle.load(f))
+
+    records = [vars(entry) for entry in entries]
+    target = write_store(path.parent / f"{stem}.index", records)
+    logger.info(f"Converted {len(records)} entries from {source} to {target}")
+    return len(records), target
@@ -1,4 +1,9 @@
-"""Model configuration for context budgets."""
+"""Model configuration for context budgets and the embedding model."""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 # Mapping of model names to their max context length and safety margin
 MODEL_CONFIGS = {
@@ -42,3 +47,36 @@ def get_model_budget(model_name: str, custom_limit: int | None = None) -> int:
     if budget < 0:
         budget = 0
     return budget
+
+
+# Sentence-transformers models for the vector index and their dimensions
+EMBED_MODELS = {
+    "BAAI/bge-large-en-v1.5": 1024,
+    "BAAI/bge-base-en-v1.5": 768,
+    "BAAI/bge-small-en-v1.5": 384,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+}
+EMBED_ALIASES = {
+    "bge-large": "BAAI/bge-large-en-v1.5",
+    "bge-base": "BAAI/bge-base-en-v1.5",
+    "bge-small": "BAAI/bge-small-en-v1.5",
+    "minilm": "sentence-transformers/all-MiniLM-L6-v2",
+}
+DEFAULT_EMBED_MODEL = "BAAI/bge-large-en-v1.5"
+
+
+def resolve_embed_model(name: str | None = None) -> str:
+    """Return the sentence-transformers model name to embed with.
+
+    ``None`` selects ``$AIMEM_EMBED_MODEL`` or bge-large. Short aliases such
+    as ``bge-small`` are expanded. Ollama tags (``llama3:70b-...``), which
+    older scripts pass to ``vectorize --model``, are not embedding models and
+    fall back to the default with a warning.
+    """
+    default = os.getenv("AIMEM_EMBED_MODEL") or DEFAULT_EMBED_MODEL
+    if not name:
+        name = default
+    elif ":" in name:
+        logger.warning("%s is not a sentence-transformers model; using %s", name, default)
+        name = default
+    return EMBED_ALIASES.get(name, name)
@@ -1,95 +1,273 @@
-import math
+import logging
 import os
 from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Hashable, List, Optional, Tuple
 
 import faiss
+import numpy as np
 
+from . import fragment_vectors
+from .fragment_vectors import FragmentMatrix
 from .memory import Memory
+from .memory_columns import MemoryColumns
+from .memory_db import entity_ids, entity_overlap, rough_token_len, search_fragments
 from .token_counter import TokenCounter
 from .vector_memory import VectorMemory
 
+logger = logging.getLogger(__name__)
+
+# share of query relevance given to BM25; the vector hits get the rest
+LEXICAL_WEIGHT = float(os.getenv("AIMEM_LEXICAL_WEIGHT", 0.5))
+# SQL memories fetched from the full-text index per task
+LEXICAL_CANDIDATES = int(os.getenv("AIMEM_LEXICAL_CANDIDATES", 50))
+# nearest stored embeddings added to the candidate pool per task
+SEMANTIC_CANDIDATES = int(os.getenv("AIMEM_SEMANTIC_CANDIDATES", 200))
+# memories materialised per query when scoring straight from the store
+SCORED_TOP = int(os.getenv("AIMEM_SCORED_TOP", 1000))
+
+TYPE_BONUS = {"error_solution": 12.0}
+
+
+def _fusion_weights(has_lexical: bool, has_vector: bool) -> Tuple[float, float]:
+    """Return the (lexical, vector) weights for the retrievers that found something."""
+    lexical = LEXICAL_WEIGHT if has_lexical else 0.0
+    vector = (1.0 - LEXICAL_WEIGHT) if has_vector else 0.0
+    total = lexical + vector
+    if not total:
+        return 0.0, 0.0
+    return lexical / total, vector / total
+
+
+def fuse_scores(
+    lexical: Dict[Hashable, float], vector: Dict[Hashable, float]
+) -> Dict[Hashable, float]:
+    """Weighted fusion of BM25 and vector similarity into ``[0, 1]``.
+
+    BM25 is scaled by the best score of the query; similarities are used
+    as they are. A retriever that found nothing gives its weight to the
+    other, so one that ran alone keeps its full scale.
+    """
+    w_lexical, w_vector = _fusion_weights(bool(lexical), bool(vector))
+    fused: Dict[Hashable, float] = {}
+    if lexical:
+        best = max(lexical.values()) or 1.0
+        for key, score in lexical.items():
+            fused[key] = w_lexical * max(score, 0.0) / best
+    for key, similarity in vector.items():
+        fused[key] = fused.get(key, 0.0) + w_vector * similarity
+    return fused
+
 
 class RelevanceEngine:
-    def __init__(self):
+    """Score memories for a task.
+
+    Query relevance fuses two retrievers (see ``fuse_scores``): BM25 over
+    the FTS5 index of the SQL memories (when a ``memory_store`` is given)
+    and vector similarity. The latter comes from the vector index and, for
+    SQL memories, from their stored embeddings (see ``fragment_vectors``):
+    one matrix-vector product over the candidates. Only the task is
+    embedded at query time; scoring never writes to the store.
+
+    Recency, access count, type and importance are computed over
+    ``MemoryColumns`` as array expressions rather than per memory; the
+    entities shared with the task are counted by one grouped SQL query
+    over ``message_entities``.
+    ``select_candidates`` narrows the store to a bounded pool first.
+    """
+
+    def __init__(self, memory_store=None, vector_memory=None):
+        self.memory_store = memory_store
         self.token_counter = TokenCounter()
-        self.vector_memory = VectorMemory()
+        self.vector_memory = vector_memory
+        if vector_memory is None:
+            self.vector_memory = VectorMemory()
+            try:
+                self.vector_memory.load()
+            except Exception:
+                self.vector_memory = None
+        self._fragments = None
+        self._query: Optional[Tuple[str, np.ndarray]] = None
+        self._lexical: Optional[Tuple[tuple, Dict[str, float]]] = None
+        if memory_store is not None:
+            model = self.vector_memory.model_name if self.vector_memory else None
+            self._fragments = FragmentMatrix(memory_store.conn, model)
+
+    def _lexical_scores(self, task: str) -> Dict[str, float]:
+        """Return ``mem_id -> BM25`` of the SQL memories matching ``task``."""
+        if self.memory_store is None or not task:
+            return {}
+        # reused between candidate selection and scoring of the same query
+        conn = self.memory_store.conn
+        # total_changes moves on our writes, data_version on other connections'
+        stamp = (task, conn.total_changes, conn.execute("PRAGMA data_version").fetchone()[0])
+        if self._lexical is None or self._lexical[0] != stamp:
+            self._lexical = (stamp, dict(search_fragments(conn, task, LEXICAL_CANDIDATES)))
+        return self._lexical[1]
+
+    def _entity_counts(self, task: str, columns: MemoryColumns) -> np.ndarray:
+        """Return the number of the task's entities each row mentions."""
+        counts = np.zeros(len(columns))
+        if self.memory_store is None or not task:
+            return counts
+        for memory_id, count in entity_overlap(self.memory_store.conn, entity_ids(task)).items():
+            row = columns.position.get(memory_id)
+            if row is not None:
+                counts[row] = count
+        return counts
+
+    def _task_vector(self, task: str) -> Optional[np.ndarray]:
+        """Return the embedding of ``task`` (``None`` without stored vectors)."""
+        if self._fragments is None or not task:
+            return None
         try:
-            self.vector_memory.load()
-        except Exception:
-            self.vector_memory = None
+            # candidate selection and scoring of one query embed the task once
+            if self._query is None or self._query[0] != task:
+                self._query = (task, fragment_vectors.embed([task], self._fragments.model)[0])
+        except Exception as exc:
+            logger.warning("semantic scoring of stored memories skipped: %s", exc)
+            return None
+        return self._query[1]
 
-    def _semantic_similarity(self, a: str, b: str) -> float:
-        """Placeholder for semantic similarity."""
-        return 0.5 if a and b else 0.0
+    def _semantic_scores(self, task: str, memory_ids: List[str]) -> np.ndarray:
+        """Return the cosine of each of ``memory_ids`` to ``task`` (NaN = no vector)."""
+        if not memory_ids:
+            return np.full(0, np.nan, dtype="float32")
+        query = self._task_vector(task)
+        if query is None:
+            return np.full(len(memory_ids), np.nan, dtype="float32")
+        return self._fragments.similarity_array(query, memory_ids)
 
-    def score_all(
-        self, memories: Dict[str, Memory], task: str, conversation_id: str
-    ) -> Dict[str, Dict[str, Any]]:
-        scores: Dict[str, Dict[str, Any]] = {}
-        current_project_id = None
-        current_entities = set()
+    def embed_pending(self, limit: int = fragment_vectors.BACKFILL_BATCH) -> int:
+        """Store embeddings for up to ``limit`` memories that lack one.
 
-        seen_texts = set()
+        Meant for background work (the daemon, ``aimem embed-fragments``);
+        scoring itself never writes. Returns the number embedded.
+        """
+        if self._fragments is None:
+            return 0
+        return fragment_vectors.backfill(self.memory_store.conn, self._fragments.model, limit)
 
-        for memory_id, memory in memories.items():
-            score = 0.0
+    def select_candidates(self, task: str, conversation_id: Optional[str]) -> MemoryColumns:
+        """Return the pool of SQL memories worth scoring for ``task``.
 
-            age_hours = (
-                datetime.now(tz=timezone.utc) - memory.timestamp
-            ).total_seconds() / 3600.0
-            score += 10 * math.exp(-age_hours / 168)
+        See ``MemoryStore.candidates``; the retriever hits added to it are
+        the BM25 matches and the nearest stored embeddings of the task.
+        """
+        query = self._task_vector(task)
+        hits = list(self._lexical_scores(task))
+        if query is not None:
+            hits += self._fragments.nearest(query, SEMANTIC_CANDIDATES)
+        return self.memory_store.candidates(
+            conv_id=conversation_id,
+            entity_ids=entity_ids(task) if task else (),
+            mem_ids=hits,
+        )
 
-            if task:
-                score += 20 * self._semantic_similarity(memory.content, task)
+    def _vector_hits(self, task: str, conversation_id: Optional[str]):
+        if not self.vector_memory or not task:
+            return []
+        # stay inside the current conversation when its messages are indexed
+        filters = {}
+        if conversation_id and self.vector_memory.has_conversation(conversation_id):
+            filters["conversation"] = str(conversation_id)
+        return self.vector_memory.search(task, top_k=8, **filters)
 
-            if current_project_id and memory.project_id == current_project_id:
-                score += 15
+    def score_all(
+        self, memories: Dict[str, Memory], task: str, conversation_id: str
+    ) -> Dict[str, Dict[str, Any]]:
+        columns = MemoryColumns.from_memories(memories)
+        return self.score_columns(columns, task, conversation_id)
+
+    def score_columns(
+        self,
+        columns: MemoryColumns,
+        task: str,
+        conversation_id: Optional[str],
+        top: Optional[int] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """Score every row of ``columns`` at once.
 
-            score += 5 * math.log1p(memory.access_count)
+        With ``top`` only the best ``top`` rows by score per token (the
+        order ``ContextBuilder`` fills the budget in) are turned into
+        ``Memory`` objects and returned.
+        """
+        n = len(columns)
 
-            score += 8 * len(memory.entities & current_entities)
+        # a vector hit with the text of a SQL memory is ranked as that memory
+        by_text: Optional[Dict[str, int]] = None
+        similarity = np.zeros(n)
+        has_vector = False
+        extra = []
+        extra_texts = set()
+        metric = getattr(getattr(self.vector_memory, "index", None), "metric_type", None)
+        for entry, dist in self._vector_hits(task, conversation_id):
+            if by_text is None:
+                by_text = {content: row for row, content in enumerate(columns.contents)}
+            sim = 1.0 - dist if metric == faiss.METRIC_L2 else dist
+            sim = max(0.0, min(float(sim), 1.0))
+            has_vector = True
+            row = by_text.get(entry.text)
+            if row is not None:
+                similarity[row] = max(similarity[row], sim)
+            elif entry.text not in extra_texts:
+                extra_texts.add(entry.text)
+                extra.append((entry, sim))
+        semantic = self._semantic_scores(task, columns.ids)
+        stored = ~np.isnan(semantic)
+        if stored.any():
+            has_vector = True
+            similarity[stored] = np.maximum(similarity[stored], np.clip(semantic[stored], 0.0, 1.0))
 
-            if memory.type == "error_solution":
-                score += 12
+        lexical = self._lexical_scores(task)
+        bm25 = np.zeros(n)
+        if lexical:
+            best = max(lexical.values()) or 1.0
+            for memory_id, score in lexical.items():
+                row = columns.position.get(memory_id)
+                if row is not None:
+                    bm25[row] = max(score, 0.0) / best
+        w_lexical, w_vector = _fusion_weights(bool(lexical), has_vector)
+        relevance = w_lexical * bm25 + w_vector * similarity
 
-            score += memory.importance_weight * 10
+        now = datetime.now(tz=timezone.utc).timestamp()
+        age_hours = np.nan_to_num(now - columns.created, nan=0.0) / 3600.0
+        total = (
+            10 * np.exp(-age_hours / 168)
+            + 20 * relevance
+            + 5 * np.log1p(columns.access_count)
+            + 8 * self._entity_counts(task, columns)
+            + columns.kind_values(TYPE_BONUS)
+            + 10 * columns.importance
+        )
+
+        rows = np.arange(n)
+        if top is not None and n > top:
+            value = total / np.maximum(columns.token_cost, 1)
+            rows = np.argpartition(-value, top - 1)[:top]
+        scores: Dict[str, Dict[str, Any]] = {}
+        for row in rows.tolist():
+            scores[columns.ids[row]] = {
+                "memory": columns.memory(row),
+                "score": float(total[row]),
+                "token_cost": int(columns.token_cost[row]),
+            }
 
-            scores[memory_id] = {
-                "memory": memory,
-                "score": score,
-                "token_cost": self.token_counter.count(memory.content),
+        # vector hits not already stored as SQL memories
+        for entry, sim in extra:
+            mem = Memory(
+                memory_id=entry.id,
+                content=entry.text,
+                timestamp=datetime.fromtimestamp(entry.timestamp, tz=timezone.utc),
+                type="vector",  # type: ignore[str]
+                project_id=None,
+                entities=set(),
+                importance_weight=1.0,
+                access_count=1,
+            )
+            scores[mem.memory_id] = {
+                "memory": mem,
+                "score": 20 * w_vector * sim,
+                "token_cost": rough_token_len(mem.content),
             }
-            seen_texts.add(memory.content)
-
-        # incorporate vector memory hits
-        if self.vector_memory and task:
-            hits = self.vector_memory.search(task, top_k=8)
-            if hits:
-                metric = getattr(self.vector_memory.index, "metric_type", None)
-                for entry, dist in hits:
-                    if entry.text in seen_texts:
-                        continue
-                    mem = Memory(
-                        memory_id=entry.id,
-                        content=entry.text,
-                        timestamp=datetime.fromtimestamp(entry.timestamp, tz=timezone.utc),
-                        type="vector",  # type: ignore[str]
-                        project_id=None,
-                        entities=set(),
-                        importance_weight=1.0,
-                        access_count=1,
-                    )
-                    similarity = dist
-                    if metric == faiss.METRIC_L2:
-                        similarity = 1.0 - dist
-                    similarity = max(0.0, min(float(similarity), 1.0))
-                    vec_score = 20 * similarity
-                    scores[mem.memory_id] = {
-                        "memory": mem,
-                        "score": vec_score,
-                        "token_cost": self.token_counter.count(mem.content),
-                    }
-                    seen_texts.add(mem.content)
 
         return scores
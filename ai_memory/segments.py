@@ -0,0 +1,91 @@
+"""
+Append-only delta segments
+--------------------------
+``embed_file(..., append=True)`` writes each batch of new vectors to a small
+segment next to the base index instead of rewriting the whole store:
+
+  memory_store.index                   <- base index
+  memory_store.pkl                     <- base metadata (list of dicts)
+  memory_store.segments/
+      seg-<time_ns>-<rand>.pkl         <- metadata records of one batch
+      seg-<time_ns>-<rand>.index       <- IndexFlatIP with the batch vectors
+
+The ``.pkl`` is written first and the ``.index`` renamed into place last, so
+a segment is only visible once both files are complete. Readers apply
+segments in name order after the base; ``merge_segments`` folds them back
+into the base files. The merged names are recorded in the base text store
+before the segments are deleted, so a reader that opens the new base in
+between skips them instead of applying them twice.
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Collection, List, Tuple
+from uuid import uuid4
+
+import faiss
+import numpy as np
+
+
+def segment_dir(index_path: Path) -> Path:
+    return index_path.parent / f"{index_path.stem}.segments"
+
+
+def list_segments(index_path: Path, skip: Collection[str] = ()) -> List[Tuple[Path, Path]]:
+    """Return complete ``(index, metadata)`` segment pairs in write order.
+
+    Segments named in ``skip`` (already merged into the base) are left out.
+    """
+    seg_dir = segment_dir(index_path)
+    if not seg_dir.is_dir():
+        return []
+    pairs = []
+    for idx in sorted(seg_dir.glob("seg-*.index")):
+        meta = idx.with_suffix(".pkl")
+        if idx.stem not in skip and meta.exists():
+            pairs.append((idx, meta))
+    return pairs
+
+
+def write_segment(index_path: Path, vecs: np.ndarray, records: List[dict]) -> Path:
+    """Persist ``vecs`` and their metadata ``records`` as a new segment."""
+    seg_dir = segment_dir(index_path)
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    name = f"seg-{time.time_ns():020d}-{uuid4().hex[:8]}"
+    seg_index = seg_dir / f"{name}.index"
+    seg_meta = seg_dir / f"{name}.pkl"
+
+    tmp_meta = seg_meta.with_suffix(".pkl.tmp")
+    with open(tmp_meta, "wb") as f:
+        pickle.dump(records, f, protocol=4)
+    os.replace(tmp_meta, seg_meta)
+
+    index = faiss.IndexFlatIP(vecs.shape[1])
+    index.add(np.ascontiguousarray(vecs, dtype="float32"))
+    tmp_index = seg_index.with_suffix(".index.tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, seg_index)
+    return seg_index
+
+
+def read_segment(seg_index: Path, seg_meta: Path) -> Tuple[np.ndarray, List[dict]]:
+    """Return the vectors and metadata records stored in one segment."""
+    index = faiss.read_index(str(seg_index))
+    vecs = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros(
+        (0, index.d), dtype="float32"
+    )
+    with open(seg_meta, "rb") as f:
+        records = pickle.load(f)
+    return vecs, records
+
+
+def remove_segment(seg_index: Path, seg_meta: Path) -> None:
+    for path in (seg_index, seg_meta):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
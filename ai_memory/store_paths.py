@@ -0,0 +1,47 @@
+"""
+Where the memory stores live
+----------------------------
+The vector index and the SQLite database are located through environment
+variables with working-directory fallbacks. The lookup lives here, free of
+FAISS and NumPy, so the thin daemon client can tell the daemon exactly
+which stores an in-process run would have used:
+
+* ``default_index_path`` ``LUNA_VECTOR_INDEX``, else the given path, else
+  ``$LUNA_VECTOR_DIR/memory_store.index`` (default ``.ai_memory``)
+* ``find_index``         the first existing file among the candidates a
+  relative index path is searched in (``.``, ``$LUNA_VECTOR_DIR``,
+  ``.ai_memory``)
+* ``db_path``            ``$AI_MEMORY_ROOT/ai_memory.db`` (default ``~/ai_memory``)
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+
+def default_index_path(index_path: str | Path | None = None) -> Path:
+    """Return the index path ``VectorMemory(index_path)`` starts from."""
+    base = Path(os.getenv("LUNA_VECTOR_DIR", ".ai_memory"))
+    return Path(os.getenv("LUNA_VECTOR_INDEX", index_path or base / "memory_store.index"))
+
+
+def index_candidates(index_path: Path) -> List[Path]:
+    """Return where ``VectorMemory.load`` looks for ``index_path``, in order."""
+    if index_path.is_absolute():
+        return [index_path]
+    search_dirs = [Path("."), Path(os.getenv("LUNA_VECTOR_DIR", ".ai_memory")), Path(".ai_memory")]
+    return [index_path] + [d / index_path.name for d in search_dirs]
+
+
+def find_index(index_path: str | Path | None = None) -> Optional[Path]:
+    """Return the index file ``VectorMemory(index_path).load()`` would open."""
+    return next((c for c in index_candidates(default_index_path(index_path)) if c.exists()), None)
+
+
+def db_path() -> str:
+    """Return current SQLite DB path, creating directories if needed."""
+    root = Path(os.getenv("AI_MEMORY_ROOT", "~/ai_memory")).expanduser()
+    root.mkdir(parents=True, exist_ok=True)
+    return str(root / "ai_memory.db")
@@ -1,11 +1,16 @@
 import hashlib
 import numpy as np
 
+from ai_memory.model_config import EMBED_MODELS
+
 class FakeSentenceTransformer:
     """Simple fake SentenceTransformer for offline tests."""
 
-    def __init__(self, *args, **kwargs):
-        self.dim = 1024
+    def __init__(self, model_name=None, *args, **kwargs):
+        self.dim = EMBED_MODELS.get(model_name, 1024)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
 
     def _vec(self, text: str) -> np.ndarray:
         seed = int(hashlib.md5(text.encode()).hexdigest(), 16) % (2**32)
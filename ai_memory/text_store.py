@@ -0,0 +1,199 @@
+"""
+Memory-mapped metadata text store
+---------------------------------
+Unpickling ``memory_store.memories.pkl`` builds a Python object for every
+memory, full text included, before the first query can run. The text store
+keeps the same metadata in one file that is memory-mapped instead:
+
+  memory_store.textstore
+      magic     b"AIMTXT1\\n"
+      header    u64 length + JSON (count, offsets, source / conversation
+                tables, names of the delta segments merged into this base)
+      records   fixed-width table, one 56-byte row per vector, in index order
+      text      concatenated UTF-8: memory id then text of every row
+
+A row holds the vector id, timestamp, byte offset / lengths of its id and
+text, chunk offsets and codes into the source and conversation tables.
+Opening the store only parses the header; ``text(i)`` and ``row(i)`` decode
+a single memory, so a query pays for the hits it returns, and the record
+columns can be filtered with NumPy without touching the text at all.
+
+The file is written next to the index and renamed into place, so readers
+either see the old store or the complete new one.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from .vector_ids import vector_id
+
+MAGIC = b"AIMTXT1\n"
+_ALIGN = 64
+
+RECORD = np.dtype(
+    [
+        ("vid", "<i8"),
+        ("timestamp", "<f8"),
+        ("offset", "<i8"),  # start of the id; the text follows it
+        ("id_len", "<u4"),
+        ("text_len", "<u4"),
+        ("start", "<i8"),  # -1: no chunk offsets
+        ("end", "<i8"),
+        ("source", "<i4"),  # -1: unknown
+        ("conversation", "<i4"),
+    ]
+)
+
+
+def store_path(path: str | Path) -> Path:
+    """Return the text store next to an index (or one of its side-cars)."""
+    path = Path(path)
+    return path.parent / f"{path.stem}.textstore"
+
+
+def _codes(values: Sequence[Optional[str]]) -> tuple[np.ndarray, List[str]]:
+    table: Dict[str, int] = {}
+    codes = np.fromiter(
+        (-1 if v is None else table.setdefault(str(v), len(table)) for v in values),
+        dtype="<i4",
+        count=len(values),
+    )
+    return codes, list(table)
+
+
+def write_store(path: str | Path, records: Sequence[dict], merged: Sequence[str] = ()) -> Path:
+    """Write ``records`` (metadata dicts in index order) as a text store.
+
+    ``merged`` names the delta segments whose records are included.
+    """
+    target = store_path(path)
+    n = len(records)
+    rows = np.zeros(n, dtype=RECORD)
+    sources, source_table = _codes([r.get("source") for r in records])
+    conversations, conversation_table = _codes([r.get("conversation") for r in records])
+    rows["source"] = sources
+    rows["conversation"] = conversations
+
+    rows["vid"] = np.fromiter((vector_id(r["id"]) for r in records), dtype="<i8", count=n)
+    rows["timestamp"] = [
+        ts.timestamp() if hasattr(ts, "timestamp") else float(ts or 0)
+        for ts in (r.get("timestamp", 0) for r in records)
+    ]
+    rows["start"] = [-1 if r.get("start") is None else r["start"] for r in records]
+    rows["end"] = [-1 if r.get("end") is None else r["end"] for r in records]
+
+    blob = bytearray()
+    for i, r in enumerate(records):
+        mem_id = str(r["id"]).encode("utf-8")
+        text = (r.get("text") or "").encode("utf-8", errors="replace")
+        rows["offset"][i] = len(blob)
+        rows["id_len"][i] = len(mem_id)
+        rows["text_len"][i] = len(text)
+        blob += mem_id
+        blob += text
+
+    header = {
+        "count": n,
+        "sources": source_table,
+        "conversations": conversation_table,
+        "merged": sorted(merged),
+    }
+    # the offsets are part of the header whose length they depend on
+    while True:
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        records_at = -(-(len(MAGIC) + 8 + len(raw)) // _ALIGN) * _ALIGN
+        if header.get("records_offset") == records_at:
+            break
+        header.update(
+            records_offset=records_at,
+            text_offset=records_at + rows.nbytes,
+            text_bytes=len(blob),
+        )
+
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        f.write(b"\0" * (records_at - f.tell()))
+        f.write(rows.tobytes())
+        f.write(blob)
+    os.replace(tmp, target)
+    return target
+
+
+class TextStore:
+    """Read-only, memory-mapped view of a text store file."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = store_path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a text store")
+            (size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(size).decode("utf-8"))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = int(header["count"])
+        self.sources: List[str] = header["sources"]
+        self.conversations: List[str] = header["conversations"]
+        self.merged = frozenset(header.get("merged", ()))
+        self._text_at = int(header["text_offset"])
+        if len(self._map) < self._text_at + int(header["text_bytes"]):
+            raise ValueError(f"{self.path} is truncated")
+        self.records = np.frombuffer(
+            self._map, dtype=RECORD, count=self.count, offset=int(header["records_offset"])
+        )
+
+    @staticmethod
+    def exists(path: str | Path) -> bool:
+        return store_path(path).exists()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _bytes(self, offset: int, length: int) -> bytes:
+        at = self._text_at + offset
+        return self._map[at : at + length]
+
+    def memory_id(self, i: int) -> str:
+        rec = self.records[i]
+        return self._bytes(int(rec["offset"]), int(rec["id_len"])).decode("utf-8")
+
+    def text(self, i: int) -> str:
+        rec = self.records[i]
+        at = int(rec["offset"]) + int(rec["id_len"])
+        return self._bytes(at, int(rec["text_len"])).decode("utf-8", errors="replace")
+
+    def row(self, i: int) -> dict:
+        """Return the metadata of row ``i`` (decoding only this row)."""
+        rec = self.records[i]
+        source, conversation = int(rec["source"]), int(rec["conversation"])
+        start, end = int(rec["start"]), int(rec["end"])
+        return {
+            "id": self.memory_id(i),
+            "text": self.text(i),
+            "timestamp": float(rec["timestamp"]),
+            "source": self.sources[source] if source >= 0 else None,
+            "start": start if start >= 0 else None,
+            "end": end if end >= 0 else None,
+            "conversation": self.conversations[conversation] if conversation >= 0 else None,
+        }
+
+    def rows(self) -> Iterator[dict]:
+        for i in range(self.count):
+            yield self.row(i)
+
+    def records_list(self) -> List[dict]:
+        """Return every row as a metadata record (the ``.pkl`` list format)."""
+        out = []
+        for row in self.rows():
+            out.append({k: v for k, v in row.items() if v is not None or k == "text"})
+        return out
@@ -3,11 +3,19 @@ from __future__ import annotations
 from pathlib import Path
 import logging
 import os
-import json
+import gc
+import glob
+import itertools
+import multiprocessing
 import pickle
+import threading
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from uuid import uuid4
-from typing import Dict
+from typing import Dict, Iterable, Iterator
 
 try:
     from sentence_transformers import SentenceTransformer  # noqa
@@ -24,13 +32,55 @@ except Exception:  # pragma: no cover - optional dependency
 import numpy as np
 import faiss
 
+from . import (
+    exact_vectors,
+    index_info,
+    index_io,
+    index_manager,
+    index_presets,
+    index_tuner,
+    segments,
+    text_store,
+)
+from .dedup import DEDUP_THRESHOLD, Deduper, dedup_path
+from .chunker import CHUNK_OVERLAP, CHUNK_TOKENS, Chunk
+from .model_config import EMBED_MODELS, resolve_embed_model
+from .vector_ids import add_vectors, check_removable, remove_ids, vector_ids, with_id_map
+from .extract import (  # noqa: F401 - re-exported for existing callers
+    _extract_file,
+    _extract_file_timed,
+    _iter_file_chunks,
+    _extract_strings,
+    _iter_json_strings,
+    _iter_messages,
+    _json_to_text,
+)
+
 logger = logging.getLogger(__name__)
 
 
 _model = None
-_model_name = "BAAI/bge-large-en-v1.5"
+_model_name = resolve_embed_model()
+_cache = None
+
+_DIMS = 1024  # used when the model is unknown and cannot be loaded
+
+# file types picked up when a directory is passed to ``vectorize``
+_VECTORIZE_SUFFIXES = (".json", ".md", ".txt")
+
+# also write the pickle side-cars for readers that predate the text store;
+# AIMEM_META_PICKLE=0 drops them once nothing old reads them
+META_PICKLE = os.getenv("AIMEM_META_PICKLE", "1").lower() not in {"0", "false", "no"}
+
+# chunk location and filter fields copied into the VectorMemory dictionary format
+_LOCATION_KEYS = ("source", "start", "end", "conversation")
+
+# batches of texts pooled across files before the encoder runs
+_PENDING_BATCHES = 8
 
-_DIMS = 1024  # BAAI/bge-large-en-v1.5 uses 1024 dimensions
+_SEGMENT_MERGE_AT = int(os.getenv("AIMEM_SEGMENT_MERGE_AT", 16))
+_MERGE_LOCK_TIMEOUT = 3600.0
+_LOCK_POLL = 0.05
 
 
 def _get_model():
@@ -49,19 +99,135 @@ def _get_model():
     return _model
 
 
+def set_model(name: str | None = None) -> str:
+    """Select the embedding model (see ``resolve_embed_model``).
+
+    Switching models drops the loaded one; the new model loads on first use.
+    Returns the resolved model name.
+    """
+    global _model_name
+    resolved = resolve_embed_model(name)
+    if resolved != _model_name:
+        unload_model()
+        _model_name = resolved
+    return _model_name
+
+
+def _known_dims() -> int:
+    return EMBED_MODELS.get(_model_name, _DIMS)
+
+
+def embedding_dims() -> int:
+    """Return the vector size of the active embedding model."""
+    try:
+        dims = _get_model().get_sentence_embedding_dimension()
+    except Exception as e:
+        logger.warning("Could not load %s to read its dimension: %s", _model_name, e)
+        dims = None
+    return int(dims) if dims else _known_dims()
+
+
+def unload_model() -> bool:
+    """Drop the cached model so its memory can be reclaimed; reloads on next use."""
+    global _model
+    if _model is None:
+        return False
+    _model = None
+    gc.collect()
+    if torch is not None:
+        try:
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+    return True
+
+
+def set_embed_cache(path: str | None) -> None:
+    """Use the embedding cache at ``path`` (``None`` disables caching)."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+    if path:
+        from .embedding_cache import EmbeddingCache
+
+        _cache = EmbeddingCache(path)
+
+
+def _get_cache():
+    """Return the active embedding cache, opening ``AIMEM_EMBED_CACHE`` lazily."""
+    if _cache is None and os.getenv("AIMEM_EMBED_CACHE"):
+        set_embed_cache(os.environ["AIMEM_EMBED_CACHE"])
+    return _cache
+
+
+def _dummy_vec(text: str) -> np.ndarray:
+    length = float(len(text.encode("utf-8")))
+    vec = np.full((_known_dims(),), length, dtype="float32")
+    vec = vec.reshape(1, -1)
+    faiss.normalize_L2(vec)
+    return vec
+
+
 def _embed_text(text: str) -> np.ndarray:
     """Return a real embedding for the given text using sentence-transformers."""
+    cache = _get_cache()
+    if cache is not None:
+        cached = cache.get_many(_model_name, [text])[0]
+        if cached is not None:
+            return cached.reshape(1, -1)
     try:
         model = _get_model()
-        embedding = model.encode([text], convert_to_numpy=True)
-        return embedding.astype("float32")
+        embedding = model.encode([text], convert_to_numpy=True).astype("float32")
+        if cache is not None:
+            cache.put_many(_model_name, [text], embedding)
+        return embedding
     except Exception as e:
         logger.warning(f"Failed to create real embedding, falling back to dummy: {e}")
-        length = float(len(text.encode("utf-8")))
-        vec = np.full((_DIMS,), length, dtype="float32")
-        vec = vec.reshape(1, -1)
-        faiss.normalize_L2(vec)
-        return vec
+        return _dummy_vec(text)
+
+
+def _embed_texts(texts: list[str], batch_size: int = 32) -> np.ndarray:
+    """Return embeddings for ``texts`` encoded in batches.
+
+    Texts are sorted by length so each batch pads to a similar size; the
+    result rows are restored to the input order. Texts already present in
+    the embedding cache are not sent to the model.
+    """
+    if not texts:
+        return np.zeros((0, _known_dims()), dtype="float32")
+    cache = _get_cache()
+    cached = cache.get_many(_model_name, texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, v in enumerate(cached) if v is None]
+    if not missing:
+        return np.vstack(cached).astype("float32")
+
+    batch_size = max(int(batch_size), 1)
+    order = sorted(missing, key=lambda i: len(texts[i]))
+    sorted_texts = [texts[i] for i in order]
+    try:
+        model = _get_model()
+        parts = [
+            model.encode(
+                sorted_texts[i : i + batch_size],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+            )
+            for i in range(0, len(sorted_texts), batch_size)
+        ]
+        sorted_vecs = np.vstack(parts).astype("float32")
+        if cache is not None:
+            cache.put_many(_model_name, sorted_texts, sorted_vecs)
+    except Exception as e:
+        logger.warning(f"Failed to create real embeddings, falling back to dummy: {e}")
+        sorted_vecs = np.vstack([_dummy_vec(t) for t in sorted_texts])
+    vecs = np.empty((len(texts), sorted_vecs.shape[1]), dtype="float32")
+    vecs[order] = sorted_vecs
+    for i, v in enumerate(cached):
+        if v is not None:
+            vecs[i] = v
+    return vecs
 
 
 def _embed(file: str) -> np.ndarray:
@@ -74,82 +240,16 @@ def _embed(file: str) -> np.ndarray:
         # Fallback for binary files or errors
         with open(file, "rb") as f:
             length = len(f.read())
-        vec = np.full((_DIMS,), float(length), dtype="float32").reshape(1, -1)
+        vec = np.full((_known_dims(),), float(length), dtype="float32").reshape(1, -1)
         faiss.normalize_L2(vec)
         return vec
 
 
 def _create_index(factory: str | None) -> faiss.Index:
+    dims = embedding_dims()
     if factory:
-        return faiss.index_factory(_DIMS, factory)
-    return faiss.IndexFlatIP(_DIMS)
-
-
-def _extract_strings(obj, max_size=2048):
-    strings: list[str] = []
-    if isinstance(obj, dict):
-        for v in obj.values():
-            strings.extend(_extract_strings(v, max_size))
-    elif isinstance(obj, list):
-        for item in obj:
-            strings.extend(_extract_strings(item, max_size))
-    elif isinstance(obj, str):
-        if len(obj.encode("utf-8")) < max_size:
-            strings.append(obj)
-    return strings
-
-
-def _iter_messages(obj):
-    if not isinstance(obj, dict):
-        return
-    convs = obj.get("conversations")
-    if isinstance(convs, list):
-        for conv in convs:
-            msgs = conv.get("messages") if isinstance(conv, dict) else None
-            if isinstance(msgs, list):
-                for m in msgs:
-                    if isinstance(m, dict):
-                        content = m.get("content")
-                        if isinstance(content, dict):
-                            parts = content.get("parts")
-                            if isinstance(parts, list):
-                                for p in parts:
-                                    if (
-                                        isinstance(p, str)
-                                        and len(p.encode("utf-8")) <= 2048
-                                    ):
-                                        yield p
-                        elif (
-                            isinstance(content, str)
-                            and len(content.encode("utf-8")) <= 2048
-                        ):
-                            yield content
-
-
-def _iter_json_strings(path: str, mode: str):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except Exception as e:
-        logger.warning("JSON parse error for %s: %s", path, e)
-        return []
-    if not isinstance(data, (dict, list)):
-        return []
-    if mode == "messages":
-        return list(_iter_messages(data))
-    if mode == "all":
-        return _extract_strings(data)
-    if mode == "auto":
-        texts = list(_iter_messages(data))
-        return texts or _extract_strings(data)
-    return []
-
-
-def _json_to_text(path: str, mode: str) -> str | None:
-    texts = _iter_json_strings(path, mode)
-    if not texts:
-        return None
-    return "\n\n".join(texts)
+        return faiss.index_factory(dims, factory)
+    return faiss.IndexFlatIP(dims)
 
 
 def _load_index(path: Path, factory: str | None) -> faiss.Index:
@@ -165,10 +265,710 @@ def _load_index(path: Path, factory: str | None) -> faiss.Index:
             except OSError:
                 pass
             # rebuild with a simple IndexFlatIP for compatibility
-            return faiss.IndexFlatIP(_DIMS)
+            return faiss.IndexFlatIP(embedding_dims())
         raise
 
 
+def _read_meta(meta_path: Path) -> list[dict]:
+    """Return the metadata records of an index, from its text store if any."""
+    if text_store.TextStore.exists(meta_path):
+        try:
+            return text_store.TextStore(meta_path).records_list()
+        except (OSError, ValueError) as e:
+            logger.warning("Failed to read text store of %s: %s", meta_path, e)
+    if not meta_path.exists():
+        return []
+    try:
+        with open(meta_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return []
+
+
+def _align_meta(meta: list[dict], ntotal: int) -> list[dict]:
+    """Pad or truncate ``meta`` so it has one record per indexed vector."""
+    if len(meta) != ntotal:
+        logger.warning("metadata count mismatch: %d != %d", len(meta), ntotal)
+        if len(meta) > ntotal:
+            meta = meta[:ntotal]
+        else:
+            for _ in range(ntotal - len(meta)):
+                meta.append({"id": uuid4().hex, "text": "", "timestamp": time.time()})
+    return meta
+
+
+def _write_index(index: faiss.Index, index_file: Path) -> None:
+    tmp = index_file.with_name(index_file.name + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, index_file)
+
+
+def _write_pickle(obj, path: Path) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=4)
+    os.replace(tmp, path)
+
+
+def _write_meta(index_file: Path, meta: list[dict], merged: Iterable[str] = ()) -> None:
+    """Write the metadata text store (and the pickles unless ``AIMEM_META_PICKLE=0``).
+
+    ``merged`` names the delta segments folded into ``meta``. The pickles
+    are the list side-car and the VectorMemory dictionary format read by
+    older versions. Every file is renamed into place.
+    """
+    text_store.write_store(index_file, meta, list(merged))
+    if not META_PICKLE:
+        return
+    meta_path = index_file.with_suffix(".pkl")
+    legacy_path = index_file.parent / f"{index_file.stem}.memories.pkl"
+    _write_pickle(meta, meta_path)
+
+    # VectorMemory dictionary format
+    legacy: Dict[str, dict] = {}
+    for m in meta:
+        ts = float(m["timestamp"])
+        legacy[m["id"]] = {
+            "text": m.get("text", ""),
+            "embedding": None,
+            "metadata": {k: m[k] for k in _LOCATION_KEYS if k in m},
+            "timestamp": ts,
+            "access_count": 1,
+            "last_accessed": ts,
+            "importance": 1.0,
+            "compressed": False,
+        }
+    _write_pickle(legacy, legacy_path)
+
+
+def _check_index_model(index_file: Path, dims: int | None = None) -> None:
+    """Refuse to mix vectors of different embedding models in one index."""
+    recorded = index_info.read_info(index_file).get("model")
+    if recorded and recorded != _model_name:
+        raise ValueError(
+            f"{index_file} was built with {recorded}, not {_model_name}; "
+            f"pass --model {recorded} or use a new index"
+        )
+    if dims is not None and dims != embedding_dims():
+        raise ValueError(
+            f"{index_file} holds {dims}-d vectors but {_model_name} "
+            f"produces {embedding_dims()}-d embeddings"
+        )
+
+
+def _record_storage_info(index_file: Path, index: faiss.Index, info: dict) -> None:
+    """Write the storage description and measured size to the info side-car."""
+    size = index_file.stat().st_size if index_file.exists() else 0
+    index_info.update_info(
+        index_file,
+        **info,
+        bytes_per_vector=round(size / index.ntotal, 1) if index.ntotal else None,
+    )
+
+
+@contextmanager
+def _index_lock(index_file: Path) -> Iterator[bool]:
+    """Hold the lock that serialises rewrites of ``index_file``.
+
+    Yields ``False`` without waiting if another process holds it; a lock
+    older than ``_MERGE_LOCK_TIMEOUT`` is considered stale and taken over.
+    """
+    lock = index_file.with_suffix(".merge.lock")
+    for _ in range(2):
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                stale = time.time() - lock.stat().st_mtime > _MERGE_LOCK_TIMEOUT
+            except OSError:
+                stale = False
+            if not stale:
+                yield False
+                return
+            os.replace(lock, lock.with_suffix(".stale"))
+    else:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def _wait_index_lock(index_file: Path) -> Iterator[None]:
+    """Hold the ``_index_lock`` of ``index_file``, waiting until it is free."""
+    while True:
+        with _index_lock(index_file) as locked:
+            if locked:
+                yield
+                return
+        time.sleep(_LOCK_POLL)
+
+
+def _load_mapped(index_file: Path, factory: str | None = None) -> tuple[faiss.Index, list[dict]]:
+    """Load the base index as an ``IndexIDMap2`` together with its metadata."""
+    index = _load_index(index_file, factory)
+    meta = _align_meta(_read_meta(index_file.with_suffix(".pkl")), index.ntotal)
+    return with_id_map(index, vector_ids(meta)), meta
+
+
+def merge_segments(
+    index_path: str,
+    factory: str | None = None,
+    storage: str | None = None,
+    rerank: bool = False,
+) -> int:
+    """Fold append-only segments into the base index and metadata.
+
+    When there is no base index yet, ``storage`` selects a compressed preset
+    that is trained on the segment vectors. Returns the number of segments
+    merged (``0`` if another merge holds the lock or there is nothing to do).
+    """
+    index_file = Path(index_path)
+    with _index_lock(index_file) as locked:
+        if not locked:
+            logger.info("segment merge already running for %s", index_file)
+            return 0
+        return _merge_locked(index_file, factory, storage, rerank)
+
+
+def _merged_segments(index_file: Path) -> frozenset:
+    """Names of the segments the base text store already includes."""
+    if not text_store.TextStore.exists(index_file):
+        return frozenset()
+    try:
+        return text_store.TextStore(index_file).merged
+    except (OSError, ValueError):
+        return frozenset()
+
+
+def _merge_locked(
+    index_file: Path,
+    factory: str | None = None,
+    storage: str | None = None,
+    rerank: bool = False,
+) -> int:
+    # segments recorded in the base but still on disk were merged by a run
+    # that stopped before deleting them
+    done = _merged_segments(index_file)
+    for seg_index, seg_meta in segments.list_segments(index_file):
+        if seg_index.stem in done:
+            segments.remove_segment(seg_index, seg_meta)
+    pairs = segments.list_segments(index_file)
+    if not pairs:
+        return 0
+    build = storage if storage and not index_file.exists() else None
+    index, meta = (None, []) if build else _load_mapped(index_file, factory)
+    loaded = [segments.read_segment(*pair) for pair in pairs]
+    loaded = [(vecs, records) for vecs, records in loaded if len(vecs)]
+    info = None
+    if loaded and (index is None or not index.is_trained):
+        # train on every pending vector, not just the first segment
+        sample = np.vstack([vecs for vecs, _ in loaded])[: index_presets.TRAIN_SIZE]
+        if index is None:
+            index, info = index_presets.build_index(build, sample, rerank)
+            index = with_id_map(index)
+        else:
+            index.train(sample)
+    if index is None:
+        index = with_id_map(faiss.IndexFlatIP(embedding_dims()))
+    for vecs, records in loaded:
+        add_vectors(index, vecs, records)
+        meta.extend(records)
+
+    _write_index(index, index_file)
+    _write_meta(index_file, meta, (seg_index.stem for seg_index, _ in pairs))
+    exact_vectors.update_vectors(
+        index_file, index, np.vstack([vecs for vecs, _ in loaded]) if loaded else None
+    )
+    if info is not None:
+        _record_storage_info(index_file, index, info)
+    for seg_index, seg_meta in pairs:
+        segments.remove_segment(seg_index, seg_meta)
+    logger.info("merged %d segments into %s", len(pairs), index_file)
+    if index_manager.AUTO_PROMOTE:
+        _promote_locked(index_file, index)
+    return len(pairs)
+
+
+def _promote_locked(
+    index_file: Path, index: faiss.Index, layout: str | None = None, force: bool = False
+) -> faiss.Index:
+    """Swap ``index`` for a promoted layout if ``index_manager`` plans one."""
+    factory = index_manager.plan(index, layout, force)
+    if factory is None:
+        return index
+    promoted, info = index_manager.promote(index, factory)
+    _write_index(promoted, index_file)
+    # parameters tuned for the old layout do not carry over
+    index_info.update_info(index_file, **info, search_params=None, tuning=None)
+    # the flat index being replaced still holds the exact vectors
+    exact_vectors.update_vectors(index_file, promoted, source=index)
+    return promoted
+
+
+def promote_index(index_path: str, layout: str | None = None, force: bool = False) -> str | None:
+    """Promote the index at ``index_path`` now; return the new factory or ``None``."""
+    index_file = Path(index_path)
+    with _index_lock(index_file) as locked:
+        if not locked:
+            raise RuntimeError(f"{index_file} is being merged; try again later")
+        index, _ = _load_mapped(index_file)
+        promoted = _promote_locked(index_file, index, layout, force)
+    return None if promoted is index else index_info.read_info(index_file).get("factory")
+
+
+def remove_vectors(
+    index_path: str, ids: Iterable[str] = (), source: str | None = None
+) -> int:
+    """Delete memories by id and/or every chunk embedded from ``source``.
+
+    Pending segments are merged first so all records are in the base index.
+    The vectors are dropped with ``remove_ids`` (converting a positional
+    index to ids once) and the texts are forgotten by the dedup side-car so
+    they can be embedded again. Returns the number of vectors removed.
+    """
+    index_file = Path(index_path)
+    wanted = set(ids)
+    with _index_lock(index_file) as locked:
+        if not locked:
+            raise RuntimeError(f"{index_file} is being merged; try again later")
+        if index_file.exists():
+            # fail before merging or rewriting anything
+            check_removable(
+                index_io.read_index(index_file, mmap=True), exact_vectors.vectors_path(index_file).exists()
+            )
+        _merge_locked(index_file)
+        if not index_file.exists():
+            return 0
+        index, meta = _load_mapped(index_file)
+        drop = [m for m in meta if m["id"] in wanted or (source and m.get("source") == source)]
+        if not drop:
+            return 0
+        vectors = None if exact_vectors.is_exact(index) else exact_vectors.read_vectors(index_file, index.ntotal)
+        index, removed = remove_ids(index, vector_ids(drop), vectors)
+        dropped = {m["id"] for m in drop}
+        keep = np.array([m["id"] not in dropped for m in meta], dtype=bool)
+        meta = [m for m in meta if m["id"] not in dropped]
+        _write_index(index, index_file)
+        _write_meta(index_file, meta, _merged_segments(index_file))
+        exact_vectors.update_vectors(index_file, index, keep=keep)
+    if dedup_path(index_file).exists():
+        deduper = Deduper(dedup_path(index_file))
+        deduper.forget([m["text"] for m in drop if m.get("text")])
+        deduper.commit()
+        deduper.close()
+    logger.info("removed %d vectors from %s", removed, index_file)
+    return removed
+
+
+def merge_segments_in_background(
+    index_path: str,
+    factory: str | None = None,
+    storage: str | None = None,
+    rerank: bool = False,
+) -> threading.Thread:
+    """Run ``merge_segments`` on a worker thread.
+
+    The thread is not a daemon, so a short-lived CLI process finishes the
+    merge before exiting.
+    """
+    thread = threading.Thread(
+        target=merge_segments,
+        args=(index_path, factory, storage, rerank),
+        name="aimem-segment-merge",
+    )
+    thread.start()
+    return thread
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    """Expand files, directories and glob patterns into a sorted file list.
+
+    Directories are searched recursively for ``_VECTORIZE_SUFFIXES``.
+    Unmatched patterns raise ``FileNotFoundError``.
+    """
+    files: dict[str, None] = {}
+    for pattern in patterns:
+        matches = (
+            sorted(glob.glob(os.path.expanduser(pattern), recursive=True))
+            if glob.has_magic(pattern)
+            else [os.path.expanduser(pattern)]
+        )
+        if not matches or not os.path.exists(matches[0]):
+            raise FileNotFoundError(pattern)
+        for match in matches:
+            path = Path(match)
+            if path.is_dir():
+                for sub in sorted(path.rglob("*")):
+                    if sub.is_file() and sub.suffix in _VECTORIZE_SUFFIXES:
+                        files.setdefault(str(sub))
+            else:
+                files.setdefault(str(path))
+    return list(files)
+
+
+@dataclass
+class FileStats:
+    """Per-file result of an ``IndexSession``."""
+
+    path: str
+    chunks: int = 0
+    duplicates: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+
+class IndexSession:
+    """Open an index and its metadata once, add many files, flush once.
+
+    With ``append=True`` new vectors are written as delta segments instead
+    of rewriting the base files. ``checkpoint_every`` flushes after that many
+    files so an interrupted run only loses the current interval.
+
+    ``storage`` builds a new index from a compressed preset (see
+    ``index_presets``). Trainable presets, like untrained ``factory``
+    indexes, buffer the first ``AIMEM_TRAIN_SIZE`` vectors, train on them
+    and only then start writing; the measured recall ends up in
+    ``storage_info`` and the info side-car. An existing index is always
+    reused as is, except that ``close`` promotes it to an IVF/HNSW layout
+    once it crosses the ``index_manager`` thresholds.
+
+    ``model`` selects the embedding model (default ``$AIMEM_EMBED_MODEL`` or
+    bge-large); it is recorded in the info side-car and an existing index
+    built with a different model or vector size is refused.
+
+    ``dedup=True`` drops exact and near-duplicate texts (see ``dedup``)
+    before they reach the encoder, remembering them in ``<stem>.dedup.db``.
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        factory: str | None = None,
+        *,
+        model: str | None = None,
+        json_extract: str = "auto",
+        no_meta: bool = False,
+        batch_size: int = 32,
+        append: bool = False,
+        checkpoint_every: int = 0,
+        chunk_tokens: int = CHUNK_TOKENS,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        storage: str | None = None,
+        rerank: bool = False,
+        dedup: bool = False,
+        dedup_threshold: float = DEDUP_THRESHOLD,
+        verbose: bool = False,
+    ) -> None:
+        if storage is not None and storage not in index_presets.PRESETS:
+            raise ValueError(f"unknown storage preset {storage!r}")
+        self.index_file = Path(index_path)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = set_model(model)
+        self.factory = factory
+        self.json_extract = json_extract
+        self.no_meta = no_meta
+        self.batch_size = batch_size
+        self.append = append
+        self.checkpoint_every = checkpoint_every
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.storage = storage
+        self.rerank = rerank
+        self.storage_info: dict | None = None
+        self.verbose = verbose
+        self.stats: list[FileStats] = []
+        self._dirty = False
+        self._since_checkpoint = 0
+        self._seg_vecs: list[np.ndarray] = []
+        self._seg_records: list[dict] = []
+        self._pending: list[dict] = []
+        self.index: faiss.Index | None = None
+        self.meta: list[dict] = []
+        self._train_vecs: list[np.ndarray] = []
+        self._train_records: list[dict] = []
+        # vectors added since the exact-vector side file was last written
+        self._added: list[np.ndarray] = []
+        self._closing = False
+        self._model_recorded = False
+        existed = self.index_file.exists()
+        if not append:
+            if not storage or existed:
+                self.index = _load_index(self.index_file, factory)
+            if self.index is not None and not no_meta:
+                meta = _read_meta(self.index_file.with_suffix(".pkl"))
+                self.meta = _align_meta(meta, self.index.ntotal)
+                self.index = with_id_map(self.index, vector_ids(self.meta))
+            elif self.index is not None and self.index.ntotal == 0:
+                self.index = with_id_map(self.index)
+        _check_index_model(
+            self.index_file, self.index.d if existed and self.index is not None else None
+        )
+        self._untrained: faiss.Index | None = None
+        if self.index is not None and not self.index.is_trained:
+            # train an IVF/PQ factory on a corpus sample, not the first batch
+            self._untrained, self.index = self.index, None
+        self._dedup: Deduper | None = None
+        if dedup:
+            self._dedup = Deduper(dedup_path(self.index_file), dedup_threshold)
+            has_vectors = (
+                self.index.ntotal > 0 if self.index is not None else existed
+            ) or bool(segments.list_segments(self.index_file))
+            if not has_vectors:
+                # texts remembered for an index that is gone would never be embedded
+                self._dedup.reset()
+
+    def __enter__(self) -> "IndexSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # on error keep the files as of the last checkpoint
+        if exc_type is None:
+            self.close()
+        elif self._dedup is not None:
+            self._dedup.close()
+
+    def add_texts(
+        self,
+        texts: list[str | Chunk],
+        source: str | None = None,
+        conversation: str | None = None,
+        timestamp: float | None = None,
+    ) -> int:
+        """Stage ``texts`` for embedding.
+
+        Texts from several calls are pooled so the encoder always sees full
+        batches; they are embedded once ``_PENDING_BATCHES`` batches are
+        waiting and at every checkpoint. ``Chunk`` items keep their offsets
+        in ``source`` so neighbours can be stitched at retrieval time.
+        ``conversation`` and ``timestamp`` (default: now) are recorded for
+        filtered search. Returns the number of texts staged after duplicate
+        filtering.
+        """
+        if self._dedup is not None and texts:
+            keep = self._dedup.filter([t.text if isinstance(t, Chunk) else t for t in texts])
+            texts = [texts[i] for i in keep]
+        if not texts:
+            return 0
+        now = time.time() if timestamp is None else float(timestamp)
+        for t in texts:
+            record = {"id": uuid4().hex, "timestamp": now}
+            if isinstance(t, Chunk):
+                record.update(text=t.text, start=t.start, end=t.end)
+            else:
+                record["text"] = t
+            if source:
+                record["source"] = source
+            if conversation:
+                record["conversation"] = str(conversation)
+            self._pending.append(record)
+        if len(self._pending) >= self.batch_size * _PENDING_BATCHES:
+            self._encode_pending()
+        return len(texts)
+
+    def _encode_pending(self) -> None:
+        records, self._pending = self._pending, []
+        if not records:
+            return
+        vecs = _embed_texts([r["text"] for r in records], batch_size=self.batch_size)
+        if self.no_meta:
+            for r in records:
+                r["text"] = ""
+        if self.append:
+            self._seg_vecs.append(vecs)
+            self._seg_records.extend(records)
+        elif self.index is None:
+            self._train_vecs.append(vecs)
+            self._train_records.extend(records)
+            if not self.no_meta:
+                self.meta.extend(records)
+            if sum(len(v) for v in self._train_vecs) >= index_presets.TRAIN_SIZE:
+                self._train_index()
+        else:
+            add_vectors(self.index, vecs, records)
+            if not self.no_meta:
+                self.meta.extend(records)
+                if not exact_vectors.is_exact(self.index):
+                    self._added.append(vecs)
+        self._dirty = True
+        if self.verbose:
+            logger.info("added %d vectors", vecs.shape[0])
+
+    def _train_index(self) -> None:
+        """Train the new index on the buffered vectors and fill it.
+
+        Either the ``storage`` preset is built or the untrained ``factory``
+        index is trained.
+        """
+        train = np.vstack(self._train_vecs)
+        records, self._train_vecs, self._train_records = self._train_records, [], []
+        if self._untrained is not None:
+            index, self._untrained = self._untrained, None
+            index.train(train)
+        else:
+            index, self.storage_info = index_presets.build_index(
+                self.storage, train, self.rerank
+            )
+        self.index = with_id_map(index)
+        add_vectors(self.index, train, records)
+        if not self.no_meta and not exact_vectors.is_exact(self.index):
+            self._added.append(train)
+
+    def _record_file(self, stats: FileStats) -> None:
+        self.stats.append(stats)
+        self._since_checkpoint += 1
+        if self.checkpoint_every and self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def add_file(self, file: str) -> FileStats:
+        """Extract and embed one file; errors are recorded, not raised."""
+        start = time.time()
+        stats = FileStats(path=str(file))
+        try:
+            chunks = _iter_file_chunks(
+                str(file), self.json_extract, self.chunk_tokens, self.chunk_overlap
+            )
+            step = self.batch_size * _PENDING_BATCHES
+            while batch := list(itertools.islice(chunks, step)):
+                kept = self.add_texts(batch, source=str(file))
+                stats.chunks += kept
+                stats.duplicates += len(batch) - kept
+            if self.verbose:
+                logger.info("extracted %d chunks from %s", stats.chunks, file)
+        except Exception as e:
+            logger.warning("Failed to embed %s: %s", file, e)
+            stats.error = str(e)
+        stats.seconds = time.time() - start
+        self._record_file(stats)
+        return stats
+
+    def add_files(self, files: list[str], workers: int = 0) -> list[FileStats]:
+        """Add ``files`` in order, parsing them on ``workers`` processes.
+
+        Extraction runs in a process pool while this thread encodes. At most
+        ``2 * workers`` files are parsed ahead of the encoder, which bounds
+        memory no matter how many files are queued.
+        """
+        if workers <= 1 or len(files) <= 1:
+            return [self.add_file(f) for f in files]
+
+        results: list[FileStats] = []
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            queue: deque = deque()
+            todo = iter(files)
+
+            def submit(f):
+                args = (str(f), self.json_extract, self.chunk_tokens, self.chunk_overlap)
+                queue.append((f, pool.submit(_extract_file_timed, *args)))
+
+            for file in itertools.islice(todo, 2 * workers):
+                submit(file)
+            while queue:
+                file, future = queue.popleft()
+                next_file = next(todo, None)
+                if next_file is not None:
+                    submit(next_file)
+                stats = FileStats(path=str(file))
+                try:
+                    chunks, stats.seconds, stats.error = future.result()
+                except Exception as e:  # worker died
+                    chunks, stats.error = [], str(e)
+                if stats.error:
+                    logger.warning("Failed to embed %s: %s", file, stats.error)
+                else:
+                    if self.verbose:
+                        logger.info("extracted %d chunks from %s", len(chunks), file)
+                    stats.chunks = self.add_texts(chunks, source=str(file))
+                    stats.duplicates = len(chunks) - stats.chunks
+                self._record_file(stats)
+                results.append(stats)
+        return results
+
+    def checkpoint(self) -> None:
+        """Write everything staged so far."""
+        self._since_checkpoint = 0
+        self._encode_pending()
+        if not self._dirty:
+            if self._dedup is not None:
+                self._dedup.commit()
+            return
+        if self.append:
+            vecs = np.vstack(self._seg_vecs)
+            dims = vecs.shape[1]
+            segments.write_segment(self.index_file, vecs, self._seg_records)
+            self._seg_vecs, self._seg_records = [], []
+            if len(segments.list_segments(self.index_file)) >= _SEGMENT_MERGE_AT:
+                merge_segments_in_background(
+                    str(self.index_file), self.factory, self.storage, self.rerank
+                )
+        else:
+            if self.index is None:
+                # keep buffering until the preset has enough training data
+                if not self._closing:
+                    return
+                self._train_index()
+            # a merge must not swap the base (or clear its merged segments) under us
+            with _wait_index_lock(self.index_file):
+                _write_index(self.index, self.index_file)
+                if not self.no_meta:
+                    self.meta = _align_meta(self.meta, self.index.ntotal)
+                    _write_meta(self.index_file, self.meta, _merged_segments(self.index_file))
+                    added, self._added = self._added, []
+                    exact_vectors.update_vectors(
+                        self.index_file, self.index, np.vstack(added) if added else None
+                    )
+                if self.storage_info is not None:
+                    _record_storage_info(self.index_file, self.index, self.storage_info)
+            dims = self.index.d
+        if not self._model_recorded:
+            index_info.update_info(self.index_file, model=self.model_name, dims=dims)
+            self._model_recorded = True
+        if self._dedup is not None:
+            # only now are the filtered texts safely in the index
+            self._dedup.commit()
+        self._dirty = False
+
+    def close(self) -> int:
+        """Flush and return ``0`` on success, ``1`` if any file failed."""
+        self._closing = True
+        self.checkpoint()
+        if (
+            not self.append
+            and self.index is not None
+            and index_manager.AUTO_PROMOTE
+            and index_manager.plan(self.index)
+        ):
+            with _index_lock(self.index_file) as locked:
+                if locked:
+                    self.index = _promote_locked(self.index_file, self.index)
+        if self._dedup is not None:
+            if self.verbose:
+                logger.info(
+                    "dedup: %(kept)d kept, %(exact)d exact and %(near)d near duplicates",
+                    self._dedup.stats(),
+                )
+            self._dedup.close()
+            self._dedup = None
+        if self.verbose:
+            cache = _get_cache()
+            if cache is not None:
+                stats = cache.stats()
+                logger.info(
+                    "embedding cache: %d hits, %d misses, %d entries",
+                    stats["hits"],
+                    stats["misses"],
+                    stats["entries"],
+                )
+        return 1 if any(s.error for s in self.stats) else 0
+
+
 def embed_file(
     file: str,
     index_path: str,
@@ -178,98 +978,77 @@ def embed_file(
     *,
     no_meta: bool = False,
     verbose: bool = False,
+    batch_size: int = 32,
+    append: bool = False,
+    dedup: bool = False,
 ) -> int:
-    """Embed a file into a FAISS index."""
-    start = time.time()
-    index_file = Path(index_path)
-    index_file.parent.mkdir(parents=True, exist_ok=True)
-    index = _load_index(index_file, factory)
-    chunks: list[str] = []
-    vecs = None
-    if file.endswith(".json") and json_extract != "none":
-        chunks = list(_iter_json_strings(file, json_extract))
-        if chunks:
-            vecs = np.vstack([_embed_text(t) for t in chunks])
-    if vecs is None:
-        with open(file, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
-        chunks = [text]
-        vecs = _embed(file)
-    if not index.is_trained and hasattr(index, "train"):
-        index.train(vecs)
-    index.add(vecs)
-    faiss.write_index(index, str(index_file))
+    """Embed a file into a FAISS index.
 
+    With ``append=True`` only the new vectors and records are written, as a
+    delta segment; segments are merged in the background once
+    ``AIMEM_SEGMENT_MERGE_AT`` of them have accumulated. ``dedup=True``
+    skips texts already embedded into this index (exactly or nearly).
+    """
+    start = time.time()
+    session = IndexSession(
+        index_path,
+        factory,
+        model=model,
+        json_extract=json_extract,
+        no_meta=no_meta,
+        batch_size=batch_size,
+        append=append,
+        dedup=dedup,
+        verbose=verbose,
+    )
+    session.add_file(file)
+    status = session.close()
     if verbose:
-        logger.info("extracted %d chunks", len(chunks))
-        logger.info("added %d vectors", vecs.shape[0])
-
-    if not no_meta:
-        meta_path = index_file.with_suffix(".pkl")
-        legacy_path = index_file.parent / f"{index_file.stem}.memories.pkl"
-        meta: list[dict] = []
-        if meta_path.exists():
-            try:
-                with open(meta_path, "rb") as f:
-                    meta = pickle.load(f)
-            except Exception:
-                meta = []
+        logger.info("took %.2fs", time.time() - start)
+    return status
 
-        for chunk in chunks:
-            meta.append({"id": uuid4().hex, "text": chunk, "timestamp": time.time()})
 
-        if len(meta) != index.ntotal:
-            logger.warning("metadata count mismatch: %d != %d", len(meta), index.ntotal)
-            if len(meta) > index.ntotal:
-                meta = meta[: index.ntotal]
-            else:
-                for _ in range(index.ntotal - len(meta)):
-                    meta.append(
-                        {"id": uuid4().hex, "text": "", "timestamp": time.time()}
-                    )
+def _query_text(file: str, json_extract: str) -> str | None:
+    """Return the text ``recall`` embeds for ``file`` (None if unreadable)."""
+    if file.endswith(".json") and json_extract != "none":
+        texts = list(_iter_json_strings(file, json_extract))
+        if texts:
+            return "\n\n".join(texts)
+    try:
+        with open(file, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    except Exception:
+        return None
 
-        with open(meta_path, "wb") as f:
-            pickle.dump(meta, f, protocol=4)
-
-        # VectorMemory dictionary format
-        legacy: Dict[str, dict] = {}
-        for m in meta:
-            ts = float(m["timestamp"])
-            legacy[m["id"]] = {
-                "text": m.get("text", ""),
-                "embedding": None,
-                "metadata": {},
-                "timestamp": ts,
-                "access_count": 1,
-                "last_accessed": ts,
-                "importance": 1.0,
-                "compressed": False,
-            }
-        with open(legacy_path, "wb") as f:
-            pickle.dump(legacy, f, protocol=4)
 
-    if verbose:
-        logger.info("took %.2fs", time.time() - start)
+def recall_many(
+    files: Iterable[str], index_path: str, json_extract: str = "auto"
+) -> list[float]:
+    """Return the best similarity of each file against the index.
 
-    status = 0
-    if not no_meta:
-        status = 0 if len(meta) == index.ntotal else 1
-    return status
+    The index is read once (memory-mapped), all files are encoded in one
+    batch and searched with one FAISS call.
+    """
+    files = [str(f) for f in files]
+    if not files:
+        return []
+    index = index_io.read_index(index_path, mmap=True)
+    index_tuner.apply_params(index, index_info.read_info(index_path).get("search_params"))
+    texts = [_query_text(f, json_extract) for f in files]
+    readable = [i for i, t in enumerate(texts) if t is not None]
+    vecs = np.empty((len(files), index.d), dtype="float32")
+    if readable:
+        vecs[readable] = _embed_texts([texts[i] for i in readable])
+    for i, text in enumerate(texts):
+        if text is None:
+            vecs[i] = _embed(files[i])
+    D, _ = index.search(vecs, 1)
+    scores = D[:, 0].astype(float)
+    if index.metric_type == faiss.METRIC_L2:
+        scores = 1.0 - scores
+    return [float(score) for score in scores]
 
 
 def recall(file: str, index_path: str, json_extract: str = "auto") -> float:
     """Return similarity score for the file against the index."""
-    index = faiss.read_index(str(index_path))
-    vec = None
-    if file.endswith(".json") and json_extract != "none":
-        texts = _iter_json_strings(file, json_extract)
-        if texts:
-            text = "\n\n".join(texts)
-            vec = _embed_text(text)
-    if vec is None:
-        vec = _embed(file)
-    D, _ = index.search(vec, 1)
-    score = float(D[0][0])
-    if index.metric_type == faiss.METRIC_L2:
-        score = 1.0 - score
-    return score
+    return recall_many([file], index_path, json_extract)[0]
@@ -0,0 +1,138 @@
+"""
+Stable vector ids
+-----------------
+Vectors are stored in an ``IndexIDMap2`` under a 63-bit id derived from the
+memory id of their metadata record, so search results are resolved by id
+rather than by list position and vectors can be dropped with
+``remove_ids`` (flat-code indexes in place, IVF / HNSW by a rebuild).
+
+Indexes written before ids existed are positional; ``with_id_map`` converts
+them once by re-adding their vectors under the ids of the aligned metadata.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable
+
+import faiss
+import numpy as np
+
+_MASK = (1 << 63) - 1
+
+
+def vector_id(mem_id: str) -> int:
+    """Return the FAISS id of the memory with id ``mem_id``."""
+    digest = hashlib.blake2b(str(mem_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & _MASK
+
+
+def vector_ids(records: Iterable[dict]) -> np.ndarray:
+    return np.fromiter((vector_id(r["id"]) for r in records), dtype="int64")
+
+
+def is_id_mapped(index: faiss.Index | None) -> bool:
+    if index is None:
+        return False
+    return isinstance(faiss.downcast_index(index), (faiss.IndexIDMap, faiss.IndexIDMap2))
+
+
+def _reconstruct_all(index: faiss.Index) -> np.ndarray:
+    try:
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def with_id_map(index: faiss.Index, ids: np.ndarray | None = None) -> faiss.Index:
+    """Return ``index`` wrapped in an ``IndexIDMap2``.
+
+    Vectors already in a positional index are re-added under ``ids`` (one
+    per vector, in index order).
+    """
+    if is_id_mapped(index):
+        return index
+    if index.ntotal == 0:
+        return faiss.IndexIDMap2(index)
+    if ids is None or len(ids) != index.ntotal:
+        raise ValueError("need one id per stored vector to convert the index")
+    vecs = _reconstruct_all(index)
+    empty = faiss.clone_index(index)
+    empty.reset()
+    mapped = faiss.IndexIDMap2(empty)
+    mapped.add_with_ids(vecs, np.ascontiguousarray(ids, dtype="int64"))
+    return mapped
+
+
+def _storage(index: faiss.Index) -> faiss.Index:
+    return faiss.downcast_index(index.index) if is_id_mapped(index) else faiss.downcast_index(index)
+
+
+def _removes_in_place(index: faiss.Index) -> bool:
+    # flat / SQ / PQ codes renumber the remaining vectors as ID maps expect;
+    # IVF keeps its numbering and HNSW / refine indexes cannot remove at all
+    return isinstance(_storage(index), faiss.IndexFlatCodes)
+
+
+def check_removable(index: faiss.Index, have_vectors: bool = False) -> None:
+    """Raise ``ValueError`` if vectors cannot be removed from ``index``.
+
+    Indexes that cannot drop vectors in place are rebuilt, which needs the
+    stored vectors back: from ``have_vectors`` (a full-precision copy) or
+    from the index itself.
+    """
+    if have_vectors or _removes_in_place(index) or index.ntotal == 0:
+        return
+    inner = _storage(index)
+    if faiss.try_extract_index_ivf(inner) is not None:
+        return
+    try:
+        inner.reconstruct(0)
+    except RuntimeError as e:
+        raise ValueError(
+            f"cannot remove vectors from a {type(inner).__name__} index: "
+            f"it neither supports removal nor returns its vectors ({e})"
+        ) from e
+
+
+def remove_ids(
+    index: faiss.Index, ids: np.ndarray, vectors: np.ndarray | None = None
+) -> tuple[faiss.Index, int]:
+    """Remove the vectors ``ids``; return the index to keep and how many went.
+
+    ``IndexIDMap2`` expects its inner index to renumber the remaining
+    vectors after ``remove_ids``, which only the flat-code indexes do. IVF,
+    HNSW and refine indexes are rebuilt without the removed vectors
+    instead, from ``vectors`` (full precision, in index order) when given
+    or else from the index's own reconstruction.
+    """
+    ids = np.ascontiguousarray(ids, dtype="int64")
+    if _removes_in_place(index):
+        return index, int(index.remove_ids(ids))
+    check_removable(index, vectors is not None)
+    mapped = is_id_mapped(index)
+    inner = _storage(index)
+    keys = faiss.vector_to_array(index.id_map) if mapped else np.arange(index.ntotal)
+    keep = ~np.isin(keys, ids)
+    if keep.all():
+        return index, 0
+    vecs = _reconstruct_all(inner) if vectors is None else vectors
+    vecs = np.ascontiguousarray(np.asarray(vecs)[keep], dtype="float32")
+    empty = faiss.clone_index(inner)
+    empty.reset()
+    if mapped:
+        rebuilt = faiss.IndexIDMap2(empty)
+        rebuilt.add_with_ids(vecs, keys[keep])
+    else:
+        rebuilt = empty
+        rebuilt.add(vecs)
+    return rebuilt, int((~keep).sum())
+
+
+def add_vectors(index: faiss.Index, vecs: np.ndarray, records: list[dict]) -> None:
+    """Add ``vecs`` under the ids of ``records`` (positionally for old indexes)."""
+    if is_id_mapped(index):
+        index.add_with_ids(vecs, vector_ids(records))
+    else:
+        index.add(vecs)
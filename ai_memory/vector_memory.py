@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import os
+import bisect
+import glob
+import heapq
 import pickle
 import logging
+from collections import ChainMap
+from collections.abc import Mapping, Sequence as SequenceABC
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 try:
     from sentence_transformers import SentenceTransformer  # noqa
@@ -15,37 +22,196 @@ except Exception:  # pragma: no cover
     )  # type: ignore
 
 import faiss
+import numpy as np
+
+from . import exact_vectors, index_info, index_io, index_tuner, segments
+from .vector_ids import add_vectors, is_id_mapped, vector_id
+from .chunker import Chunk, stitch as stitch_chunks
+from .meta_columns import MetaColumns, MetaFilter, search_params, source_type
+from .store_paths import default_index_path, index_candidates
+from .text_store import TextStore
+from .model_config import resolve_embed_model
 
 
 logger = logging.getLogger(__name__)
 
+SEARCH_THREADS = int(os.getenv("LUNA_VECTOR_SEARCH_THREADS", 0)) or os.cpu_count() or 1
+
+
+def shard_paths(spec: str | Iterable[str | Path] | None = None) -> List[Path]:
+    """Expand a shard set into index paths.
+
+    ``spec`` is a list, or a string of entries separated by ``os.pathsep``
+    (default ``$LUNA_VECTOR_SHARDS``). Each entry is an index file, a
+    directory (every ``*.index`` in it) or a glob pattern.
+    """
+    if spec is None:
+        spec = os.getenv("LUNA_VECTOR_SHARDS", "")
+    if isinstance(spec, (str, Path)):
+        spec = [part for part in str(spec).split(os.pathsep) if part.strip()]
+    paths: List[Path] = []
+    for entry in spec:
+        entry = os.path.expanduser(str(entry).strip())
+        if os.path.isdir(entry):
+            found = sorted(Path(entry).glob("*.index"))
+        elif glob.has_magic(entry):
+            found = [Path(p) for p in sorted(glob.glob(entry))]
+        else:
+            found = [Path(entry)]
+        for path in found:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
 
 @dataclass
 class MemoryEntry:
     id: str
     text: str
     timestamp: float
+    source: Optional[str] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    conversation: Optional[str] = None
+
+
+class _StoredEntries(SequenceABC):
+    """Entries of a text store, decoded on access, followed by segment entries."""
+
+    def __init__(self, store: TextStore) -> None:
+        self.store = store
+        self.extra: List[MemoryEntry] = []
+
+    def __len__(self) -> int:
+        return len(self.store) + len(self.extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i < len(self.store):
+            return MemoryEntry(**self.store.row(i))
+        return self.extra[i - len(self.store)]
+
+    def extend(self, entries: Iterable[MemoryEntry]) -> None:
+        self.extra.extend(entries)
+
+    def ids(self) -> Iterator[str]:
+        """Yield the memory ids in order without decoding any text."""
+        for i in range(len(self.store)):
+            yield self.store.memory_id(i)
+        for e in self.extra:
+            yield e.id
+
+
+class _ChainedEntries(SequenceABC):
+    """Read-only concatenation of the entries of several shards."""
+
+    def __init__(self, parts: List[Sequence[MemoryEntry]]) -> None:
+        self.parts = parts
+        self._ends = []
+        total = 0
+        for part in parts:
+            total += len(part)
+            self._ends.append(total)
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        part = bisect.bisect_right(self._ends, i)
+        return self.parts[part][i - (self._ends[part - 1] if part else 0)]
+
+
+class _EntriesById(Mapping):
+    """``memories`` of a text store: id -> entry, with the id index built on first use."""
+
+    def __init__(self, entries: _StoredEntries) -> None:
+        self._entries = entries
+        self._rows: Optional[Dict[str, int]] = None
+
+    def _index(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {mem_id: row for row, mem_id in enumerate(self._entries.ids())}
+        return self._rows
+
+    def __getitem__(self, mem_id: str) -> MemoryEntry:
+        return self._entries[self._index()[mem_id]]
+
+    def __contains__(self, mem_id) -> bool:
+        return mem_id in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
 
 
 class VectorMemory:
     """Load and query FAISS vector memory with metadata."""
 
-    def __init__(self, index_path: str | None = None) -> None:
-        base = Path(os.getenv("LUNA_VECTOR_DIR", ".ai_memory"))
-        default_index = base / "memory_store.index"
-        self.index_path = Path(
-            os.getenv("LUNA_VECTOR_INDEX", index_path or default_index)
-        )
+    def __init__(
+        self,
+        index_path: str | None = None,
+        mmap: bool | None = None,
+        shards: str | Iterable[str | Path] | None = None,
+    ) -> None:
+        self._set_index_path(default_index_path(index_path))
+        Path(os.getenv("LUNA_VECTOR_DIR", ".ai_memory")).mkdir(parents=True, exist_ok=True)
+        # read-only shared mapping of the base index (see index_io)
+        self.mmap = index_io.mmap_default() if mmap is None else mmap
+        self.index: faiss.Index | None = None
+        # delta segments when the base index is mapped and must not change
+        self._delta: faiss.Index | None = None
+        self._mapped = False
+        # entries are decoded on access when a text store backs the metadata
+        self.memories: Mapping[str, MemoryEntry] = {}
+        self._ordered: Sequence[MemoryEntry] = []
+        self._by_source: Optional[Dict[str, Tuple[List[int], List[int]]]] = None
+        self._columns: Optional[MetaColumns] = None
+        self._key_order: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        # full-precision vectors for re-ranking (see exact_vectors): the
+        # side file covers the first _base_rows entries, segments the rest
+        self._exact: Optional[np.ndarray] = None
+        self._base_rows = 0
+        self._segment_vecs: List[np.ndarray] = []
+        self.model = None
+        self.model_name = resolve_embed_model()
+        self._stamp = None
+        # a shard set is searched as one store; see shard_paths()
+        self.shards: List[VectorMemory] = []
+        for path in shard_paths(shards):
+            shard = VectorMemory(mmap=self.mmap, shards=())
+            shard._set_index_path(path)
+            self.shards.append(shard)
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _set_index_path(self, index_path: Path) -> None:
+        self.index_path = index_path
         # Metadata files live alongside the index file
         self.meta_dir = self.index_path.parent
         self.meta_path = self.meta_dir / f"{self.index_path.stem}.pkl"
         self.legacy_path = self.meta_dir / f"{self.index_path.stem}.memories.pkl"
-        base.mkdir(parents=True, exist_ok=True)
-        self.index: faiss.Index | None = None
-        self.memories: Dict[str, MemoryEntry] = {}
-        self._ordered: List[MemoryEntry] = []
-        self.model = None
-        self.model_name = "BAAI/bge-large-en-v1.5"
+
+    def stamp(self) -> tuple:
+        """Return what changes on disk when the store must be reloaded."""
+        if self.shards:
+            return tuple(shard.stamp() for shard in self.shards)
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except OSError:
+            mtime = None
+        return mtime, len(segments.list_segments(self.index_path))
 
     def _load_embedding_model(self) -> None:
         """Load embedding model with CPU fallback."""
@@ -63,34 +229,38 @@ class VectorMemory:
 
     def load(self) -> bool:
         """Load FAISS index and metadata."""
-        search_dirs = [Path("."), Path(os.getenv("LUNA_VECTOR_DIR", ".ai_memory")), Path(".ai_memory")]
-        candidates = []
-        if self.index_path.is_absolute():
-            candidates.append(self.index_path)
-        else:
-            candidates.append(self.index_path)
-            for d in search_dirs:
-                candidates.append(d / self.index_path.name)
-
+        if self.shards:
+            return self._load_shards()
+        candidates = index_candidates(self.index_path)
         index_file = None
         for cand in candidates:
             logger.debug("Looking for index file at %s", cand)
             if cand.exists():
                 index_file = cand
                 break
+        self._mapped = False
         if index_file:
             self.index_path = index_file
             try:
-                self.index = faiss.read_index(str(index_file))
+                self.index = index_io.read_index(index_file, mmap=self.mmap)
+                self._mapped = self.mmap
             except Exception as e:
                 logger.warning("Failed to read index %s: %s", index_file, e)
                 self.index = None
         else:
             logger.error("Index file not found. Tried: %s", ", ".join(str(c) for c in candidates))
             self.index = None
+        self._delta = None
 
         meta_obj = None
-        meta_candidates = [
+        ordered: Sequence[MemoryEntry] | None = None
+        if TextStore.exists(self.index_path):
+            try:
+                ordered = _StoredEntries(TextStore(self.index_path))
+                logger.info("Mapped metadata text store of %s", self.index_path)
+            except (OSError, ValueError) as e:
+                logger.warning("Failed to open text store of %s: %s", self.index_path, e)
+        meta_candidates = [] if ordered is not None else [
             self.legacy_path,
             self.meta_path,
             self.index_path.with_suffix(".memories.pkl"),
@@ -108,68 +278,420 @@ class VectorMemory:
                     logger.warning("Failed to read metadata %s: %s", mpath, e)
         if meta_obj is not None:
             logger.info("Loaded metadata from %s", path)
-        if meta_obj is None:
+
+        if ordered is None:
+            ordered = self._entries_from_meta(meta_obj)
+        self._base_rows = len(ordered)
+        self._segment_vecs = []
+        seg_count = self._load_segments(ordered)
+        if not isinstance(ordered, _StoredEntries) and meta_obj is None and not seg_count:
             logger.error("Metadata files not found")
             self.memories = {}
             self._ordered = []
             return False
 
+        if isinstance(ordered, _StoredEntries):
+            self.memories = _EntriesById(ordered)
+        else:
+            self.memories = {entry.id: entry for entry in ordered}
+        self._ordered = ordered
+        self._by_source = None
+        self._columns = None
+        self._key_order = None
+        self._exact = None
+        if not exact_vectors.is_exact(self.index):
+            self._exact = exact_vectors.read_vectors(self.index_path, self._base_rows)
+        self._stamp = self.stamp()
+        self._check_model()
+
+        ntotal = self.ntotal
+        if self.index and len(self._ordered) != ntotal:
+            logger.warning(
+                "Vector/metadata count mismatch: %d != %d",
+                len(self._ordered),
+                ntotal,
+            )
+        logger.info("Loaded %d memories", len(self._ordered))
+        return True
+
+    def _load_shards(self) -> bool:
+        """Load every shard whose files changed since it was last loaded."""
+        loaded = False
+        for shard in self.shards:
+            if shard._stamp is None or shard._stamp != shard.stamp():
+                shard.load()
+            loaded = loaded or bool(shard._ordered)
+        self.memories = ChainMap(*(shard.memories for shard in self.shards))
+        self._ordered = _ChainedEntries([shard._ordered for shard in self.shards])
+        models = {shard.model_name for shard in self.shards if shard.index is not None}
+        if len(models) > 1:
+            logger.warning("Shards use different embedding models: %s", ", ".join(sorted(models)))
+        logger.info("Loaded %d memories from %d shards", len(self._ordered), len(self.shards))
+        return loaded
+
+    @property
+    def ntotal(self) -> int:
+        """Number of searchable vectors, base and delta segments."""
+        if self.shards:
+            return sum(shard.ntotal for shard in self.shards)
+        total = self.index.ntotal if self.index is not None else 0
+        return total + (self._delta.ntotal if self._delta is not None else 0)
+
+    def _check_model(self) -> None:
+        """Embed queries with the model the index was built with.
+
+        Search parameters saved by ``aimem tune-index`` are applied as well.
+        """
+        info = index_info.read_info(self.index_path)
+        if self.index is not None:
+            applied = index_tuner.apply_params(self.index, info.get("search_params"))
+            if applied:
+                logger.info("Search parameters for %s: %s", self.index_path, applied)
+        recorded = info.get("model")
+        if recorded and recorded != self.model_name:
+            logger.info("Index %s was built with %s", self.index_path, recorded)
+            self.model_name = recorded
+        dims = info.get("dims")
+        if dims and self.index is not None and self.index.d != dims:
+            logger.warning(
+                "Index %s has %d-d vectors but its info records %d",
+                self.index_path,
+                self.index.d,
+                dims,
+            )
+
+    @staticmethod
+    def _entries_from_meta(meta_obj) -> List[MemoryEntry]:
+        """Return metadata entries in index order for either side-car format."""
+        ordered: List[MemoryEntry] = []
         if isinstance(meta_obj, dict):
-            mems: Dict[str, MemoryEntry] = {}
-            ordered: List[MemoryEntry] = []
             for k, v in meta_obj.items():
                 if isinstance(v, MemoryEntry):
                     entry = v
                 elif isinstance(v, dict):
                     ts = v.get("timestamp", 0)
+                    loc = v.get("metadata") or {}
                     entry = MemoryEntry(
                         id=v.get("id", k),
                         text=v.get("text", ""),
                         timestamp=ts.timestamp() if hasattr(ts, "timestamp") else float(ts),
+                        source=loc.get("source"),
+                        start=loc.get("start"),
+                        end=loc.get("end"),
+                        conversation=loc.get("conversation"),
                     )
                 else:
                     continue
-                mems[entry.id] = entry
                 ordered.append(entry)
-            self.memories = mems
-            self._ordered = ordered
         elif isinstance(meta_obj, list):
-            mems: Dict[str, MemoryEntry] = {}
-            ordered: List[MemoryEntry] = []
             for item in meta_obj:
                 if isinstance(item, dict):
                     mid = item.get("id") or str(len(ordered))
                     ts = item.get("timestamp", 0)
-                    entry = MemoryEntry(
-                        id=mid,
-                        text=item.get("text", ""),
-                        timestamp=ts.timestamp() if hasattr(ts, "timestamp") else float(ts),
+                    ordered.append(
+                        MemoryEntry(
+                            id=mid,
+                            text=item.get("text", ""),
+                            timestamp=ts.timestamp() if hasattr(ts, "timestamp") else float(ts),
+                            source=item.get("source"),
+                            start=item.get("start"),
+                            end=item.get("end"),
+                            conversation=item.get("conversation"),
+                        )
                     )
-                    mems[mid] = entry
-                    ordered.append(entry)
-            self.memories = mems
-            self._ordered = ordered
-        else:
-            self.memories = {}
-            self._ordered = []
+        return ordered
 
-        if self.index and len(self._ordered) != self.index.ntotal:
-            logger.warning(
-                "Vector/metadata count mismatch: %d != %d",
-                len(self._ordered),
-                self.index.ntotal,
+    def _load_segments(self, ordered: Sequence[MemoryEntry]) -> int:
+        """Append delta segments written by ``embed_file(append=True)``.
+
+        Segments a text store base already includes (merged but not yet
+        deleted) are skipped.
+        """
+        merged = ordered.store.merged if isinstance(ordered, _StoredEntries) else ()
+        pairs = segments.list_segments(self.index_path, merged)
+        for seg_index, seg_meta in pairs:
+            try:
+                vecs, records = segments.read_segment(seg_index, seg_meta)
+            except Exception as e:
+                logger.warning("Failed to read segment %s: %s", seg_index, e)
+                continue
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vecs.shape[1]))
+            if len(vecs):
+                add_vectors(self._writable(), vecs, records)
+                self._segment_vecs.append(vecs)
+            ordered.extend(self._entries_from_meta(records))
+        if pairs:
+            logger.info("Applied %d delta segments", len(pairs))
+        return len(pairs)
+
+    def _writable(self) -> faiss.Index:
+        """Return the index segments are added to.
+
+        A mapped base stays untouched: segments go to an in-memory delta
+        index that ``search`` queries alongside it. Positional (pre-id)
+        indexes cannot be split that way and are read into memory instead.
+        """
+        if not self._mapped:
+            return self.index
+        if not is_id_mapped(self.index):
+            logger.info("Reading positional index %s into memory to apply segments", self.index_path)
+            self.index = faiss.read_index(str(self.index_path))
+            self._mapped = False
+            return self.index
+        if self._delta is None:
+            self._delta = faiss.IndexIDMap2(faiss.IndexFlat(self.index.d, self.index.metric_type))
+        return self._delta
+
+    def columns(self) -> MetaColumns:
+        """Return the filterable metadata columns, keyed like the index.
+
+        A text store provides them straight from its record table; only
+        entries of delta segments are read one by one.
+        """
+        if self._columns is not None:
+            return self._columns
+        entries = self._ordered
+        if isinstance(entries, _StoredEntries):
+            store, rec = entries.store, entries.store.records
+            types: Dict[str, int] = {}
+            # the trailing -1 maps "no source" (code -1) to "no type"
+            type_of = np.array(
+                [types.setdefault(source_type(src), len(types)) for src in store.sources] + [-1],
+                dtype="int16",
             )
-        logger.info("Loaded %d memories", len(self._ordered))
-        return True
+            cols = MetaColumns(
+                rec["vid"],
+                rec["timestamp"],
+                rec["conversation"],
+                {name: code for code, name in enumerate(store.conversations)},
+                type_of[rec["source"]],
+                types,
+            )
+            extra = entries.extra
+            cols.extend(np.fromiter((vector_id(e.id) for e in extra), dtype="int64"), extra)
+        else:
+            keys = np.fromiter((vector_id(e.id) for e in entries), dtype="int64")
+            cols = MetaColumns.from_entries(keys, entries)
+        if not is_id_mapped(self.index):
+            # indexes written before vector ids are keyed by list position
+            cols.keys = np.arange(len(cols), dtype="int64")
+        self._columns = cols
+        return cols
 
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[MemoryEntry, float]]:
-        if not self.index or not self._ordered:
+    def _rows(self, keys: np.ndarray) -> np.ndarray:
+        """Map FAISS result ids to rows of ``_ordered`` (-1 if unknown)."""
+        keys = np.asarray(keys, dtype="int64")
+        if not is_id_mapped(self.index):
+            return np.where((keys >= 0) & (keys < len(self._ordered)), keys, -1)
+        if self._key_order is None:
+            all_keys = self.columns().keys
+            order = np.argsort(all_keys, kind="stable")
+            self._key_order = (all_keys[order], order)
+        sorted_keys, order = self._key_order
+        if not len(sorted_keys):
+            return np.full(keys.shape, -1, dtype="int64")
+        pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return np.where(sorted_keys[pos] == keys, order[pos], -1)
+
+    def has_conversation(self, conversation: str) -> bool:
+        """Return True if any memory is tagged with ``conversation``."""
+        if self.shards:
+            return any(shard.has_conversation(conversation) for shard in self.shards)
+        return bool(self._ordered) and str(conversation) in self.columns().conversations
+
+    def _search_vectors(self, vec, k: int, selector: faiss.IDSelector | None = None):
+        """Search the base index and the delta segments, best ``k`` first.
+
+        With ``selector`` only the vectors whose ids it accepts are scored.
+        """
+        params = search_params(self.index, selector) if selector is not None else None
+        D, I = self.index.search(vec, k, params=params)
+        if self._delta is None or not self._delta.ntotal:
+            return D, I
+        params = search_params(self._delta, selector) if selector is not None else None
+        dD, dI = self._delta.search(vec, k, params=params)
+        D, I = np.hstack([D, dD]), np.hstack([I, dI])
+        order = np.argsort(D, axis=1, kind="stable")
+        if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            order = order[:, ::-1]
+        order = order[:, :k]
+        return np.take_along_axis(D, order, 1), np.take_along_axis(I, order, 1)
+
+    def search(
+        self, query: str, top_k: int = 5, rerank: int | None = None, **filters
+    ) -> List[Tuple[MemoryEntry, float]]:
+        return self.search_many([query], top_k, rerank, **filters)[0]
+
+    def search_many(
+        self, queries: Sequence[str], top_k: int = 5, rerank: int | None = None, **filters
+    ) -> List[List[Tuple[MemoryEntry, float]]]:
+        """Return the hits of every query in ``queries``.
+
+        All queries are encoded in one model call and searched with one
+        FAISS call over the query matrix (per shard). ``filters`` are the
+        ``MetaFilter`` fields (``conversation``, ``source_type``, ``since``,
+        ``until``); they restrict the search itself, so up to ``top_k``
+        matching hits are returned.
+
+        ``rerank=m`` (default ``$LUNA_VECTOR_RERANK``) fetches ``top_k * m``
+        candidates from an approximate index and returns the best ``top_k``
+        by exact score; it has no effect on flat indexes.
+        """
+        flt = MetaFilter(**filters)
+        rerank = exact_vectors.RERANK if rerank is None else max(1, int(rerank))
+        queries = [str(q) for q in queries]
+        if not queries:
             return []
-        from .vector_embedder import _embed_text  # lazy to avoid circular import
-        vec = _embed_text(query)
-        D, I = self.index.search(vec, top_k)
-        results: List[Tuple[MemoryEntry, float]] = []
-        for dist, idx in zip(D[0], I[0]):
-            if 0 <= idx < len(self._ordered):
-                results.append((self._ordered[idx], float(dist)))
-        return results
+        if self.shards:
+            return self._search_shards(queries, top_k, flt, rerank)
+        if not self.index or not self._ordered:
+            return [[] for _ in queries]
+        return self._hits(self._embed_queries(queries), top_k, flt, rerank)
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        # lazy to avoid circular import
+        from .vector_embedder import _embed_texts, set_model
+
+        set_model(self.model_name)
+        return _embed_texts(queries)
+
+    def _search_shards(
+        self, queries: List[str], top_k: int, flt: MetaFilter, rerank: int = 1
+    ) -> List[List[Tuple[MemoryEntry, float]]]:
+        """Fan the queries out over the shards and merge their top ``top_k``.
+
+        Queries are embedded once per embedding model; FAISS releases the
+        GIL while searching, so shards are searched in parallel.
+        """
+        live = [shard for shard in self.shards if shard.index is not None and shard._ordered]
+        if not live:
+            return [[] for _ in queries]
+        vecs = {}
+        for shard in live:
+            if shard.model_name not in vecs:
+                vecs[shard.model_name] = shard._embed_queries(queries)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=min(len(self.shards), SEARCH_THREADS),
+                thread_name_prefix="vector-shard",
+            )
+        found = list(
+            self._pool.map(lambda shard: shard._hits(vecs[shard.model_name], top_k, flt, rerank), live)
+        )
+        pick = heapq.nsmallest if live[0].index.metric_type == faiss.METRIC_L2 else heapq.nlargest
+        return [
+            pick(top_k, chain.from_iterable(per_shard[q] for per_shard in found), key=lambda hit: hit[1])
+            for q in range(len(queries))
+        ]
+
+    def _hits(
+        self, vecs: np.ndarray, top_k: int, flt: MetaFilter = MetaFilter(), rerank: int = 1
+    ) -> List[List[Tuple[MemoryEntry, float]]]:
+        """Search this store with a matrix of embedded queries."""
+        if vecs.shape[1] != self.index.d:
+            raise ValueError(
+                f"{self.model_name} produces {vecs.shape[1]}-d vectors "
+                f"but {self.index_path} holds {self.index.d}-d vectors"
+            )
+        selector = None
+        if flt:
+            keys = self.columns().select(flt)
+            if not len(keys):
+                return [[] for _ in range(len(vecs))]
+            selector = faiss.IDSelectorBatch(keys)
+        if rerank > 1 and not exact_vectors.is_exact(self.index):
+            D, I = self._search_vectors(vecs, top_k * rerank, selector)
+            D, rows = self._rerank(vecs, D, self._rows(I), top_k)
+        else:
+            D, I = self._search_vectors(vecs, top_k, selector)
+            rows = self._rows(I)
+        # only the returned hits are decoded from a text store
+        return [
+            [(self._ordered[int(row)], float(dist)) for dist, row in zip(dists, found) if row >= 0]
+            for dists, found in zip(D, rows)
+        ]
+
+    def _exact_rows(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        """Return the full-precision vectors of ``rows`` (zeros where -1)."""
+        flat = rows.ravel()
+        out = np.zeros((len(flat), self.index.d), dtype="float32")
+        base = (flat >= 0) & (flat < self._base_rows)
+        if base.any():
+            if self._exact is not None:
+                out[base] = self._exact[flat[base]]
+            else:
+                found = exact_vectors.reconstruct(self.index, self.columns().keys[flat[base]])
+                if found is None:
+                    return None
+                out[base] = found
+        extra = flat >= self._base_rows
+        if extra.any():
+            if len(self._segment_vecs) > 1:
+                self._segment_vecs = [np.vstack(self._segment_vecs)]
+            out[extra] = self._segment_vecs[0][flat[extra] - self._base_rows]
+        return out.reshape(rows.shape + (self.index.d,))
+
+    def _rerank(
+        self, queries: np.ndarray, D: np.ndarray, rows: np.ndarray, top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Re-score candidate ``rows`` exactly and keep the best ``top_k``."""
+        candidates = self._exact_rows(rows)
+        if candidates is None:
+            return D[:, :top_k], rows[:, :top_k]
+        metric = self.index.metric_type
+        scores = exact_vectors.rescore(queries, candidates, metric)
+        if metric == faiss.METRIC_L2:
+            scores = np.where(rows >= 0, scores, np.inf)
+            order = np.argsort(scores, axis=1, kind="stable")
+        else:
+            scores = np.where(rows >= 0, scores, -np.inf)
+            order = np.argsort(-scores, axis=1, kind="stable")
+        order = order[:, :top_k]
+        return np.take_along_axis(scores, order, 1), np.take_along_axis(rows, order, 1)
+
+    def _source_index(self) -> Dict[str, Tuple[List[int], List[int]]]:
+        """Return ``source -> (chunk starts, rows)`` sorted by start offset."""
+        located: Dict[str, List[Tuple[int, int]]] = {}
+        entries = self._ordered
+        extra: Sequence[MemoryEntry] = entries
+        base = 0
+        if isinstance(entries, _StoredEntries):
+            store, rec = entries.store, entries.store.records
+            for row in np.nonzero((rec["source"] >= 0) & (rec["start"] >= 0))[0]:
+                source = store.sources[rec["source"][row]]
+                located.setdefault(source, []).append((int(rec["start"][row]), int(row)))
+            extra, base = entries.extra, len(store)
+        for i, e in enumerate(extra):
+            if e.source is not None and e.start is not None:
+                located.setdefault(e.source, []).append((e.start, base + i))
+        by_source = {}
+        for source, pairs in located.items():
+            pairs.sort()
+            by_source[source] = ([p[0] for p in pairs], [p[1] for p in pairs])
+        return by_source
+
+    def stitch(self, entry: MemoryEntry, window: int = 1) -> str:
+        """Return ``entry`` joined with up to ``window`` neighbouring chunks.
+
+        Neighbours are chunks of the same source ordered by offset; their
+        overlapping text is only included once. Entries without offsets are
+        returned unchanged.
+        """
+        if entry.source is None or entry.start is None:
+            return entry.text
+        for shard in self.shards:
+            if entry.id in shard.memories:
+                return shard.stitch(entry, window)
+        if self._by_source is None:
+            self._by_source = self._source_index()
+        starts, rows = self._by_source.get(entry.source, ([], []))
+        pos = bisect.bisect_left(starts, entry.start)
+        while pos < len(starts) and starts[pos] == entry.start:
+            if self._ordered[rows[pos]].id == entry.id:
+                break
+            pos += 1
+        if pos >= len(rows) or starts[pos] != entry.start:
+            return entry.text
+        picked = [self._ordered[row] for row in rows[max(0, pos - window) : pos + window + 1]]
+        return stitch_chunks(Chunk(e.text, e.start, e.end) for e in picked)
@@ -12,6 +12,8 @@ cd ~/memory_optimizer
 STORE_DIR=".ai_memory"
 INDEX="$STORE_DIR/memory_store.index"
 TMP="$(mktemp "${STORE_DIR}/export_XXXX.json")"
+# unchanged texts are served from here instead of re-embedding
+export AIMEM_EMBED_CACHE="${AIMEM_EMBED_CACHE:-$HOME/ai_memory/embed_cache.db}"
 
 # 2. Export conversations → JSON -----------------------------------
 echo "[luna‑revector] exporting …"
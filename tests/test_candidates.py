@@ -0,0 +1,104 @@
+import sqlite3
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import memory_store as memory_store_mod
+from ai_memory import relevance_engine
+from ai_memory.memory_db import _ensure_schema, entity_ids
+from ai_memory.memory_optimizer import MemoryOptimizer
+from ai_memory.memory_store import MemoryStore
+from ai_memory.relevance_engine import RelevanceEngine
+from ai_memory.vector_embedder import embed_file
+
+LIMITS = {"recent": 3, "important": 2, "conversation": 2, "entity": 5, "essential": 5}
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch, tmp_path):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(tmp_path / "missing.index"))
+
+
+def _fill(store, n=30):
+    """``n`` filler memories, newest last, plus named special cases."""
+    now = datetime.now(tz=timezone.utc)
+    ids = {}
+
+    def add(key, content, age_hours, importance=0.1, conv_id=None, source_type="conversation"):
+        mem_id = store.add(content, conv_id=conv_id, importance=importance, source_type=source_type)
+        store.conn.execute(
+            "UPDATE memory_fragments SET created_at=? WHERE mem_id=?",
+            ((now - timedelta(hours=age_hours)).isoformat(), mem_id),
+        )
+        ids[key] = mem_id
+
+    for i in range(n):
+        add(f"filler{i}", f"filler note {i}", age_hours=100 - i)
+    add("important", "old but important", age_hours=5000, importance=9.0)
+    add("conversation", "said in this chat", age_hours=4000, conv_id="chat-1")
+    add("essential", "who the user is", age_hours=6000, source_type="core_identity")
+    add("entity", "see https://example.org/docs for details", age_hours=7000)
+    add("lexical", "the zeppelin hangar key", age_hours=8000)
+    add("forgotten", "nothing special", age_hours=9000, importance=0.0)
+    store.conn.commit()
+    return ids
+
+
+def test_pool_unions_the_indexed_sources():
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    store = MemoryStore(conn)
+    ids = _fill(store)
+
+    pool = store.candidates(limits=LIMITS)
+    assert {ids[k] for k in ("filler29", "filler28", "filler27", "important", "essential")} <= set(pool.ids)
+    assert len(pool) <= 3 + 2 + 1  # recent + important + essential
+    assert ids["forgotten"] not in pool.ids and ids["conversation"] not in pool.ids
+
+    pool = store.candidates(
+        conv_id="chat-1",
+        entity_ids=entity_ids("what is on https://example.org/docs"),
+        mem_ids=[ids["lexical"], ids["lexical"]],
+        limits=LIMITS,
+    )
+    for key in ("filler29", "filler27", "important", "conversation", "essential", "entity", "lexical"):
+        assert ids[key] in pool.ids
+    assert ids["forgotten"] not in pool.ids and ids["filler26"] not in pool.ids
+    assert len(pool.ids) == len(set(pool.ids))
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    monkeypatch.setattr(memory_store_mod, "CANDIDATE_LIMITS", LIMITS)
+    # the fake embedder has no notion of meaning; leave the nearest vectors out
+    monkeypatch.setattr(relevance_engine, "SEMANTIC_CANDIDATES", 0)
+
+
+def test_engine_adds_retriever_hits(small_pool):
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    store = MemoryStore(conn)
+    ids = _fill(store)
+
+    engine = RelevanceEngine(store)
+    pool = engine.select_candidates("where is the zeppelin hangar key", None)
+    assert ids["lexical"] in pool.ids and ids["forgotten"] not in pool.ids
+    assert len(pool) < len(store.columns())
+    scores = engine.score_columns(pool, "where is the zeppelin hangar key", None)
+    fillers = [scores[ids[k]]["score"] for k in ids if k.startswith("filler") and ids[k] in scores]
+    assert scores[ids["lexical"]]["score"] > max(fillers)
+
+
+def test_optimizer_scores_the_pool(tmp_path, monkeypatch, small_pool):
+    monkeypatch.setenv("AI_MEMORY_ROOT", str(tmp_path))
+    optimizer = MemoryOptimizer()
+    _fill(optimizer.memory_store)
+    context = optimizer.build_optimal_context({"max_tokens": 200}, "zeppelin hangar key", None)
+    assert "the zeppelin hangar key" in context
+    assert "nothing special" not in context
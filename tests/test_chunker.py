@@ -0,0 +1,64 @@
+import sys
+import types
+
+import pytest
+
+from ai_memory.chunker import chunk_text, stitch
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.vector_embedder import embed_file
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _doc():
+    paras = [" ".join(f"p{i}w{j}" for j in range(30)) for i in range(6)]
+    return "\n\n".join(paras)
+
+
+def test_chunks_respect_size_overlap_and_offsets():
+    text = _doc()
+    chunks = chunk_text(text, chunk_tokens=50, overlap=5)
+    assert len(chunks) > 3
+    for c in chunks:
+        assert text[c.start : c.end] == c.text
+        assert len(c.text.split()) <= 50
+    # consecutive chunks overlap and together cover the document
+    for a, b in zip(chunks, chunks[1:]):
+        assert b.start < a.end
+    assert stitch(chunks) == text
+
+
+def test_paragraph_breaks_preferred():
+    text = _doc()
+    chunks = chunk_text(text, chunk_tokens=40, overlap=0)
+    assert chunks[0].text == text.split("\n\n")[0]
+
+
+def test_short_text_single_chunk():
+    assert [c.text for c in chunk_text("hello world", 10, 2)] == ["hello world"]
+
+
+def test_long_file_chunked_and_stitched(tmp_path, monkeypatch):
+    doc = tmp_path / "log.md"
+    doc.write_text(_doc())
+    index = tmp_path / "mem.index"
+    from ai_memory.vector_embedder import IndexSession
+
+    with IndexSession(str(index), chunk_tokens=40, chunk_overlap=4) as session:
+        session.add_file(str(doc))
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory()
+    assert vm.load()
+    assert len(vm._ordered) == vm.index.ntotal > 3
+    middle = vm._ordered[2]
+    assert middle.source == str(doc)
+    joined = vm.stitch(middle, window=1)
+    assert vm._ordered[1].text in joined and vm._ordered[3].text in joined
+    assert joined in doc.read_text()
@@ -0,0 +1,97 @@
+import math
+import sqlite3
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.memory_columns import MemoryColumns
+from ai_memory.memory_db import _ensure_schema, rough_token_len
+from ai_memory.memory_store import MemoryStore
+from ai_memory.relevance_engine import RelevanceEngine
+from ai_memory.vector_embedder import embed_file
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch, tmp_path):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(tmp_path / "missing.index"))
+
+
+@pytest.fixture
+def store():
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    store = MemoryStore(conn)
+    now = datetime.now(tz=timezone.utc)
+    for i in range(40):
+        mem_id = store.add(" ".join(["word"] * (1 + i % 7)) + f" {i}", importance=0.1 * (i % 5))
+        conn.execute(
+            "UPDATE memory_fragments SET created_at=?, access_count=?, source_type=? WHERE mem_id=?",
+            (
+                (now - timedelta(hours=13 * i)).isoformat(),
+                i % 4,
+                "error_solution" if i % 3 == 0 else "conversation",
+                mem_id,
+            ),
+        )
+    conn.commit()
+    return store
+
+
+def _reference(memory):
+    age_hours = (datetime.now(tz=timezone.utc) - memory.timestamp).total_seconds() / 3600.0
+    score = 10 * math.exp(-age_hours / 168) + 5 * math.log1p(memory.access_count)
+    score += 12 if memory.type == "error_solution" else 0
+    return score + memory.importance_weight * 10
+
+
+def test_columns_from_sql_match_memories(store):
+    memories = store.get_all()
+    columns = store.columns()
+    assert columns.ids == list(memories)
+    for row, mem_id in enumerate(columns.ids):
+        built, expected = columns.memory(row), memories[mem_id]
+        assert built.timestamp.timestamp() == pytest.approx(expected.timestamp.timestamp(), abs=1e-3)
+        assert (built.type, built.access_count, built.importance_weight, built.content) == (
+            expected.type,
+            expected.access_count,
+            expected.importance_weight,
+            expected.content,
+        )
+    assert columns.token_cost.tolist() == [rough_token_len(m.content) for m in memories.values()]
+    assert MemoryColumns.from_rows([]).token_cost.shape == (0,)
+
+    # rows from before token estimates were stored are estimated alike
+    store.conn.execute("UPDATE memory_fragments SET token_estimate = NULL")
+    assert store.columns().token_cost.tolist() == [rough_token_len(m.content) for m in memories.values()]
+
+
+def test_vectorised_scores_match_the_formula(store):
+    engine = RelevanceEngine()
+    scores = engine.score_all(store.get_all(), None, None)
+    for entry in scores.values():
+        assert entry["score"] == pytest.approx(_reference(entry["memory"]), abs=1e-3)
+        assert entry["token_cost"] == rough_token_len(entry["memory"].content)
+
+    from_sql = engine.score_columns(store.columns(), None, None)
+    assert {k: v["score"] for k, v in from_sql.items()} == pytest.approx(
+        {k: v["score"] for k, v in scores.items()}, abs=1e-3
+    )
+
+
+def test_top_keeps_the_best_value_per_token(store):
+    engine = RelevanceEngine(store)
+    everything = engine.score_columns(store.columns(), "word 7", None)
+    top = engine.score_columns(store.columns(), "word 7", None, top=5)
+    value = {k: v["score"] / max(v["token_cost"], 1) for k, v in everything.items()}
+    assert set(top) == set(sorted(value, key=value.get, reverse=True)[:5])
+    assert all(isinstance(v["memory"].timestamp, datetime) for v in top.values())
+    assert np.isclose(
+        [top[k]["score"] for k in top], [everything[k]["score"] for k in top], atol=1e-6
+    ).all()
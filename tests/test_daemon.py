@@ -0,0 +1,114 @@
+import json
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import daemon, vector_embedder
+from ai_memory.vector_embedder import embed_file
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+@pytest.fixture
+def running(tmp_path, monkeypatch):
+    monkeypatch.setenv("AI_MEMORY_ROOT", str(tmp_path))
+    monkeypatch.setenv("AIMEM_SOCKET", str(tmp_path / "a.sock"))
+    monkeypatch.delenv("AIMEM_NO_DAEMON", raising=False)
+    index = tmp_path / "mem.index"
+    log = tmp_path / "log.json"
+    msgs = [{"content": {"parts": [p]}} for p in ["alpha beta", "gamma delta"]]
+    log.write_text(json.dumps({"conversations": [{"messages": msgs}]}))
+    embed_file(str(log), str(index), "dummy")
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+
+    d = daemon.MemoryDaemon(idle_unload=0.2)
+    t = threading.Thread(target=d.serve_forever, daemon=True)
+    t.start()
+    for _ in range(100):
+        if daemon.request("ping") is not None:
+            break
+        time.sleep(0.02)
+    yield d
+    d.shutdown()
+    t.join(5)
+
+
+def test_daemon_search_context_and_idle_unload(running):
+    hits = daemon.request("search", query="alpha beta", top_k=1)
+    assert hits[0]["text"] == "alpha beta"
+    batches = daemon.request("search_many", queries=["gamma delta", "alpha beta"], top_k=1)
+    assert [b[0]["text"] for b in batches] == ["gamma delta", "alpha beta"]
+
+    # the metadata filters reach the index search
+    assert daemon.request("search", query="alpha beta", top_k=2, conversation="other") == []
+    assert daemon.request("search_many", queries=["alpha beta"], top_k=2, since=4e9) == [[]]
+    assert len(daemon.request("search", query="alpha beta", top_k=2, until=4e9)) == 2
+
+    ctx = daemon.request("context", query="alpha", model="gpt-4", budget=1000)
+    assert isinstance(ctx, str)
+
+    with pytest.raises(RuntimeError):
+        daemon.request("bogus")
+
+    assert vector_embedder._model is not None
+    for _ in range(100):
+        if vector_embedder._model is None:
+            break
+        time.sleep(0.02)
+    assert vector_embedder._model is None
+    # model reloads on demand
+    assert daemon.request("search", query="gamma delta", top_k=1)[0]["text"] == "gamma delta"
+
+
+def test_daemon_embeds_new_memories_in_the_background(running):
+    from ai_memory.memory_store import MemoryStore
+
+    store = MemoryStore()
+    for i in range(40):
+        store.add(f"remember item {i}")
+
+    def pending():
+        return store.conn.execute(
+            "SELECT count(*) FROM memory_fragments WHERE embedding IS NULL"
+        ).fetchone()[0]
+
+    assert pending() == 40
+    daemon.request("context", query="item", model="gpt-4", budget=100)
+    for _ in range(200):
+        if pending() == 0:
+            break
+        time.sleep(0.02)
+    assert pending() == 0
+
+
+def test_daemon_uses_the_callers_stores(running, tmp_path):
+    from ai_memory.memory_store import MemoryStore
+
+    other = tmp_path / "other" / "mem.index"
+    other.parent.mkdir()
+    log = tmp_path / "other.json"
+    log.write_text(json.dumps({"conversations": [{"messages": [{"content": "epsilon zeta"}]}]}))
+    embed_file(str(log), str(other), "dummy")
+    db = tmp_path / "other" / "ai_memory.db"
+    MemoryStore(path=str(db)).add("a fact only the other store has")
+
+    assert daemon.request("search", query="epsilon zeta", top_k=1, index=str(other))[0]["text"] == "epsilon zeta"
+    # the default is whatever this process would have opened
+    assert daemon.request("search", query="epsilon zeta", top_k=1)[0]["text"] != "epsilon zeta"
+    ctx = daemon.request("context", query="fact", model="gpt-4", budget=1000, db=str(db))
+    assert "a fact only the other store has" in ctx
+    assert "only the other store" not in daemon.request("context", query="fact", model="gpt-4", budget=1000)
+
+
+def test_client_without_daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("AIMEM_SOCKET", str(tmp_path / "missing.sock"))
+    assert daemon.request("ping") is None
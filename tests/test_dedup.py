@@ -0,0 +1,81 @@
+import sys
+import types
+
+import faiss
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.dedup import Deduper, dedup_path
+from ai_memory.vector_embedder import IndexSession, embed_file
+from ai_memory.vector_memory import VectorMemory
+
+BASE = (
+    "the quick brown fox jumps over the lazy dog while the cat sleeps on the warm "
+    "windowsill and the birds sing outside in the tall green trees near the river bank "
+    "where children play every afternoon after school until the sun goes down"
+)
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def test_exact_and_near_duplicates(tmp_path):
+    d = Deduper(tmp_path / "d.db", threshold=0.8)
+    texts = [
+        BASE,
+        "  THE quick brown fox " + BASE[20:],  # exact after normalisation
+        BASE + " today",  # near duplicate
+        "something completely different about databases and indexes",
+    ]
+    assert d.filter(texts) == [0, 3]
+    assert d.stats() == {"exact": 1, "near": 1, "kept": 2}
+    d.commit()
+    d.close()
+
+    # persisted across runs; uncommitted additions are not
+    d = Deduper(tmp_path / "d.db", threshold=0.8)
+    assert d.filter([BASE, "a brand new message"]) == [1]
+    d.close()
+    d = Deduper(tmp_path / "d.db", threshold=0.8)
+    assert d.filter(["a brand new message"]) == [0]
+    d.close()
+
+
+def test_session_skips_texts_already_indexed(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index), dedup=True) as session:
+        assert session.add_texts([BASE, BASE, "other text"]) == 2
+    assert dedup_path(index).exists()
+    with IndexSession(str(index), dedup=True) as session:
+        assert session.add_texts([BASE + " today", "new text"]) == 1
+    assert faiss.read_index(str(index)).ntotal == 3
+
+    # a fresh index forgets what the old one had seen
+    index.unlink()
+    with IndexSession(str(index), dedup=True) as session:
+        assert session.add_texts([BASE]) == 1
+
+
+def test_vectorize_dedup_is_opt_in(tmp_path):
+    from click.testing import CliRunner
+
+    from ai_memory.cli import cli
+
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text(BASE)
+    b.write_text(BASE)
+    index = tmp_path / "mem.index"
+    run = lambda *args: CliRunner().invoke(cli, ["vectorize", *args, "--vector-index", str(index)])
+    assert run(str(a)).exit_code == 0
+    # the same text from another source is kept so a source filter finds it
+    assert run(str(b), "--append").exit_code == 0
+    # the side-car only remembers what was added with --dedup
+    assert run(str(b), "--append", "--dedup").exit_code == 0
+    assert run(str(b), "--append", "--dedup").exit_code == 0
+    vm = VectorMemory(str(index))
+    vm.load()
+    assert [e.text for e in vm._ordered] == [BASE] * 3
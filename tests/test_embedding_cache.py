@@ -0,0 +1,48 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.embedding_cache import EmbeddingCache
+from ai_memory import vector_embedder
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(vector_embedder, "SentenceTransformer", FakeSentenceTransformer)
+    yield
+    vector_embedder.set_embed_cache(None)
+
+
+def test_cache_hits_skip_model(tmp_path, monkeypatch):
+    vector_embedder.set_embed_cache(str(tmp_path / "cache.db"))
+    texts = ["alpha", "beta", "gamma"]
+    first = vector_embedder._embed_texts(texts)
+    cache = vector_embedder._get_cache()
+    assert cache.stats()["misses"] == 3
+
+    def _boom():
+        raise AssertionError("model should not be loaded")
+
+    monkeypatch.setattr(vector_embedder, "_get_model", _boom)
+    second = vector_embedder._embed_texts(list(reversed(texts)))
+    assert np.allclose(second, first[::-1])
+    assert cache.stats()["hits"] == 3
+
+
+def test_cache_lru_eviction(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.db", max_entries=2)
+    vecs = np.eye(3, dtype="float32")
+    cache.put_many("m", ["a"], vecs[:1])
+    cache.put_many("m", ["b"], vecs[1:2])
+    assert cache.get_many("m", ["a"])[0] is not None  # touch "a"
+    cache.put_many("m", ["c"], vecs[2:])
+    assert cache.stats()["entries"] == 2
+    hits = cache.get_many("m", ["a", "b", "c"])
+    assert hits[1] is None
+    assert hits[0] is not None and hits[2] is not None
+    assert cache.get_many("other", ["a"])[0] is None
@@ -0,0 +1,65 @@
+import sqlite3
+import sys
+import types
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.memory_db import _ensure_schema, entity_ids, entity_overlap
+from ai_memory.memory_store import MemoryStore
+from ai_memory.relevance_engine import RelevanceEngine
+from ai_memory.vector_embedder import embed_file
+
+TASK = "what did Ada Lovelace post on https://example.org/notes"
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch, tmp_path):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(tmp_path / "missing.index"))
+
+
+@pytest.fixture
+def store():
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    store = MemoryStore(conn)
+    ids = {
+        "both": store.add("Ada Lovelace wrote https://example.org/notes"),
+        "one": store.add("lunch with Ada Lovelace"),
+        "other": store.add("Charles Babbage at https://example.org/engine"),
+        "none": store.add("plain text"),
+    }
+    conn.execute("UPDATE memory_fragments SET created_at = (SELECT max(created_at) FROM memory_fragments)")
+    conn.commit()
+    return store, ids
+
+
+def test_overlap_is_counted_per_fragment(store):
+    store, ids = store
+    assert entity_ids(TASK) == ["person:ada lovelace", "url:https://example.org/notes"]
+    assert entity_overlap(store.conn, entity_ids(TASK)) == {ids["both"]: 2, ids["one"]: 1}
+    assert entity_overlap(store.conn, []) == {}
+
+    plan = " ".join(
+        row[-1]
+        for row in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT mf.mem_id FROM message_entities me "
+            "JOIN memory_fragments mf ON mf.msg_id = me.msg_id WHERE me.entity_id IN (?, ?)",
+            entity_ids(TASK),
+        )
+    )
+    assert "idx_memory_fragments_msg" in plan
+
+
+def test_shared_entities_raise_the_score(store, monkeypatch):
+    # leave BM25 out so the entity term is the only difference
+    monkeypatch.setattr("ai_memory.relevance_engine.LEXICAL_CANDIDATES", 0)
+    store, ids = store
+    scores = RelevanceEngine(store).score_columns(store.columns(), TASK, None)
+    base = scores[ids["none"]]["score"]
+    assert scores[ids["both"]]["score"] - base == pytest.approx(16, abs=1e-3)
+    assert scores[ids["one"]]["score"] - base == pytest.approx(8, abs=1e-3)
+    assert scores[ids["other"]]["score"] == pytest.approx(base, abs=1e-3)
@@ -0,0 +1,118 @@
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import exact_vectors
+from ai_memory.vector_embedder import (
+    IndexSession,
+    _embed_texts,
+    embed_file,
+    promote_index,
+    remove_vectors,
+)
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+TEXTS = [f"memory text number {i}" for i in range(60)]
+
+
+def _exact_top(query, k):
+    vecs = _embed_texts(TEXTS)
+    scores = vecs @ _embed_texts([query])[0]
+    order = np.argsort(-scores)[:k]
+    return [TEXTS[i] for i in order], scores[order]
+
+
+def test_rerank_restores_exact_order_and_scores(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index), storage="sq8") as session:
+        session.add_texts(TEXTS)
+    stored = exact_vectors.read_vectors(index)
+    assert stored is not None and stored.shape == (60, 1024) and stored.dtype == np.float16
+
+    vm = VectorMemory(str(index))
+    assert vm.load()
+    texts, scores = _exact_top("memory text number 7", 5)
+    hits = vm.search("memory text number 7", top_k=5, rerank=12)
+    assert [e.text for e, _ in hits] == texts
+    assert np.allclose([s for _, s in hits], scores, atol=1e-2)
+
+    # delta segments are re-ranked from their own vectors
+    extra = "memory text number 7 and more"
+    with IndexSession(str(index), append=True) as session:
+        session.add_texts([extra])
+    vm.load()
+    hit, score = vm.search(extra, top_k=1, rerank=4)[0]
+    vec = _embed_texts([extra])[0]
+    assert hit.text == extra and score == pytest.approx(float(vec @ vec), abs=1e-4)
+
+
+@pytest.mark.parametrize("layout", ["ivf", "hnsw"])
+def test_promote_and_remove_keep_the_side_file_aligned(tmp_path, layout):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts(TEXTS)
+    assert exact_vectors.read_vectors(index) is None  # flat needs none
+
+    promote_index(str(index), layout=layout, force=True)
+    assert np.allclose(exact_vectors.read_vectors(index), _embed_texts(TEXTS), atol=1e-3)
+
+    vm = VectorMemory(str(index))
+    vm.load()
+    drop = vm.search("memory text number 3", top_k=1)[0][0]
+    assert remove_vectors(str(index), [drop.id]) == 1
+    kept = [t for t in TEXTS if t != drop.text]
+    assert np.allclose(exact_vectors.read_vectors(index), _embed_texts(kept), atol=1e-3)
+    vm.load()
+    hits = vm.search("memory text number 4", top_k=5, rerank=12)
+    assert drop.text not in {e.text for e, _ in hits}
+    expected = [t for t in _exact_top("memory text number 4", 6)[0] if t != drop.text][:5]
+    assert [e.text for e, _ in hits] == expected
+
+
+def test_hnsw_remove_without_side_file(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts(TEXTS)
+    promote_index(str(index), layout="hnsw", force=True)
+    exact_vectors.discard(index)
+
+    vm = VectorMemory(str(index))
+    vm.load()
+    drop = vm.search("memory text number 9", top_k=1)[0][0]
+    assert remove_vectors(str(index), [drop.id]) == 1
+    vm.load()
+    assert vm.index.ntotal == len(TEXTS) - 1
+    assert drop.text not in {e.text for e, _ in vm.search("memory text number 9", top_k=5)}
+
+
+def test_rerank_reconstructs_without_side_file(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts(TEXTS)
+    promote_index(str(index), layout="ivf", force=True)
+    exact_vectors.discard(index)
+
+    vm = VectorMemory(str(index))
+    vm.load()
+    assert vm._exact is None
+    texts, _ = _exact_top("memory text number 42", 3)
+    assert [e.text for e, _ in vm.search("memory text number 42", top_k=3, rerank=10)] == texts
+
+
+def test_rescore_metrics():
+    q = np.array([[1.0, 0.0]], dtype="float32")
+    cand = np.array([[[1.0, 0.0], [0.0, 2.0]]], dtype="float32")
+    assert exact_vectors.rescore(q, cand, faiss.METRIC_INNER_PRODUCT).tolist() == [[1.0, 0.0]]
+    assert exact_vectors.rescore(q, cand, faiss.METRIC_L2).tolist() == [[0.0, 5.0]]
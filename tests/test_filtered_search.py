@@ -0,0 +1,97 @@
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.meta_columns import search_params, source_type
+from ai_memory.vector_embedder import IndexSession, embed_file
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+@pytest.fixture
+def vm(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts(["deploy the api", "api keys rotated"], source="a.json", conversation="c1", timestamp=100)
+        session.add_texts(["api rate limits", "lunch plans"], source="b.json", conversation="c2", timestamp=200)
+        session.add_texts(["api notes from a text file"], source="notes.txt", timestamp=300)
+    vm = VectorMemory(str(index))
+    assert vm.load()
+    return vm
+
+
+def test_source_type():
+    assert source_type("exports/Conversations.JSON") == "json"
+    assert source_type("README") == "text"
+    assert source_type(None) is None
+
+
+def test_filters_apply_inside_the_search(vm):
+    hits = vm.search("api rate limits", top_k=2, conversation="c1")
+    assert [e.conversation for e, _ in hits] == ["c1", "c1"]
+
+    assert {e.text for e, _ in vm.search("api", top_k=5, conversation=["c1", "c2"])} == {
+        "deploy the api",
+        "api keys rotated",
+        "api rate limits",
+        "lunch plans",
+    }
+    assert [e.text for e, _ in vm.search("api", top_k=5, source_type="txt")] == [
+        "api notes from a text file"
+    ]
+    window = vm.search("api", top_k=5, since=150, until=300)
+    assert {e.text for e, _ in window} == {"api rate limits", "lunch plans"}
+    assert vm.search("api", top_k=5, conversation="missing") == []
+    assert vm.has_conversation("c2") and not vm.has_conversation("c3")
+
+    batches = vm.search_many(["lunch plans", "deploy the api"], top_k=1, conversation="c2")
+    assert batches[0][0][0].text == "lunch plans"
+    assert all(e.conversation == "c2" for hits in batches for e, _ in hits)
+    with pytest.raises(TypeError):
+        vm.search("api", bogus=1)
+
+
+def test_search_params_keep_ivf_and_hnsw_settings():
+    vecs = np.random.default_rng(0).standard_normal((500, 16)).astype("float32")
+    sel = faiss.IDSelectorBatch(np.arange(0, 500, 5, dtype="int64"))
+    ivf = faiss.index_factory(16, "IVF8,Flat", faiss.METRIC_INNER_PRODUCT)
+    ivf.train(vecs)
+    ivf.nprobe = 4
+    refined = faiss.IndexRefineFlat(ivf)
+    refined.add(vecs)
+    params = search_params(refined, sel)
+    base = params.referenced_objects[1]
+    assert isinstance(base, faiss.SearchParametersIVF) and base.nprobe == 4
+    _, found = refined.search(vecs[:3], 5, params=params)
+    assert np.all(found[found >= 0] % 5 == 0)
+
+    hnsw = faiss.IndexHNSWFlat(16, 8)
+    hnsw.hnsw.efSearch = 48
+    assert search_params(hnsw, sel).efSearch == 48
+
+
+@pytest.mark.parametrize("storage", ["fp16", "sq8", "ivfpq"])
+def test_filters_on_rerank_presets(tmp_path, storage):
+    index = tmp_path / "mem.index"
+    texts = [f"memory text number {i}" for i in range(300)]
+    with IndexSession(str(index), storage=storage, rerank=True) as session:
+        session.add_texts(texts[:150], conversation="c1")
+        session.add_texts(texts[150:], conversation="c2")
+    vm = VectorMemory(str(index))
+    assert vm.load()
+    assert isinstance(faiss.downcast_index(faiss.downcast_index(vm.index).index), faiss.IndexRefine)
+    hits = vm.search("memory text number 7", top_k=5, conversation="c1")
+    assert len(hits) == 5 and all(e.conversation == "c1" for e, _ in hits)
+    assert hits[0][0].text == "memory text number 7"
+    hits = vm.search("memory text number 7", top_k=5, conversation="c2")
+    assert len(hits) == 5 and all(e.conversation == "c2" for e, _ in hits)
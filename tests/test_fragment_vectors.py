@@ -0,0 +1,118 @@
+import sqlite3
+import sys
+import types
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import fragment_vectors
+from ai_memory.cli import cli
+from ai_memory.fragment_vectors import FragmentMatrix, backfill
+from ai_memory.memory_db import _ensure_schema
+from ai_memory.memory_store import MemoryStore
+from ai_memory.relevance_engine import RelevanceEngine
+from ai_memory.vector_embedder import _embed_texts, embed_file
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+@pytest.fixture
+def store():
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    return MemoryStore(conn)
+
+
+def _cosine(a, b):
+    return float(a @ b / np.linalg.norm(a) / np.linalg.norm(b))
+
+
+def test_backfill_stores_normalised_float16(store):
+    ids = [store.add(f"fragment {i}") for i in range(5)]
+    assert backfill(store.conn, limit=3) == 3
+    assert backfill(store.conn) == 2
+    assert backfill(store.conn) == 0
+    blob, model = store.conn.execute(
+        "SELECT embedding, embed_model FROM memory_fragments WHERE mem_id=?", (ids[0],)
+    ).fetchone()
+    assert len(blob) == 1024 * 2 and model == fragment_vectors.FragmentMatrix(store.conn).model
+    vec = fragment_vectors.from_blob(blob)
+    assert np.linalg.norm(vec) == pytest.approx(1.0, abs=1e-3)
+    assert _cosine(vec, _embed_texts(["fragment 0"])[0]) == pytest.approx(1.0, abs=1e-3)
+
+
+def test_similarities_match_cosine_and_follow_changes(store, monkeypatch):
+    ids = [store.add(f"fragment {i}") for i in range(4)]
+    backfill(store.conn)
+    matrix = FragmentMatrix(store.conn)
+    query = _embed_texts(["a query"])[0]
+    sims = matrix.similarities(query, ids[:2] + ["unknown"])
+    assert set(sims) == set(ids[:2])
+    for mem_id, text in zip(ids[:2], ["fragment 0", "fragment 1"]):
+        assert sims[mem_id] == pytest.approx(_cosine(query, _embed_texts([text])[0]), abs=1e-3)
+
+    # new embeddings are appended; only removals reload everything
+    loads = []
+    load = matrix._load
+    monkeypatch.setattr(matrix, "_load", lambda: loads.append(1) or load())
+    store.update_access(ids[0])
+    new = [store.add(f"fragment {i}") for i in range(4, 40)]
+    backfill(store.conn, limit=7)
+    backfill(store.conn)
+    sims = matrix.similarities(query)
+    assert set(new) <= set(sims) and len(sims) == 40 and not loads
+    assert sims[new[-1]] == pytest.approx(_cosine(query, _embed_texts(["fragment 39"])[0]), abs=1e-3)
+
+    # editing the text drops the stale vector until it is re-embedded
+    store.conn.execute("UPDATE memory_fragments SET content='changed' WHERE mem_id=?", (ids[1],))
+    assert ids[1] not in matrix.similarities(query)
+    assert len(loads) == 1
+    backfill(store.conn)
+    assert matrix.similarities(query)[ids[1]] == pytest.approx(
+        _cosine(query, _embed_texts(["changed"])[0]), abs=1e-3
+    )
+
+
+def test_other_model_is_reembedded(store):
+    mem_id = store.add("fragment")
+    backfill(store.conn, "bge-small")
+    assert backfill(store.conn, "bge-small") == 0
+    small = FragmentMatrix(store.conn, "bge-small")
+    assert mem_id in small.similarities(np.ones(384))
+    assert backfill(store.conn, "bge-large") == 1
+    assert small.similarities(np.ones(384)) == {}
+    assert mem_id in FragmentMatrix(store.conn, "bge-large").similarities(np.ones(1024))
+
+
+def test_engine_scores_stored_embeddings(store, tmp_path, monkeypatch):
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(tmp_path / "missing.index"))
+    texts = [f"note {i}" for i in range(10)]
+    ids = [store.add(text, importance=1.0) for text in texts]
+    backfill(store.conn)
+    missing = store.add("not embedded yet", importance=1.0)
+    engine = RelevanceEngine(store)
+    changes = store.conn.total_changes
+    scores = engine.score_all(store.get_all(), "note 3", None)
+    best = max(scores, key=lambda m: scores[m]["score"])
+    assert best == ids[3]
+    # scoring is read-only: nothing is embedded on the query path
+    assert store.conn.total_changes == changes
+    assert missing in scores
+
+
+def test_embed_fragments_command(tmp_path, monkeypatch):
+    monkeypatch.setenv("AI_MEMORY_ROOT", str(tmp_path))
+    store = MemoryStore()
+    for i in range(5):
+        store.add(f"fragment {i}")
+    store.conn.close()
+    result = CliRunner().invoke(cli, ["embed-fragments", "--batch", "2"])
+    assert result.exit_code == 0 and "Embedded 5 memory fragments" in result.output
+    assert "Embedded 0" in CliRunner().invoke(cli, ["embed-fragments"]).output
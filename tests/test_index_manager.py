@@ -0,0 +1,79 @@
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import index_info, index_manager
+from ai_memory.vector_embedder import IndexSession, embed_file, promote_index
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _fill(index_path, n, start=0):
+    with IndexSession(str(index_path)) as session:
+        session.add_texts([f"memory text number {i}" for i in range(start, start + n)])
+
+
+def test_flat_index_promoted_at_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_manager, "PROMOTE_AT", 100)
+    index_path = tmp_path / "mem.index"
+    _fill(index_path, 60)
+    assert isinstance(faiss.downcast_index(faiss.read_index(str(index_path)).index), faiss.IndexFlat)
+
+    _fill(index_path, 60, start=60)
+    index = faiss.read_index(str(index_path))
+    assert index.ntotal == 120
+    assert isinstance(faiss.downcast_index(index.index), faiss.IndexIVFFlat)
+    info = index_info.read_info(index_path)
+    assert info["layout"] == "ivf" and info["promoted_at"] == 120
+
+    # further small additions keep the layout
+    assert index_manager.plan(index) is None
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index_path))
+    vm = VectorMemory()
+    vm.load()
+    assert vm.search("memory text number 7", top_k=1)[0][0].text == "memory text number 7"
+
+
+def test_promote_index_to_hnsw(tmp_path):
+    index_path = tmp_path / "mem.index"
+    _fill(index_path, 20)
+    assert promote_index(str(index_path)) is None  # below threshold
+    assert promote_index(str(index_path), layout="hnsw", force=True) == "HNSW32,Flat"
+    index = faiss.read_index(str(index_path))
+    assert isinstance(faiss.downcast_index(index.index), faiss.IndexHNSWFlat)
+    assert index.ntotal == 20
+
+
+def test_untrained_factory_waits_for_sample(tmp_path, monkeypatch):
+    from ai_memory import index_presets
+
+    monkeypatch.setattr(index_presets, "TRAIN_SIZE", 80)
+    index_path = tmp_path / "ivf.index"
+    with IndexSession(str(index_path), "IVF2,Flat", batch_size=4) as session:
+        session.add_texts([f"text {i}" for i in range(40)])
+        session.checkpoint()
+        assert not index_path.exists()  # still collecting training vectors
+        session.add_texts([f"text {i}" for i in range(40, 100)])
+    assert faiss.read_index(str(index_path)).ntotal == 100
+
+
+def test_promote_samples_enough_points_per_list():
+    # an index much larger than the training sample
+    rng = np.random.default_rng(0)
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(16))
+    index.add_with_ids(rng.random((8000, 16), dtype="float32"), np.arange(8000, dtype="int64") * 7)
+    nlist = index_manager.ideal_nlist(index.ntotal)
+    promoted, info = index_manager.promote(index, f"IVF{nlist},Flat", sample_size=500)
+    assert info["trained_on"] >= 39 * nlist > 500
+    assert promoted.ntotal == 8000 and faiss.downcast_index(promoted.index).nlist == nlist
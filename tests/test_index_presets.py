@@ -0,0 +1,69 @@
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import index_info, index_presets
+from ai_memory.vector_embedder import IndexSession, embed_file, merge_segments
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _vecs(n, d=64, seed=0):
+    vecs = np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def test_factory_strings():
+    assert index_presets.factory_for("fp16", 10, 1024) == "SQfp16"
+    assert index_presets.factory_for("sq8", 10, 1024, rerank=True) == "SQ8,RFlat"
+    assert index_presets.factory_for("ivfpq", 10000, 1024) == "IVF256,PQ128x8"
+    # too little data for PQ codebooks
+    assert index_presets.factory_for("ivfpq", 10, 1024) == "SQ8"
+    with pytest.raises(ValueError):
+        index_presets.factory_for("bogus", 10, 1024)
+
+
+@pytest.mark.parametrize("preset", ["fp16", "sq8", "ivfpq"])
+def test_build_index_reports_recall(preset):
+    vecs = _vecs(1000)
+    index, info = index_presets.build_index(preset, vecs, rerank=preset == "ivfpq")
+    assert index.is_trained and index.ntotal == 0
+    assert 0.0 < info["recall_at_10"] <= 1.0
+    if preset != "ivfpq":
+        assert info["recall_at_10"] > 0.9
+
+
+def test_session_trains_preset_on_buffered_vectors(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_presets, "TRAIN_SIZE", 20)
+    index_path = tmp_path / "mem.index"
+    with IndexSession(str(index_path), storage="sq8", batch_size=4) as session:
+        session.add_texts([f"memory number {i}" for i in range(50)])
+        session.checkpoint()
+        assert session.index is not None
+    index = faiss.read_index(str(index_path))
+    assert index.ntotal == 50
+    assert isinstance(faiss.downcast_index(index.index), faiss.IndexScalarQuantizer)
+    info = index_info.read_info(index_path)
+    assert info["storage"] == "sq8" and info["factory"] == "SQ8"
+    assert info["bytes_per_vector"] < 4096
+
+
+def test_merge_builds_preset_from_segments(tmp_path):
+    index_path = tmp_path / "mem.index"
+    for i in range(3):
+        with IndexSession(str(index_path), append=True) as session:
+            session.add_texts([f"segment {i} text {j}" for j in range(10)])
+    assert merge_segments(str(index_path), storage="fp16") == 3
+    index = faiss.read_index(str(index_path))
+    assert index.ntotal == 30
+    assert index_info.read_info(index_path)["factory"] == "SQfp16"
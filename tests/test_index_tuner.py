@@ -0,0 +1,69 @@
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import index_info, index_tuner
+from ai_memory.vector_embedder import IndexSession, embed_file, promote_index
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _ivf_index(tmp_path, n=300):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts([f"memory text number {i}" for i in range(n)])
+    promote_index(str(index), layout="ivf", force=True)
+    return index
+
+
+def test_tune_index_saves_and_load_applies(tmp_path):
+    index = _ivf_index(tmp_path)
+    tuning = index_tuner.tune_index(str(index), target_p95_ms=1000.0, k=5, n_queries=40)
+    assert [p["nprobe"] for p in tuning["sweep"]][0] == 1
+    assert tuning["chosen"]["recall_at_5"] == max(p["recall_at_5"] for p in tuning["sweep"])
+    info = index_info.read_info(index)
+    assert info["search_params"] == {"nprobe": tuning["chosen"]["nprobe"]}
+
+    index_info.update_info(index, search_params={"nprobe": 2})
+    vm = VectorMemory(str(index))
+    vm.load()
+    assert faiss.extract_index_ivf(vm.index).nprobe == 2
+    assert index_tuner.get_params(vm.index) == {"nprobe": 2}
+
+    # promoting again invalidates the tuned setting
+    promote_index(str(index), layout="hnsw", force=True)
+    assert index_info.read_info(index)["search_params"] is None
+
+
+def test_tune_hnsw_against_exact_search():
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((2000, 32)).astype("float32")
+    queries = rng.standard_normal((30, 32)).astype("float32")
+    index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(32, 8, faiss.METRIC_INNER_PRODUCT))
+    index.add_with_ids(vecs, np.arange(2000, dtype="int64") * 3)
+    truth = index_tuner.exact_neighbours(vecs, queries, 10, faiss.METRIC_INNER_PRODUCT) * 3
+
+    params, points = index_tuner.tune(index, queries, truth, k=10, target_p95_ms=1000.0)
+    assert [p["efSearch"] for p in points] == sorted(p["efSearch"] for p in points)
+    assert params == index_tuner.get_params(index)
+    best = max(p["recall_at_10"] for p in points)
+    assert next(p for p in points if p["efSearch"] == params["efSearch"])["recall_at_10"] == best
+
+
+def test_flat_index_has_nothing_to_tune(tmp_path):
+    index = tmp_path / "mem.index"
+    with IndexSession(str(index)) as session:
+        session.add_texts(["only", "flat"])
+    with pytest.raises(ValueError):
+        index_tuner.tune_index(str(index))
+    assert index_tuner.apply_params(faiss.IndexFlatIP(4), {"nprobe": 8}) == {}
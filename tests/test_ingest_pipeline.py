@@ -0,0 +1,47 @@
+import json
+import pickle
+import sys
+import types
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.vector_embedder import IndexSession
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(IndexSession.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _write_logs(tmp_path, n):
+    files = []
+    for i in range(n):
+        path = tmp_path / f"log{i}.json"
+        msgs = [{"content": f"file {i} msg {j}"} for j in range(3)]
+        path.write_text(json.dumps({"conversations": [{"messages": msgs}]}))
+        files.append(str(path))
+    bad = tmp_path / "broken.txt"
+    bad.write_bytes(b"plain text")
+    return files + [str(bad)]
+
+
+def test_process_pool_matches_serial(tmp_path):
+    files = _write_logs(tmp_path, 6)
+
+    serial = IndexSession(str(tmp_path / "serial.index"), batch_size=4)
+    serial.add_files(files)
+    assert serial.close() == 0
+
+    pooled = IndexSession(str(tmp_path / "pooled.index"), batch_size=4)
+    stats = pooled.add_files(files, workers=2)
+    assert pooled.close() == 0
+
+    assert [s.path for s in stats] == files
+    assert [s.chunks for s in stats] == [3] * 6 + [1]
+    a = pickle.load(open(tmp_path / "serial.pkl", "rb"))
+    b = pickle.load(open(tmp_path / "pooled.pkl", "rb"))
+    assert [m["text"] for m in a] == [m["text"] for m in b]
+    assert pooled.index.ntotal == len(b) == 19
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from ai_memory.json_stream import iter_conversations, iter_top_level
+from ai_memory.extract import _iter_json_strings
+
+
+DOC = {
+    "user": "tester",
+    "conversations": [
+        {"id": 1, "messages": [{"content": "hi"}, {"content": {"parts": ["there", 12345.5]}}]},
+        {"id": 2, "messages": [], "score": -0.25e-3, "ok": True, "none": None},
+    ],
+    "count": 1234567,
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1 << 20])
+def test_matches_json_load(tmp_path, chunk_size):
+    path = tmp_path / "doc.json"
+    path.write_text(json.dumps(DOC, indent=1))
+    events = list(iter_top_level(path, chunk_size))
+    assert events == [
+        ("user", "tester"),
+        ("conversations", DOC["conversations"][0]),
+        ("conversations", DOC["conversations"][1]),
+        ("count", 1234567),
+    ]
+    assert list(iter_conversations(path, chunk_size)) == DOC["conversations"]
+
+
+NUMBERS = [1.5, 2, -2.5e10, 1, 0.125, -7, 3e-05, 12345.678, -0.0, 1e300]
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_numbers_split_across_chunks(tmp_path, chunk_size):
+    path = tmp_path / "numbers.json"
+    path.write_text(json.dumps(NUMBERS))
+    assert [v for _, v in iter_top_level(path, chunk_size)] == NUMBERS
+    path.write_text(json.dumps({"a": -2.5e10, "b": 1.5, "c": [1.5, 2]}))
+    assert list(iter_top_level(path, chunk_size)) == [("a", -2.5e10), ("b", 1.5), ("c", [1.5, 2])]
+
+
+def test_chatgpt_layouts(tmp_path):
+    export = [
+        {"title": "A", "mapping": {"n1": {"message": {"content": {"parts": ["from mapping", ""]}}}, "n2": None}},
+        {"name": "B", "chat_messages": [{"text": "from chat"}, {"content": [{"text": "from parts"}]}]},
+    ]
+    path = tmp_path / "conversations.json"
+    path.write_text(json.dumps(export))
+    assert list(iter_conversations(path, 5)) == export
+    assert list(_iter_json_strings(str(path), "messages")) == [
+        "from mapping",
+        "from chat",
+        "from parts",
+    ]
+
+
+@pytest.mark.parametrize("conv", [
+    {"title": "A", "mapping": {"n1": {"message": {"content": {"parts": ["only chat"]}}}}},
+    {"name": "B", "uuid": "x", "chat_messages": [{"text": "only chat"}]},
+])
+def test_single_conversation_export(tmp_path, conv):
+    path = tmp_path / "conversation.json"
+    path.write_text(json.dumps(conv))
+    assert list(_iter_json_strings(str(path), "messages")) == ["only chat"]
+    assert list(_iter_json_strings(str(path), "auto")) == ["only chat"]
+
+
+def test_invalid_json_is_reported(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text('{"conversations": [{"messages": [}]}')
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_top_level(path, 4))
+    assert list(_iter_json_strings(str(path), "auto")) == []
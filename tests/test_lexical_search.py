@@ -0,0 +1,104 @@
+import sqlite3
+import sys
+import types
+
+import pytest
+from click.testing import CliRunner
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.cli import cli
+from ai_memory.memory_db import _ensure_schema, fts_query, search_fragments
+from ai_memory.memory_store import MemoryStore
+from ai_memory.relevance_engine import RelevanceEngine, fuse_scores
+from ai_memory.vector_embedder import embed_file
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+@pytest.fixture
+def store():
+    conn = sqlite3.connect(":memory:")
+    _ensure_schema(conn)
+    return MemoryStore(conn)
+
+
+def test_fts_follows_inserts_updates_and_deletes(store):
+    kept = store.add("the deploy script restarts nginx")
+    gone = store.add("nginx config lives in /etc")
+    store.add("lunch at noon")
+    assert [m for m, _ in search_fragments(store.conn, "restart nginx deploy")][0] == kept
+
+    store.conn.execute("DELETE FROM memory_fragments WHERE mem_id=?", (gone,))
+    store.conn.execute(
+        "UPDATE memory_fragments SET content='postgres vacuum schedule' WHERE mem_id=?", (kept,)
+    )
+    store.update_access(kept)
+    assert search_fragments(store.conn, "nginx") == []
+    assert [m for m, _ in search_fragments(store.conn, "vacuum")] == [kept]
+
+
+def test_existing_fragments_are_backfilled():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE memory_fragments (mem_id TEXT PRIMARY KEY, content TEXT)")
+    conn.execute("INSERT INTO memory_fragments VALUES ('old', 'written before fts existed')")
+    _ensure_schema(conn)
+    assert search_fragments(conn, "before") == [("old", pytest.approx(search_fragments(conn, "before")[0][1]))]
+
+
+def test_fts_query_quotes_user_text(store):
+    assert fts_query('deploy "prod" OR NEAR(') == '"deploy" OR "prod" OR "or" OR "near"'
+    assert fts_query("?!") == ""
+    assert search_fragments(store.conn, 'NEAR( "') == []
+
+
+def test_lexical_and_vector_scores_are_fused(store, tmp_path, monkeypatch):
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(tmp_path / "missing.index"))
+    match = store.add("kubernetes rollout failed on node pool", importance=1.0)
+    other = store.add("grocery list for the weekend", importance=1.0)
+    for i in range(6):
+        store.add(f"the note number {i} about the garden", importance=1.0)
+    engine = RelevanceEngine(store)
+    scores = engine.score_all(store.get_all(), "why did the kubernetes rollout fail", None)
+    assert scores[match]["score"] > scores[other]["score"] + 15
+
+    assert fuse_scores({"a": 4.0, "b": 1.0}, {"a": 0.8}) == {
+        "a": pytest.approx(0.9),
+        "b": pytest.approx(0.125),
+    }
+    assert fuse_scores({}, {"x": 0.3}) == {"x": 0.3}
+    assert fuse_scores({}, {}) == {}
+
+
+def test_list_contains_uses_the_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("AI_MEMORY_ROOT", str(tmp_path))
+    store = MemoryStore()
+    store.add("alpha beta gamma")
+    store.add("alphabet soup")
+    store.add("ella wrote")
+    store.add("say hello")
+    plan = " ".join(
+        row[-1]
+        for row in store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM memory_fragments_tri WHERE content LIKE '%ell%'"
+        )
+    )
+    assert "VIRTUAL TABLE INDEX" in plan
+    store.conn.close()
+    out = CliRunner().invoke(cli, ["list", "--contains", "alpha be"]).output
+    assert "alpha beta gamma" in out and "alphabet soup" not in out
+    assert "alphabet soup" in CliRunner().invoke(cli, ["list", "-f", "alphabet"]).output
+    # text inside a word matches like a plain LIKE scan
+    out = CliRunner().invoke(cli, ["list", "--contains", "lphab"]).output
+    assert "alphabet soup" in out and "alpha beta gamma" not in out
+    assert "alpha beta" in CliRunner().invoke(cli, ["list", "-f", "ha be", "-n", "1"]).output
+    assert "No memories found" in CliRunner().invoke(cli, ["list", "-f", "zzz"]).output
+    # a word-start match does not hide the mid-word ones
+    out = CliRunner().invoke(cli, ["list", "--contains", "ELL"]).output
+    assert "ella wrote" in out and "say hello" in out and out.count("- [") == 2
+    # too short for trigrams: plain scan
+    assert CliRunner().invoke(cli, ["list", "--contains", "ha"]).output.count("- [") == 2
@@ -5,7 +5,7 @@ import sqlite3
 import pytest
 from ai_memory.testing._stubs import FakeSentenceTransformer
 from ai_memory.vector_embedder import embed_file
-from ai_memory.memory_db import _ensure_schema
+from ai_memory.memory_db import _ensure_schema, rough_token_len
 from ai_memory.memory_store import MemoryStore
 from ai_memory.relevance_engine import RelevanceEngine
 from ai_memory.context_builder import ContextBuilder
@@ -35,6 +35,9 @@ def test_vector_hit_scored(tmp_path, monkeypatch):
     scores = engine.score_all(store.get_all(), "vector memory test", None)
     contents = [v["memory"].content for v in scores.values()]
     assert "vector memory test" in contents
+    # vector-only hits are costed in the unit of the stored token estimates
+    hit = next(v for v in scores.values() if v["memory"].content == "vector memory test")
+    assert hit["token_cost"] == rough_token_len("vector memory test") != 3
 
 
 def test_vector_fusion(tmp_path, monkeypatch):
@@ -0,0 +1,174 @@
+import json
+import pickle
+import sys
+import types
+
+import faiss
+import numpy as np
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import segments
+from ai_memory.vector_embedder import embed_file, merge_segments
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _conv(tmp_path, name, parts):
+    path = tmp_path / name
+    msgs = [{"content": {"parts": [p]}} for p in parts]
+    path.write_text(json.dumps({"conversations": [{"messages": msgs}]}))
+    return str(path)
+
+
+def test_append_segments_and_merge(tmp_path, monkeypatch):
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["one", "two"]), str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["three"]), str(index), "dummy", append=True)
+    embed_file(_conv(tmp_path, "c.json", ["four", "five"]), str(index), "dummy", append=True)
+
+    # base files untouched by appends
+    assert faiss.read_index(str(index)).ntotal == 2
+    assert len(segments.list_segments(index)) == 2
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory()
+    assert vm.load()
+    assert vm.index.ntotal == len(vm._ordered) == 5
+    hit, _ = vm.search("four", top_k=1)[0]
+    assert hit.text == "four"
+
+    assert merge_segments(str(index)) == 2
+    assert segments.list_segments(index) == []
+    meta = pickle.load(open(index.with_suffix(".pkl"), "rb"))
+    assert [m["text"] for m in meta] == ["one", "two", "three", "four", "five"]
+    assert faiss.read_index(str(index)).ntotal == 5
+
+
+def test_merged_segments_are_not_applied_twice(tmp_path, monkeypatch):
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["one", "two"]), str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["three"]), str(index), "dummy", append=True)
+    embed_file(_conv(tmp_path, "c.json", ["four", "five"]), str(index), "dummy", append=True)
+
+    # the new base is in place but the segments are not deleted yet
+    with monkeypatch.context() as m:
+        m.setattr(segments, "remove_segment", lambda *paths: None)
+        assert merge_segments(str(index)) == 2
+    assert len(segments.list_segments(index)) == 2
+
+    vm = VectorMemory(str(index))
+    assert vm.load()
+    assert [e.text for e in vm._ordered] == ["one", "two", "three", "four", "five"]
+    assert vm.ntotal == 5
+
+    # the next merge only deletes them
+    assert merge_segments(str(index)) == 0
+    assert segments.list_segments(index) == []
+    assert faiss.read_index(str(index)).ntotal == 5
+
+
+def test_rewriting_the_base_keeps_its_merged_segments(tmp_path, monkeypatch):
+    from ai_memory.vector_embedder import IndexSession
+
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["one", "two"]), str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["three"]), str(index), "dummy", append=True)
+    with monkeypatch.context() as m:
+        m.setattr(segments, "remove_segment", lambda *paths: None)
+        assert merge_segments(str(index)) == 1
+
+    # a session rewriting the base leaves the merged segment skipped
+    with IndexSession(str(index), model="dummy") as session:
+        session.add_texts(["four"])
+    vm = VectorMemory(str(index))
+    assert vm.load()
+    assert [e.text for e in vm._ordered] == ["one", "two", "three", "four"]
+
+
+def test_checkpoint_waits_for_a_merge(tmp_path):
+    import threading
+    import time
+
+    from ai_memory.vector_embedder import IndexSession, _index_lock
+
+    index = tmp_path / "mem.index"
+    session = IndexSession(str(index))
+    session.add_texts(["one", "two"])
+    with _index_lock(index) as locked:
+        assert locked
+        writer = threading.Thread(target=session.close)
+        writer.start()
+        time.sleep(0.2)
+        assert writer.is_alive() and not index.exists()
+    writer.join(5)
+    assert faiss.read_index(str(index)).ntotal == 2
+
+
+def test_mmap_load_searches_segments_separately(tmp_path, monkeypatch):
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["one", "two"]), str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["three", "four"]), str(index), "dummy", append=True)
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory(mmap=True)
+    assert vm.load()
+    # the mapped base is never written to
+    assert vm.index.ntotal == 2
+    assert vm.ntotal == len(vm._ordered) == 4
+    assert vm.search("four", top_k=1)[0][0].text == "four"
+    assert vm.search("one", top_k=1)[0][0].text == "one"
+    assert len(vm.search("two", top_k=4)) == 4
+    batches = vm.search_many(["three", "one", "four"], top_k=2)
+    assert [hits[0][0].text for hits in batches] == ["three", "one", "four"]
+    assert all(len(hits) == 2 for hits in batches)
+
+
+def test_remove_vectors_by_id_and_source(tmp_path, monkeypatch):
+    from ai_memory.vector_embedder import remove_vectors
+    from ai_memory.vector_ids import is_id_mapped
+
+    index = tmp_path / "mem.index"
+    a = _conv(tmp_path, "a.json", ["one", "two"])
+    embed_file(a, str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["three", "four"]), str(index), "dummy", append=True)
+    assert is_id_mapped(faiss.read_index(str(index)))
+
+    with open(index.with_suffix(".pkl"), "rb") as f:
+        first = pickle.load(f)[0]
+    assert remove_vectors(str(index), [first["id"]]) == 1
+    # segments were folded in before deleting
+    assert remove_vectors(str(index), source=str(tmp_path / "b.json")) == 2
+    assert not segments.list_segments(index)
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory()
+    vm.load()
+    assert [e.text for e in vm._ordered] == ["two"]
+    assert vm.search("two", top_k=3)[0][0].text == "two"
+    assert all(e.text != "one" for e, _ in vm.search("one", top_k=3))
+
+
+def test_positional_index_is_converted(tmp_path):
+    index = tmp_path / "old.index"
+    flat = faiss.IndexFlatIP(1024)
+    vecs = np.random.default_rng(0).random((3, 1024), dtype="float32")
+    flat.add(vecs)
+    faiss.write_index(flat, str(index))
+    records = [{"id": f"m{i}", "text": f"t{i}", "timestamp": 0.0} for i in range(3)]
+    with open(index.with_suffix(".pkl"), "wb") as f:
+        pickle.dump(records, f)
+
+    from ai_memory.vector_embedder import remove_vectors
+    from ai_memory.vector_ids import vector_id
+
+    assert remove_vectors(str(index), ["m1"]) == 1
+    converted = faiss.read_index(str(index))
+    assert converted.ntotal == 2
+    np.testing.assert_allclose(converted.reconstruct(vector_id("m2")), vecs[2])
@@ -0,0 +1,74 @@
+import json
+import sys
+import types
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory import text_store
+from ai_memory.metadata_converter import convert_to_text_store
+from ai_memory.vector_embedder import embed_file
+from ai_memory.vector_memory import VectorMemory
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _conv(tmp_path, name, parts):
+    path = tmp_path / name
+    msgs = [{"content": {"parts": [p]}} for p in parts]
+    path.write_text(json.dumps({"conversations": [{"messages": msgs}]}))
+    return str(path)
+
+
+def test_round_trip(tmp_path):
+    records = [
+        {"id": "a", "text": "naïve café", "timestamp": 1.5, "source": "x.txt", "start": 0, "end": 10},
+        {"id": "b", "text": "", "timestamp": 2.0, "conversation": "c1"},
+    ]
+    text_store.write_store(tmp_path / "m.index", records)
+    store = text_store.TextStore(tmp_path / "m.index")
+    assert len(store) == 2
+    assert store.text(0) == "naïve café" and store.memory_id(1) == "b"
+    assert store.row(1)["conversation"] == "c1" and store.row(1)["start"] is None
+    assert store.records_list() == records
+
+    text_store.write_store(tmp_path / "empty.index", [])
+    assert len(text_store.TextStore(tmp_path / "empty.index")) == 0
+
+
+def test_vector_memory_reads_the_store_lazily(tmp_path, monkeypatch):
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["one", "two", "three"]), str(index), "dummy")
+    embed_file(_conv(tmp_path, "b.json", ["four"]), str(index), "dummy", append=True)
+    index.with_suffix(".pkl").unlink()
+    (tmp_path / "mem.memories.pkl").unlink()
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory()
+    assert vm.load()
+    assert len(vm._ordered) == 4 and vm.ntotal == 4
+    hit, _ = vm.search("two", top_k=1)[0]
+    assert hit.text == "two" and hit.source == str(tmp_path / "a.json")
+    assert vm.search("four", top_k=1)[0][0].text == "four"
+    assert vm.memories[hit.id] == hit and len(vm.memories) == 4
+
+
+def test_convert_pickles_to_store(tmp_path, monkeypatch):
+    index = tmp_path / "mem.index"
+    embed_file(_conv(tmp_path, "a.json", ["alpha", "beta"]), str(index), "dummy")
+    text_store.store_path(index).unlink()
+
+    count, target = convert_to_text_store(tmp_path / "mem.memories.pkl")
+    assert count == 2 and target == text_store.store_path(index)
+    store = text_store.TextStore(index)
+    assert [store.text(i) for i in range(len(store))] == ["alpha", "beta"]
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(index))
+    vm = VectorMemory()
+    assert vm.load()
+    assert vm.search("beta", top_k=1)[0][0].text == "beta"
@@ -42,3 +42,53 @@ def test_self_heal_new_factory(tmp_path):
     score = recall(str(doc), str(idx))
     assert score > 0.99
 
+
+def test_recall_many_matches_single_recall(tmp_path):
+    from ai_memory.vector_embedder import recall_many
+
+    docs = []
+    for i, text in enumerate(["first note", "second note", "third note"]):
+        doc = tmp_path / f"doc{i}.txt"
+        doc.write_text(text)
+        docs.append(str(doc))
+    idx = tmp_path / "vec.faiss"
+    for doc in docs[:2]:
+        embed_file(doc, str(idx), "dummy", factory="Flat")
+    scores = recall_many(docs, str(idx))
+    assert scores == pytest.approx([recall(d, str(idx)) for d in docs], abs=1e-5)
+    assert scores[0] > 0.99 and scores[1] > 0.99
+    assert recall_many([], str(idx)) == []
+
+
+def test_batched_embedding_keeps_order():
+    from ai_memory.vector_embedder import _embed_text, _embed_texts
+    import numpy as np
+
+    texts = ["a much longer piece of text", "short", "medium text", ""]
+    batched = _embed_texts(texts, batch_size=2)
+    single = np.vstack([_embed_text(t) for t in texts])
+    assert batched.shape == single.shape
+    assert np.allclose(batched, single)
+
+
+def test_model_sets_dims_and_is_checked(tmp_path, monkeypatch):
+    from ai_memory import index_info
+    from ai_memory.vector_embedder import IndexSession
+    from ai_memory.vector_memory import VectorMemory
+
+    idx = tmp_path / "small.index"
+    with IndexSession(str(idx), model="bge-small") as session:
+        session.add_texts(["small model text", "other text"])
+    assert session.index.d == 384
+    info = index_info.read_info(idx)
+    assert info["model"] == "BAAI/bge-small-en-v1.5" and info["dims"] == 384
+
+    # ollama tags fall back to the default model, which does not match
+    with pytest.raises(ValueError):
+        IndexSession(str(idx), model="llama3:70b-instruct-q4_K_M")
+
+    monkeypatch.setenv("LUNA_VECTOR_INDEX", str(idx))
+    vm = VectorMemory()
+    vm.load()
+    assert vm.model_name == "BAAI/bge-small-en-v1.5"
+    assert vm.search("small model text", top_k=1)[0][0].text == "small model text"
@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import types
+
+import pytest
+
+from ai_memory.testing._stubs import FakeSentenceTransformer
+from ai_memory.vector_embedder import embed_file
+from ai_memory.vector_memory import VectorMemory, shard_paths
+
+
+@pytest.fixture(autouse=True)
+def _stub_transformer(monkeypatch):
+    fake_mod = types.SimpleNamespace(SentenceTransformer=FakeSentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake_mod)
+    monkeypatch.setattr(embed_file.__module__ + ".SentenceTransformer", FakeSentenceTransformer, raising=False)
+
+
+def _conv(tmp_path, name, parts):
+    path = tmp_path / name
+    msgs = [{"content": {"parts": [p]}} for p in parts]
+    path.write_text(json.dumps({"conversations": [{"messages": msgs}]}))
+    return str(path)
+
+
+def _shards(tmp_path):
+    shard_dir = tmp_path / "shards"
+    shard_dir.mkdir()
+    embed_file(_conv(tmp_path, "jan.json", ["alpha", "beta"]), str(shard_dir / "2024-01.index"), "dummy")
+    embed_file(_conv(tmp_path, "feb.json", ["gamma", "delta"]), str(shard_dir / "2024-02.index"), "dummy")
+    return shard_dir
+
+
+def test_shard_paths_expands_dirs_and_globs(tmp_path):
+    shard_dir = _shards(tmp_path)
+    expected = [shard_dir / "2024-01.index", shard_dir / "2024-02.index"]
+    assert shard_paths([str(shard_dir)]) == expected
+    assert shard_paths(str(shard_dir / "2024-0*.index")) == expected
+    spec = os.pathsep.join(str(p) for p in expected + expected[:1])
+    assert shard_paths(spec) == expected
+
+
+def test_sharded_search_merges_top_k(tmp_path, monkeypatch):
+    shard_dir = _shards(tmp_path)
+    monkeypatch.setenv("LUNA_VECTOR_SHARDS", str(shard_dir))
+    vm = VectorMemory()
+    assert len(vm.shards) == 2
+    assert vm.load()
+    assert vm.ntotal == len(vm._ordered) == 4
+
+    assert vm.search("gamma", top_k=1)[0][0].text == "gamma"
+    assert vm.search("alpha", top_k=1)[0][0].text == "alpha"
+    batches = vm.search_many(["delta", "beta"], top_k=2)
+    assert [hits[0][0].text for hits in batches] == ["delta", "beta"]
+    hits = vm.search("beta", top_k=3)
+    scores = [score for _, score in hits]
+    assert len(hits) == 3 and scores == sorted(scores, reverse=True)
+    assert vm.stitch(hits[0][0]) == "beta"
+
+
+def test_only_changed_shards_reload(tmp_path):
+    shard_dir = _shards(tmp_path)
+    vm = VectorMemory(shards=[shard_dir])
+    vm.load()
+    jan, feb = vm.shards
+    jan_index = jan.index
+    stamp = vm.stamp()
+
+    embed_file(_conv(tmp_path, "feb2.json", ["epsilon"]), str(shard_dir / "2024-02.index"), "dummy", append=True)
+    assert vm.stamp() != stamp
+    vm.load()
+    assert jan.index is jan_index
+    assert vm.ntotal == 5
+    assert vm.search("epsilon", top_k=1)[0][0].text == "epsilon"
@@ -53,3 +53,37 @@ def test_vectorize_json_auto(tmp_path):
     meta_data = pickle.load(open(meta, "rb"))
     idx = faiss.read_index(str(index))
     assert len(meta_data) == idx.ntotal == 3
+
+
+def test_vectorize_many_paths(tmp_path):
+    logs = tmp_path / "logs"
+    (logs / "sub").mkdir(parents=True)
+    for i, name in enumerate(["a.json", "sub/b.json"]):
+        data = {"conversations": [{"messages": [{"content": {"parts": [f"msg {i}"]}}]}]}
+        (logs / name).write_text(json.dumps(data))
+    (logs / "notes.md").write_text("markdown notes")
+    (tmp_path / "extra.txt").write_text("extra text")
+    index = tmp_path / "vec.index"
+
+    result = subprocess.run(
+        [
+            "python",
+            "-m",
+            "ai_memory.cli",
+            "vectorize",
+            str(logs),
+            str(tmp_path / "*.txt"),
+            "--vector-index",
+            str(index),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        timeout=5,
+    )
+
+    assert "4 files" in result.stdout
+    meta_data = pickle.load(open(index.with_suffix(".pkl"), "rb"))
+    idx = faiss.read_index(str(index))
+    assert len(meta_data) == idx.ntotal == 4
+    assert {m["text"] for m in meta_data} == {"msg 0", "msg 1", "markdown notes", "extra text"}
@@ -2,28 +2,52 @@
 """Extract and vectorize messages from ChatGPT conversation exports."""
 import json
 import sys
+from datetime import datetime
 from pathlib import Path
-from typing import List
-import tempfile
+from typing import Iterator, List, Optional, Tuple
 import os
 import logging
-# Workaround for kernel 6.14.0-27 Python subprocess bug: call vectorize directly
-from ai_memory.cli import vectorize as cli_vectorize
+# Workaround for kernel 6.14.0-27 Python subprocess bug: embed in-process
+from ai_memory.json_stream import iter_conversations
+from ai_memory.vector_embedder import IndexSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def extract_messages_from_chatgpt(file_path: Path) -> List[str]:
-    """Extract message text from various ChatGPT export formats."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    """Extract message text from various ChatGPT export formats.
 
+    Conversations are streamed one at a time, so peak memory does not grow
+    with the size of the export.
+    """
     messages: List[str] = []
+    for _, _, conv_messages in iter_conversation_messages(file_path):
+        messages.extend(conv_messages)
+    return messages
 
-    conversations = data if isinstance(data, list) else [data]
 
-    for conv in conversations:
+def _conversation_time(conv: dict) -> Optional[float]:
+    """Return the creation time of ``conv`` as epoch seconds, if recorded."""
+    value = conv.get("create_time") or conv.get("created_at")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def iter_conversation_messages(
+    file_path: Path,
+) -> Iterator[Tuple[Optional[str], Optional[float], List[str]]]:
+    """Yield ``(conversation id, created, messages)`` per conversation."""
+    for conv in iter_conversations(file_path):
+        if not isinstance(conv, dict):
+            continue
+        messages: List[str] = []
         if "mapping" in conv:
             title = conv.get("title", "Untitled")
             mapping = conv["mapping"]
@@ -84,62 +108,63 @@ def extract_messages_from_chatgpt(file_path: Path) -> List[str]:
                     full_text = f"[{name}] {role}: {text}"
                     messages.append(full_text)
 
-    return messages
+        conv_id = conv.get("conversation_id") or conv.get("id") or conv.get("uuid")
+        yield (str(conv_id) if conv_id else None), _conversation_time(conv), messages
 
 
 def main() -> None:
-    if len(sys.argv) != 2:
-        print("Usage: extract_chatgpt_messages.py <conversations.json>")
+    args = sys.argv[1:]
+    # skip texts already indexed from any conversation; off so every
+    # conversation keeps its own copy of a repeated message
+    dedup = "--dedup" in args
+    paths = [Path(p) for p in args if p != "--dedup"]
+    if not paths:
+        print("Usage: extract_chatgpt_messages.py [--dedup] <conversations.json> [...]")
         sys.exit(1)
 
-    file_path = Path(sys.argv[1])
-    if not file_path.exists():
-        logger.error("File not found: %s", file_path)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        logger.error("File not found: %s", ", ".join(str(p) for p in missing))
         sys.exit(1)
 
-    logger.info("Processing %s...", file_path)
-
-    try:
-        messages = extract_messages_from_chatgpt(file_path)
-        logger.info("Extracted %d messages", len(messages))
-        
+    # Get vector directory from environment or default
+    vector_dir = Path(os.getenv('LUNA_VECTOR_DIR', str(Path.home() / 'aimemorysystem')))
+    vector_dir.mkdir(parents=True, exist_ok=True)
+
+    # Force CPU mode; the index is loaded once and written once for all files
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    session = IndexSession(
+        str(vector_dir / 'memory_store.index'), checkpoint_every=10, dedup=dedup
+    )
+    failed = False
+    for file_path in paths:
+        logger.info("Processing %s...", file_path)
+        messages = kept = 0
+        try:
+            for conv_id, created, conv_messages in iter_conversation_messages(file_path):
+                messages += len(conv_messages)
+                kept += session.add_texts(
+                    conv_messages, source=str(file_path), conversation=conv_id, timestamp=created
+                )
+        except json.JSONDecodeError as e:
+            logger.error('Invalid JSON in %s: %s', file_path, e)
+            failed = True
+            continue
+        except Exception as e:
+            logger.error('Error processing %s: %s', file_path, e)
+            failed = True
+            continue
+        logger.info("Extracted %d messages", messages)
         if not messages:
             logger.warning("No messages found!")
-            return
-
-        # Save as temporary JSON file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
-            temp_file = f.name
-
-        # Get vector directory from environment or default
-        vector_dir = Path(os.getenv('LUNA_VECTOR_DIR', str(Path.home() / 'aimemorysystem')))
-        vector_dir.mkdir(parents=True, exist_ok=True)
-
-        # Force CPU mode and vectorize directly via CLI function
-        os.environ['CUDA_VISIBLE_DEVICES'] = ''
-        logger.info('Vectorizing %d messages...', len(messages))
-        try:
-            cli_vectorize.callback(
-                temp_file,
-                json_extract='all',
-                vector_index=str(vector_dir / 'memory_store.index'),
-                model='llama3:70b-instruct-q4_K_M',
-            )
-        except SystemExit as exc:
-            logger.error('Vectorization failed: exit code %s', exc.code)
-            sys.exit(1)
-        logger.info('Successfully vectorized messages')
-        
-    except json.JSONDecodeError as e:
-        logger.error('Invalid JSON in %s: %s', file_path, e)
-        sys.exit(1)
-    except Exception as e:
-        logger.error('Error processing %s: %s', file_path, e)
+            continue
+        logger.info(
+            'Vectorizing %d messages (%d duplicates skipped)...', kept, messages - kept
+        )
+    session.close()
+    logger.info('Successfully vectorized messages')
+    if failed:
         sys.exit(1)
-    finally:
-        if 'temp_file' in locals():
-            Path(temp_file).unlink(missing_ok=True)
 
 
 if __name__ == '__main__':
@@ -7,6 +7,8 @@ cd "$(dirname "$0")/.."
 # Setup environment
 export CUDA_VISIBLE_DEVICES=""
 export LUNA_VECTOR_DIR="$HOME/aimemorysystem"
+# Embeddings survive the clean start below; only new messages hit the model
+export AIMEM_EMBED_CACHE="${AIMEM_EMBED_CACHE:-$HOME/ai_memory/embed_cache.db}"
 
 # Backup existing data
 if [ -d "$LUNA_VECTOR_DIR" ]; then
@@ -22,13 +24,9 @@ rm -f "$LUNA_VECTOR_DIR"/memory_store.*
 
 # Process each conversations.json file
 echo "Processing ChatGPT conversations..."
-find ~/chatlogs -name "conversations.json" -type f | while read -r file; do
-    echo "Processing: $file"
-    python tools/extract_chatgpt_messages.py "$file"
-    
-    # Small delay to avoid overwhelming the system
-    sleep 0.5
-done
+# One invocation: the index is opened once and flushed once for all exports
+find ~/chatlogs -name "conversations.json" -type f -print0 \
+    | xargs -0 --no-run-if-empty python tools/extract_chatgpt_messages.py
 
 # Check results
 echo -e "\nChecking results..."